@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+alloy_runner.py — headless, parallel model checking of the spec/ Alloy models.
+
+Every `run` and `check` command in spec/*.als, plus every command in the
+per-capture instance slices listed in spec/slices/manifest.json (written by
+`gen_alloy_instance.py --slices`), becomes one job. Jobs run concurrently on
+--jobs workers through contract_runner.run_with_contract, so each solver gets
+its own process group, a per-command timeout (SIGTERM, then SIGKILL) and an
+output bound.
+
+Only a local jar is used — nothing is downloaded. The jar comes from --jar,
+ALLOY_JAR, or the first alloy*.jar / org.alloytools.alloy*.jar found under
+vendor/, tools/ or spec/. Each job runs --cmd (or ALLOY_CMD), a template with
+{java}, {jar}, {model}, {index} (the command's 0-based position in the model
+file) and {outdir} (a per-job scratch dir). The default targets the Alloy 6
+`exec` subcommand; point it at another driver (e.g. a Kodkod wrapper) as needed.
+
+Outcome is read from the solver output: SAT/UNSAT ("instance/counterexample
+found" or not), else "unknown"; failures are "error" and overruns "timeout".
+A check is violated when it is SAT (a counterexample exists).
+
+Results are cached under --cache-dir (default: ALLOY_CACHE_DIR, else
+<art-dir>/alloy_cache), keyed by the digest of the model file and every local
+module it opens, the command, the jar digest and the command template. Only
+sat/unsat outcomes are cached.
+
+CLI usage:
+  python3 bin/alloy_runner.py [models.als ...] [--spec-dir spec] [--no-slices] [--jar PATH]
+                              [--jobs N] [--timeout S] [--cmd TEMPLATE] [--cache-dir DIR] [--no-cache]
+                              [--report FILE] [--art-dir DIR] [--list]
+
+Writes a JSON report (default <art-dir>/alloy_report.json):
+  {"version": 1, "jar": ..., "jar_sha256": ..., "workers": N, "wall_seconds": ...,
+   "summary": {"commands": n, "sat": n, "unsat": n, "unknown": n, "timeout": n, "error": n,
+               "violated_checks": n, "cache_hits": n},
+   "results": [{"model": ..., "index": 0, "kind": "run|check", "command": ..., "outcome": ...,
+                "solve_seconds": ..., "cached": false, "exit_code": 0, "timed_out": false}, ...]}
+Exit code 0 if every command solved and no check was violated, else 1.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import contract_runner
+
+ROOT = Path(__file__).resolve().parents[1]
+
+REPORT_VERSION = 1
+CACHE_VERSION = 1
+DEFAULT_TIMEOUT = 300
+DEFAULT_CMD = "{java} -Djava.awt.headless=true -jar {jar} exec -o {outdir} -c {index} {model}"
+JAR_DIRS = ("vendor", "tools", "spec")
+JAR_PATTERNS = ("alloy*.jar", "org.alloytools.alloy*.jar")
+MAX_OUTPUT_BYTES = 4 * 1024 * 1024
+# Kept in the report for failed jobs.
+STDERR_TAIL_BYTES = 2048
+
+COMMENT_RE = re.compile(r"/\*.*?\*/|//[^\n]*|--[^\n]*", re.S)
+COMMAND_RE = re.compile(r"^\s*(?:\w+\s*:\s*)?(run|check)\b(.*)$", re.M)
+OPEN_RE = re.compile(r"^\s*open\s+([\w/]+)", re.M)
+MODULE_RE = re.compile(r"^\s*module\s+([\w/]+)", re.M)
+OUTCOME_PATTERNS = (
+    (re.compile(r"\bUNSAT\b|no (?:counterexample|instance) found", re.I), "unsat"),
+    (re.compile(r"\bSAT\b|(?:counterexample|instance) found", re.I), "sat"),
+)
+
+
+# ---------------------------------------------------------------------------
+# Model parsing
+# ---------------------------------------------------------------------------
+
+def strip_comments(text: str) -> str:
+    return COMMENT_RE.sub(lambda m: "\n" * m.group(0).count("\n"), text)
+
+
+def _command_end(text: str, m: re.Match) -> int:
+    """End of the command matched by m: its line, or, for an inline block
+    (`run { ... } for 8`), the line holding the block's closing brace."""
+    brace = text.find("{", m.start(1), m.end())
+    if brace < 0:
+        return m.end()
+    depth = 0
+    for pos in range(brace, len(text)):
+        if text[pos] == "{":
+            depth += 1
+        elif text[pos] == "}":
+            depth -= 1
+            if depth == 0:
+                eol = text.find("\n", pos)
+                return len(text) if eol < 0 else eol
+    return m.end()
+
+
+def parse_commands(path: Path) -> List[Dict]:
+    """[{"index", "kind", "command"}] for each top-level run/check in path, in
+    order. "command" is the full command text, blocks and scope included, with
+    whitespace collapsed to single spaces."""
+    text = strip_comments(path.read_text(encoding="utf-8", errors="replace"))
+    return [
+        {"index": i, "kind": m.group(1), "command": " ".join(text[m.start(1):_command_end(text, m)].split())}
+        for i, m in enumerate(COMMAND_RE.finditer(text))
+    ]
+
+
+def module_closure(path: Path) -> List[Path]:
+    """path plus every local .als module it opens, transitively.
+
+    Opens resolve the way Alloy does: against the directory that is the
+    file's own `module a/b` declaration removed from its path. Library
+    modules (util/...) that are not on disk live in the jar and are covered
+    by the jar digest.
+    """
+    seen: Dict[Path, None] = {}
+    todo = [Path(path).resolve()]
+    while todo:
+        p = todo.pop()
+        if p in seen or not p.is_file():
+            continue
+        seen[p] = None
+        text = strip_comments(p.read_text(encoding="utf-8", errors="replace"))
+        m = MODULE_RE.search(text)
+        base = p.parent
+        if m:
+            for _ in range(m.group(1).count("/")):
+                base = base.parent
+        todo.extend(base / f"{name}.als" for name in OPEN_RE.findall(text))
+    return sorted(seen)
+
+
+def digest_files(paths: List[Path]) -> str:
+    h = hashlib.sha256()
+    for p in paths:
+        h.update(p.name.encode("utf-8") + b"\0")
+        h.update(bytes.fromhex(contract_runner.sha256_of_file(str(p))))
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Job discovery
+# ---------------------------------------------------------------------------
+
+def find_jar(explicit: Optional[str] = None, root: Path = ROOT) -> Optional[Path]:
+    """--jar, else ALLOY_JAR, else the first matching jar in JAR_DIRS under root."""
+    for candidate in (explicit, os.environ.get("ALLOY_JAR")):
+        if candidate:
+            return Path(candidate)
+    for d in JAR_DIRS:
+        for pattern in JAR_PATTERNS:
+            found = sorted((root / d).glob(pattern))
+            if found:
+                return found[0]
+    return None
+
+
+def discover_models(spec_dir: Path, slices: bool = True) -> List[Path]:
+    """spec_dir/*.als that declare commands, then the slices in its manifest."""
+    models = [p for p in sorted(spec_dir.glob("*.als")) if parse_commands(p)]
+    manifest = spec_dir / "slices" / "manifest.json"
+    if slices and manifest.is_file():
+        for sl in json.loads(manifest.read_text(encoding="utf-8")).get("slices", []):
+            models.append(spec_dir / sl["file"])
+    return models
+
+
+def build_jobs(models: List[Path]) -> List[Dict]:
+    jobs = []
+    for model in models:
+        closure_digest = digest_files(module_closure(model))
+        for cmd in parse_commands(model):
+            jobs.append({"model": str(model), "model_digest": closure_digest, **cmd})
+    return jobs
+
+
+def cache_key(job: Dict, jar_digest: str, template: str) -> str:
+    material = {
+        "version": CACHE_VERSION,
+        "model_digest": job["model_digest"],
+        "index": job["index"],
+        "command": job["command"],
+        "jar_sha256": jar_digest,
+        "template": template,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Running
+# ---------------------------------------------------------------------------
+
+def parse_outcome(output: str) -> str:
+    for pattern, outcome in OUTCOME_PATTERNS:
+        if pattern.search(output):
+            return outcome
+    return "unknown"
+
+
+def run_job(job: Dict, template: str, java: str, jar: Path, timeout: int) -> Dict:
+    """Solve one command under a contract; return its report entry (without "cached")."""
+    outdir = tempfile.mkdtemp(prefix="alloy-")
+    try:
+        argv = [a.format(java=java, jar=str(jar), model=job["model"], index=job["index"], outdir=outdir)
+                for a in shlex.split(template)]
+        contract = {
+            "resources": {"timeout_seconds": timeout, "max_output_bytes": MAX_OUTPUT_BYTES, "kill_grace_seconds": 2},
+            "network": {"allowed": False},
+        }
+        result = contract_runner.run_with_contract(contract, argv[0], argv[1:])
+    finally:
+        shutil.rmtree(outdir, ignore_errors=True)
+
+    entry = {k: job[k] for k in ("model", "index", "kind", "command")}
+    if "error" in result:
+        entry.update({"outcome": "error", "solve_seconds": 0.0, "exit_code": None, "timed_out": False,
+                      "detail": result.get("detail", result["error"])})
+        return entry
+    stdout = base64.b64decode(result["stdout_b64"]).decode("utf-8", errors="replace")
+    stderr = base64.b64decode(result["stderr_b64"]).decode("utf-8", errors="replace")
+    if result["timed_out"]:
+        outcome = "timeout"
+    elif result["exit_code"] != 0:
+        outcome = "error"
+    else:
+        outcome = parse_outcome(stdout)
+    entry.update({
+        "outcome": outcome,
+        "solve_seconds": round(result["duration_seconds"], 6),
+        "exit_code": result["exit_code"],
+        "timed_out": result["timed_out"],
+    })
+    if outcome in ("error", "unknown"):
+        entry["stderr_tail"] = stderr[-STDERR_TAIL_BYTES:]
+    return entry
+
+
+def run_all(
+    jobs: List[Dict],
+    template: str,
+    java: str,
+    jar: Path,
+    jar_digest: str,
+    workers: int,
+    timeout: int,
+    cache_dir: Optional[Path],
+) -> Iterator[Dict]:
+    """Yield report entries as commands finish; cache hits are yielded first."""
+    pending = []
+    for job in jobs:
+        key = cache_key(job, jar_digest, template)
+        entry = None
+        if cache_dir:
+            try:
+                entry = json.loads((cache_dir / f"{key}.json").read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                entry = None
+        if entry:
+            yield {**entry, "model": job["model"], "cached": True}
+        else:
+            pending.append((key, job))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(run_job, job, template, java, jar, timeout): key for key, job in pending}
+        for fut in as_completed(futures):
+            entry = fut.result()
+            if cache_dir and entry["outcome"] in ("sat", "unsat"):
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp = cache_dir / f".{futures[fut]}.tmp"
+                tmp.write_text(json.dumps(entry), encoding="utf-8")
+                os.replace(tmp, cache_dir / f"{futures[fut]}.json")
+            yield {**entry, "cached": False}
+
+
+def summarize(results: List[Dict]) -> Dict:
+    summary = {"commands": len(results), "sat": 0, "unsat": 0, "unknown": 0, "timeout": 0, "error": 0,
+               "violated_checks": 0, "cache_hits": 0}
+    for r in results:
+        summary[r["outcome"]] += 1
+        summary["violated_checks"] += r["kind"] == "check" and r["outcome"] == "sat"
+        summary["cache_hits"] += r["cached"]
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Run Alloy run/check commands headless and in parallel")
+    ap.add_argument("models", nargs="*", help="Model files (default: spec/*.als with commands, plus slices)")
+    ap.add_argument("--spec-dir", default=str(ROOT / "spec"))
+    ap.add_argument("--no-slices", action="store_true", help="Skip spec/slices/manifest.json")
+    ap.add_argument("--jar", default=None, help="Local Alloy jar (default: ALLOY_JAR or vendor/, tools/, spec/)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="Seconds per command")
+    ap.add_argument("--cmd", default=os.environ.get("ALLOY_CMD", DEFAULT_CMD), help="Solver command template")
+    ap.add_argument("--art-dir", default=os.environ.get("ART_DIR", "artifacts"))
+    ap.add_argument("--cache-dir", default=None, help="Default: ALLOY_CACHE_DIR or <art-dir>/alloy_cache")
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument("--report", default=None, help="Default: <art-dir>/alloy_report.json")
+    ap.add_argument("--list", action="store_true", help="Print the commands that would run and exit")
+    args = ap.parse_args(argv)
+
+    models = [Path(m) for m in args.models] or discover_models(Path(args.spec_dir), not args.no_slices)
+    missing = [m for m in models if not m.is_file()]
+    if missing:
+        print(f"[alloy_runner] ERROR: model not found: {missing[0]}", file=sys.stderr)
+        sys.exit(1)
+    jobs = build_jobs(models)
+    if args.list:
+        for job in jobs:
+            print(f"{job['model']}#{job['index']}\t{job['command']}")
+        return
+
+    jar = find_jar(args.jar)
+    if jar is None or not jar.is_file():
+        print(f"[alloy_runner] ERROR: no local Alloy jar ({jar or 'set --jar or ALLOY_JAR'}); "
+              "nothing is downloaded", file=sys.stderr)
+        sys.exit(1)
+    java = ""
+    if "{java}" in args.cmd:
+        java_home = os.environ.get("JAVA_HOME")
+        java = shutil.which("java") or (os.path.join(java_home, "bin", "java") if java_home else "")
+        if not java or not os.path.isfile(java):
+            print("[alloy_runner] ERROR: java not found (install a JRE or set JAVA_HOME)", file=sys.stderr)
+            sys.exit(1)
+
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = Path(args.cache_dir or os.environ.get("ALLOY_CACHE_DIR")
+                         or os.path.join(args.art_dir, "alloy_cache"))
+
+    t0 = time.monotonic()
+    jar_digest = contract_runner.sha256_of_file(str(jar))
+    results = []
+    for entry in run_all(jobs, args.cmd, java, jar, jar_digest, args.jobs, args.timeout, cache_dir):
+        results.append(entry)
+        note = " (cached)" if entry["cached"] else ""
+        print(f"[alloy_runner] {entry['model']}#{entry['index']} {entry['command']}: "
+              f"{entry['outcome']} in {entry['solve_seconds']:.2f}s{note}")
+    results.sort(key=lambda r: (r["model"], r["index"]))
+    summary = summarize(results)
+
+    report = {
+        "version": REPORT_VERSION,
+        "jar": str(jar),
+        "jar_sha256": jar_digest,
+        "workers": args.jobs,
+        "wall_seconds": round(time.monotonic() - t0, 6),
+        "summary": summary,
+        "results": results,
+    }
+    report_path = Path(args.report or os.path.join(args.art_dir, "alloy_report.json"))
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"[alloy_runner] {summary['commands']} commands: {summary['sat']} sat, {summary['unsat']} unsat, "
+          f"{summary['unknown']} unknown, {summary['timeout']} timeout, {summary['error']} error, "
+          f"{summary['violated_checks']} violated checks, {summary['cache_hits']} cached -> {report_path}")
+    failed = summary["timeout"] + summary["error"] + summary["violated_checks"]
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
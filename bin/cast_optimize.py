@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+cast_optimize.py — shrink asciicast recordings without changing what they show.
+
+Recordings from `asciinema rec` often hold minutes of idle time and thousands
+of one-byte output events (a shell echoing keystrokes, a progress bar). Both
+inflate the file and the player's parse time. This tool rewrites a cast as
+asciicast v2 with:
+
+  - idle gaps between events capped at --idle-limit seconds
+    (default: the header's idle_time_limit, else 2s)
+  - adjacent output events less than --merge-window seconds apart merged
+    into one (up to MAX_MERGE_BYTES per event)
+  - empty output events and resizes to the current size dropped
+
+Input and output are streamed, so memory does not grow with the recording.
+While writing, both the original and the optimized event streams are replayed
+into vtscreen.Screen models; if the final screens differ the output is
+discarded and the tool fails. The written header carries a "cast_optimize"
+key recording the settings, which gen-index.py uses to skip casts that have
+already been optimized. If the rewrite is not smaller than the input (short
+casts gain more from the header key than they lose), the original bytes are
+kept and a <name>.cast.optimize.json sidecar marks the file as done instead.
+
+CLI usage:
+  python3 bin/cast_optimize.py <in.cast> [-o OUT | --in-place] [--idle-limit S] [--merge-window S]
+
+Prints a JSON report:
+  {"input": ..., "output": ..., "bytes_in": ..., "bytes_out": ..., "events_in": ...,
+   "events_out": ..., "byte_reduction": 0.0-1.0, "event_reduction": 0.0-1.0,
+   "duration_in": ..., "duration_out": ..., "screen_equal": true, "kept_original": false}
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import castio
+import vtscreen
+
+DEFAULT_IDLE_LIMIT = 2.0
+# one frame at 60 fps — merged output is indistinguishable during playback
+DEFAULT_MERGE_WINDOW = 1 / 60
+MAX_MERGE_BYTES = 64 * 1024
+HEADER_KEY = "cast_optimize"
+SIDECAR_SUFFIX = ".optimize.json"
+
+
+# ---------------------------------------------------------------------------
+# Event transforms
+# ---------------------------------------------------------------------------
+
+def drop_noop_resizes(events: Iterable[castio.Event], cols: int, rows: int) -> Iterator[castio.Event]:
+    """Skip resize events to the size the terminal already has."""
+    size = (cols, rows)
+    for ev in events:
+        if ev[1] == "r":
+            new = vtscreen.parse_size(ev[2])
+            if new == size:
+                continue
+            if new:
+                size = new
+        yield ev
+
+
+def merge_output(
+    events: Iterable[castio.Event],
+    window: float,
+    max_bytes: int = MAX_MERGE_BYTES,
+) -> Iterator[castio.Event]:
+    """Merge runs of output events that start within window seconds of the
+    run's first event. The merged event keeps the first event's time."""
+    run: Optional[List] = None  # [t, type, [data...], size]
+    for t, typ, data in events:
+        if (
+            run is not None
+            and typ == run[1]
+            and t - run[0] <= window
+            and run[3] + len(data) <= max_bytes
+        ):
+            run[2].append(data)
+            run[3] += len(data)
+            continue
+        if run is not None:
+            yield run[0], run[1], "".join(run[2])
+            run = None
+        if window > 0 and typ in castio.OUTPUT_TYPES:
+            run = [t, typ, [data], len(data)]
+        else:
+            yield t, typ, data
+    if run is not None:
+        yield run[0], run[1], "".join(run[2])
+
+
+def _replayed(events: Iterable[castio.Event], screen: vtscreen.Screen, counter: List) -> Iterator[castio.Event]:
+    """Pass events through, replaying them into screen and counting them."""
+    for ev in events:
+        vtscreen.replay(screen, [ev])
+        counter[0] += 1
+        counter[1] = ev[0]
+        yield ev
+
+
+# ---------------------------------------------------------------------------
+# Optimize
+# ---------------------------------------------------------------------------
+
+def sidecar_path(path: Path) -> Path:
+    return Path(str(path) + SIDECAR_SUFFIX)
+
+
+def _write_sidecar(path: Path, settings: Dict) -> None:
+    st = path.stat()
+    marker = {HEADER_KEY: settings, "kept_original": True,
+              "cast_size": st.st_size, "cast_mtime_ns": st.st_mtime_ns}
+    with open(sidecar_path(path), "w", encoding="utf-8") as fh:
+        json.dump(marker, fh)
+
+
+def is_optimized(path: Path) -> bool:
+    """True if path's header says it was already written by this tool, or a
+    sidecar records that optimizing this exact file did not shrink it."""
+    with castio.open_cast(path) as cast:
+        if HEADER_KEY in cast.header:
+            return True
+    try:
+        with open(sidecar_path(path), "r", encoding="utf-8") as fh:
+            marker = json.load(fh)
+        st = Path(path).stat()
+    except (OSError, ValueError):
+        return False
+    return marker.get("cast_size") == st.st_size and marker.get("cast_mtime_ns") == st.st_mtime_ns
+
+
+def optimize(
+    src: Path,
+    dest: Path,
+    idle_limit: Optional[float] = None,
+    merge_window: float = DEFAULT_MERGE_WINDOW,
+) -> Dict:
+    """Write an optimized copy of src to dest (may be the same path) and
+    return the report. If the optimized cast is not smaller, dest gets the
+    original bytes plus a sidecar marker and report["kept_original"] is True.
+    Raises ValueError if src has no header or the optimized cast would render
+    a different final screen; dest is then left untouched."""
+    src, dest = Path(src), Path(dest)
+    bytes_in = src.stat().st_size
+    tmp = dest.with_name(dest.name + ".tmp")
+    seen_in = [0, 0.0]
+    seen_out = [0, 0.0]
+    with castio.open_cast(src) as cast:
+        if not cast.header:
+            raise ValueError(f"{src}: no asciicast header")
+        if idle_limit is None:
+            idle_limit = float(cast.header.get("idle_time_limit") or DEFAULT_IDLE_LIMIT)
+        cols, rows = castio.header_size(cast.header)
+        screen_in = vtscreen.Screen(cols, rows)
+        screen_out = vtscreen.Screen(cols, rows)
+
+        settings = {"idle_limit": idle_limit, "merge_window": merge_window}
+        header = {k: v for k, v in cast.header.items() if k != "duration"}
+        header[HEADER_KEY] = settings
+        events = _replayed(cast, screen_in, seen_in)
+        events = castio.drop_empty_output(events)
+        events = drop_noop_resizes(events, cols, rows)
+        events = castio.cap_idle(events, idle_limit)
+        events = merge_output(events, merge_window)
+        events = _replayed(events, screen_out, seen_out)
+        try:
+            with open(tmp, "w", encoding="utf-8") as out:
+                out.writelines(castio.iter_v2_lines(header, events))
+            if screen_in.to_dict() != screen_out.to_dict():
+                raise ValueError(f"{src}: optimized cast renders a different final screen")
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+    kept_original = tmp.stat().st_size >= bytes_in
+    if kept_original:
+        tmp.unlink()
+        if dest.resolve() != src.resolve():
+            shutil.copyfile(src, dest)
+        _write_sidecar(dest, settings)
+        seen_out = seen_in
+    else:
+        os.replace(tmp, dest)
+        sidecar_path(dest).unlink(missing_ok=True)
+
+    bytes_out = dest.stat().st_size
+    return {
+        "input": str(src),
+        "output": str(dest),
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "events_in": seen_in[0],
+        "events_out": seen_out[0],
+        "byte_reduction": round(1 - bytes_out / bytes_in, 4) if bytes_in else 0.0,
+        "event_reduction": round(1 - seen_out[0] / seen_in[0], 4) if seen_in[0] else 0.0,
+        "duration_in": round(seen_in[1], 6),
+        "duration_out": round(seen_out[1], 6),
+        "screen_equal": True,
+        "kept_original": kept_original,
+    }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Cap idle time and merge output events in an asciicast")
+    ap.add_argument("cast")
+    dest = ap.add_mutually_exclusive_group()
+    dest.add_argument("-o", "--out", default=None, help="Output path (default: <name>.opt.cast)")
+    dest.add_argument("--in-place", action="store_true", help="Replace the input file")
+    ap.add_argument("--idle-limit", type=float, default=None,
+                    help=f"Max seconds between events (default: header idle_time_limit or {DEFAULT_IDLE_LIMIT})")
+    ap.add_argument("--merge-window", type=float, default=DEFAULT_MERGE_WINDOW,
+                    help="Merge output events closer than this many seconds (0: never)")
+    args = ap.parse_args(argv)
+
+    src = Path(args.cast)
+    if not src.is_file():
+        print(f"[cast_optimize] ERROR: {src} not found", file=sys.stderr)
+        sys.exit(1)
+    if args.in_place:
+        out = src
+    elif args.out:
+        out = Path(args.out)
+    else:
+        out = src.with_name(src.stem + ".opt" + src.suffix)
+    try:
+        report = optimize(src, out, args.idle_limit, args.merge_window)
+    except ValueError as e:
+        print(f"[cast_optimize] ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
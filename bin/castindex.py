@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+castindex.py — keyframe index (.cast.idx) for seeking in asciicast files.
+
+Showing the terminal at time T normally means replaying every event from the
+start. The index stores, every N seconds of recording time or N bytes of
+cast file, the byte offset of the next event line together with the full
+vtscreen.Screen state at that point. Seeking loads the nearest keyframe at or
+before T, seeks the cast file to its offset and replays only the tail.
+
+Sidecar format (<name>.cast.idx, JSON Lines):
+  line 1   {"version": 1, "cast_size": ..., "cast_mtime_ns": ..., "every_seconds": ...,
+            "every_bytes": ..., "events": ..., "duration": ...}
+  then     {"t": ..., "offset": ..., "event": ..., "screen": {...}}   one per keyframe
+where t is the time of the last event applied to screen and offset is the
+byte offset of the first event not yet applied. An index whose cast_size or
+cast_mtime_ns no longer match the cast is stale and is rebuilt.
+
+CLI usage:
+  python3 bin/castindex.py build  <file.cast> [--every-seconds N] [--every-bytes N]
+  python3 bin/castindex.py seek   <file.cast> <seconds>
+  python3 bin/castindex.py thumbs <file.cast> [--out FILE.html]
+"""
+from __future__ import annotations
+
+import html
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import castio
+import vtscreen
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+EVERY_SECONDS = 10.0
+EVERY_BYTES = 1 << 20
+
+
+def index_path(cast_path: Path) -> Path:
+    return Path(str(cast_path) + INDEX_SUFFIX)
+
+
+# ---------------------------------------------------------------------------
+# Build / load
+# ---------------------------------------------------------------------------
+
+def build_index(
+    cast_path: Path,
+    every_seconds: float = EVERY_SECONDS,
+    every_bytes: int = EVERY_BYTES,
+) -> Path:
+    """Scan cast_path once and write its .cast.idx sidecar; return the sidecar path."""
+    cast_path = Path(cast_path)
+    st = cast_path.stat()
+    keyframes: List[Dict] = []
+    with open(cast_path, "rb") as fh:
+        offset = 0
+        header: Optional[Dict] = None
+        while header is None:
+            line = fh.readline()
+            if not line:
+                raise ValueError(f"{cast_path}: no asciicast header")
+            offset += len(line)
+            if line.strip():
+                header = json.loads(line)
+        if not isinstance(header, dict) or header.get("version") not in (2, 3):
+            raise ValueError(f"{cast_path}: only asciicast v2/v3 can be indexed")
+        relative = header["version"] == 3
+        screen = vtscreen.Screen(*castio.header_size(header))
+        keyframes.append({"t": 0.0, "offset": offset, "event": 0, "screen": screen.to_dict()})
+
+        t = 0.0
+        count = 0
+        last_t, last_offset = 0.0, offset
+        for line in fh:
+            if (t - last_t >= every_seconds or offset - last_offset >= every_bytes) and count:
+                keyframes.append({"t": t, "offset": offset, "event": count, "screen": screen.to_dict()})
+                last_t, last_offset = t, offset
+            line_len = len(line)
+            text = line.decode("utf-8", errors="replace").strip()
+            offset += line_len
+            if not text or text.startswith("#"):
+                continue
+            ev = castio.parse_event(text)
+            if ev is None:
+                continue
+            t = t + ev[0] if relative else ev[0]
+            vtscreen.replay(screen, [(t, ev[1], ev[2])])
+            count += 1
+
+    meta = {
+        "version": INDEX_VERSION,
+        "cast_size": st.st_size,
+        "cast_mtime_ns": st.st_mtime_ns,
+        "every_seconds": every_seconds,
+        "every_bytes": every_bytes,
+        "events": count,
+        "duration": t,
+    }
+    dest = index_path(cast_path)
+    tmp = dest.with_name(dest.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as out:
+        out.write(json.dumps(meta) + "\n")
+        for kf in keyframes:
+            out.write(json.dumps(kf) + "\n")
+    os.replace(tmp, dest)
+    return dest
+
+
+def load_index(cast_path: Path, rebuild: bool = True) -> Tuple[Dict, List[Dict]]:
+    """Return (meta, keyframes) for cast_path, (re)building a missing or stale index."""
+    cast_path = Path(cast_path)
+    idx = index_path(cast_path)
+    st = cast_path.stat()
+    if idx.exists():
+        with open(idx, "r", encoding="utf-8") as fh:
+            meta = json.loads(fh.readline() or "{}")
+            if (
+                meta.get("version") == INDEX_VERSION
+                and meta.get("cast_size") == st.st_size
+                and meta.get("cast_mtime_ns") == st.st_mtime_ns
+            ):
+                return meta, [json.loads(ln) for ln in fh if ln.strip()]
+    if not rebuild:
+        raise FileNotFoundError(f"no fresh index for {cast_path}")
+    build_index(cast_path)
+    return load_index(cast_path, rebuild=False)
+
+
+# ---------------------------------------------------------------------------
+# Seek
+# ---------------------------------------------------------------------------
+
+def screen_at(cast_path: Path, t: float) -> vtscreen.Screen:
+    """Screen state after every event with timestamp <= t, via the nearest keyframe."""
+    _, keyframes = load_index(cast_path)
+    kf = keyframes[0]
+    for candidate in keyframes:
+        if candidate["t"] > t:
+            break
+        kf = candidate
+    screen = vtscreen.Screen.from_dict(kf["screen"])
+    with castio.open_cast(cast_path, offset=kf["offset"], t_base=kf["t"]) as cast:
+        for ev in cast:
+            if ev[0] > t:
+                break
+            vtscreen.replay(screen, [ev])
+    return screen
+
+
+# ---------------------------------------------------------------------------
+# Thumbnail strip
+# ---------------------------------------------------------------------------
+
+def write_thumbnails(cast_path: Path, out_path: Optional[Path] = None) -> Path:
+    """Write an HTML strip of every keyframe screen (default: <name>.cast.thumbs.html)."""
+    cast_path = Path(cast_path)
+    meta, keyframes = load_index(cast_path)
+    out_path = out_path or Path(str(cast_path) + ".thumbs.html")
+    title = html.escape(cast_path.name)
+    with open(out_path, "w", encoding="utf-8") as out:
+        out.write(f"""<!doctype html>
+<meta charset='utf-8'>
+<title>{title} (keyframes)</title>
+<style>body{{font-family:system-ui,Segoe UI,Arial,sans-serif;margin:16px}}
+.strip{{display:flex;gap:8px;overflow-x:auto}}figure{{margin:0}}
+pre{{background:#111;color:#eee;padding:4px;border-radius:4px;font-size:4px;line-height:1}}
+figcaption{{font-size:12px;text-align:center}}</style>
+<h2>{title} — {len(keyframes)} keyframes, {meta['events']} events, {meta['duration']:.1f}s</h2>
+<div class="strip">
+""")
+        for kf in keyframes:
+            text = vtscreen.Screen.from_dict(kf["screen"]).text()
+            out.write(
+                f'<figure><pre>{html.escape(text, quote=False)}</pre>'
+                f'<figcaption>{kf["t"]:.1f}s</figcaption></figure>\n'
+            )
+        out.write("</div>\n")
+    return out_path
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Keyframe index for asciicast files")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build", help="Write <file.cast>.idx")
+    p_build.add_argument("cast")
+    p_build.add_argument("--every-seconds", type=float, default=EVERY_SECONDS)
+    p_build.add_argument("--every-bytes", type=int, default=EVERY_BYTES)
+
+    p_seek = sub.add_parser("seek", help="Print the screen at a timestamp")
+    p_seek.add_argument("cast")
+    p_seek.add_argument("seconds", type=float)
+
+    p_thumbs = sub.add_parser("thumbs", help="Write an HTML thumbnail strip of keyframes")
+    p_thumbs.add_argument("cast")
+    p_thumbs.add_argument("--out", default=None)
+
+    args = ap.parse_args(argv)
+    cast = Path(args.cast)
+    if not cast.exists():
+        print(f"[castindex] ERROR: {cast} not found", file=sys.stderr)
+        sys.exit(1)
+    try:
+        if args.cmd == "build":
+            dest = build_index(cast, args.every_seconds, args.every_bytes)
+            print(f"[castindex] wrote {dest}")
+        elif args.cmd == "seek":
+            print(screen_at(cast, args.seconds).text())
+        elif args.cmd == "thumbs":
+            dest = write_thumbnails(cast, Path(args.out) if args.out else None)
+            print(f"[castindex] wrote {dest}")
+    except ValueError as e:
+        print(f"[castindex] ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+castio.py — streaming asciicast reader shared by the cast tools.
+
+Reads asciicast v2 and v3 recordings lazily, one line at a time, and yields
+events as (t, type, data) tuples with t in absolute seconds (v3 stores the
+interval since the previous event; it is accumulated here). Memory use is
+O(longest line), so hour-long recordings can be scanned in constant space.
+asciicast v1 (a single JSON document) is accepted too, but is necessarily
+parsed whole.
+
+Used by:
+  bin/embed_cast_static.py   — transcript + last-frame fallback page
+  bin/verify_selfcontained.py — checks the cast embedded in a wrapper
+  bin/cast_optimize.py       — idle capping / output merging rewrite
+
+Library usage:
+  with castio.open_cast("artifacts/smoke.cast") as cast:
+      cols, rows = castio.header_size(cast.header)
+      for t, typ, data in cast:
+          ...
+
+  store = castio.EventStore.from_events(castio.open_cast(path))  # compact, random access
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import os
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+Event = Tuple[float, str, str]
+
+# Largest asciicast v1 document read when the first line is not a header on
+# its own; anything bigger (or not starting with "{") is rejected unread.
+MAX_V1_BYTES = 64 * 1024 * 1024
+
+OUTPUT_TYPES = ("o", "stdout")
+
+
+# ---------------------------------------------------------------------------
+# Line splitting
+# ---------------------------------------------------------------------------
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Split an iterable of byte chunks into lines (without the newline)."""
+    pending = b""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parts = (pending + chunk).split(b"\n")
+        pending = parts.pop()
+        yield from parts
+    if pending:
+        yield pending
+
+
+def _decode(lines: Iterable[bytes]) -> Iterator[str]:
+    for ln in lines:
+        yield ln.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+# ---------------------------------------------------------------------------
+# Reader
+# ---------------------------------------------------------------------------
+
+def parse_event(line: str) -> Optional[Event]:
+    """Parse one event line into (time field, type, data), or None if malformed.
+
+    The time field is absolute for v2 and the interval since the previous
+    event for v3; CastReader accumulates it.
+    """
+    try:
+        ev = json.loads(line)
+        ts, typ, data = float(ev[0]), ev[1], ev[2]
+    except (ValueError, TypeError, IndexError, KeyError):
+        return None
+    if not isinstance(typ, str):
+        return None
+    return ts, typ, data if isinstance(data, str) else json.dumps(data)
+
+
+def header_size(header: Dict) -> Tuple[int, int]:
+    """(cols, rows) from a v2 (width/height) or v3 (term.cols/rows) header."""
+    term = header.get("term") if isinstance(header.get("term"), dict) else {}
+    cols = header.get("width", term.get("cols", 80))
+    rows = header.get("height", term.get("rows", 24))
+    return int(cols or 80), int(rows or 24)
+
+
+class CastReader:
+    """
+    Lazy asciicast reader. The header is parsed on construction; iterating
+    yields (t, type, data) events. Lines that are not valid events are
+    skipped, counted in `malformed` and passed to on_malformed if given; v3
+    comment lines (#...) are skipped silently. Iterate once — the underlying
+    stream is consumed.
+    """
+
+    def __init__(
+        self,
+        lines: Iterable[str],
+        close: Optional[Callable[[], None]] = None,
+        t_base: float = 0.0,
+        on_malformed: Optional[Callable[[str], None]] = None,
+    ):
+        self._lines = iter(lines)
+        self._close = close
+        self.t_base = t_base
+        self.on_malformed = on_malformed
+        self.header: Dict = {}
+        self.version: Optional[int] = None
+        self.malformed = 0
+        self.events_read = 0
+        self._v1_events: Optional[List] = None
+        self._read_header()
+
+    def _read_header(self) -> None:
+        first = next((ln for ln in self._lines if ln.strip()), None)
+        if first is None:
+            return
+        try:
+            header = json.loads(first)
+        except ValueError:
+            # Multi-line JSON document: asciicast v1 (or not a cast at all),
+            # read up to MAX_V1_BYTES.
+            if not first.lstrip().startswith("{"):
+                self.malformed += 1
+                return
+            parts = [first]
+            size = len(first)
+            for ln in self._lines:
+                parts.append(ln)
+                size += len(ln) + 1
+                if size > MAX_V1_BYTES:
+                    self.malformed += 1
+                    return
+            try:
+                header = json.loads("\n".join(parts))
+            except ValueError:
+                self.malformed += 1
+                return
+        if not isinstance(header, dict):
+            self.malformed += 1
+            return
+        self.version = header.get("version")
+        if self.version == 1 or isinstance(header.get("stdout"), list):
+            self._v1_events = header.pop("stdout", None) or []
+        self.header = header
+
+    def __enter__(self) -> "CastReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._close:
+            self._close()
+            self._close = None
+
+    def __iter__(self) -> Iterator[Event]:
+        return self.events()
+
+    def events(self) -> Iterator[Event]:
+        if self._v1_events is not None:
+            yield from self._v1()
+            return
+        relative = self.version == 3
+        t = self.t_base
+        for ln in self._lines:
+            if not ln.strip() or ln.startswith("#"):
+                continue
+            ev = parse_event(ln)
+            if ev is None:
+                self.malformed += 1
+                if self.on_malformed:
+                    self.on_malformed(ln)
+                continue
+            ts, typ, data = ev
+            t = t + ts if relative else ts
+            self.events_read += 1
+            yield t, typ, data
+        self.close()
+
+    def _v1(self) -> Iterator[Event]:
+        t = 0.0
+        for ev in self._v1_events:
+            try:
+                t += float(ev[0])
+                data = ev[1]
+            except (ValueError, TypeError, IndexError):
+                self.malformed += 1
+                continue
+            self.events_read += 1
+            yield t, "o", data if isinstance(data, str) else json.dumps(data)
+
+
+def open_cast(
+    source,
+    offset: Optional[int] = None,
+    t_base: float = 0.0,
+    on_malformed: Optional[Callable[[str], None]] = None,
+) -> CastReader:
+    """
+    Open a cast from a path, a file object (text or binary), bytes, or an
+    iterable of byte chunks (e.g. a streaming base64 decoder).
+
+    For paths, offset (a byte offset of an event line, e.g. from a .cast.idx
+    keyframe) skips straight to that event after reading the header; t_base
+    is then the absolute time of the event before it, which v3 intervals are
+    added to. on_malformed is called with each event line that fails to parse.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        fh = open(source, "rb")
+        if offset is None:
+            return CastReader(_decode(fh), close=fh.close, on_malformed=on_malformed)
+        header = fh.readline()
+        while header and not header.strip():
+            header = fh.readline()
+        fh.seek(offset)
+        return CastReader(_decode(itertools.chain([header], fh)), close=fh.close, t_base=t_base,
+                          on_malformed=on_malformed)
+    if isinstance(source, (bytes, bytearray)):
+        return CastReader(_decode(iter_lines([bytes(source)])), on_malformed=on_malformed)
+    if hasattr(source, "read"):
+        if isinstance(source.read(0), str):
+            return CastReader((ln.rstrip("\r\n") for ln in source), on_malformed=on_malformed)
+        return CastReader(_decode(source), on_malformed=on_malformed)
+    return CastReader(_decode(iter_lines(source)), on_malformed=on_malformed)
+
+
+# ---------------------------------------------------------------------------
+# Transforms and writing
+# ---------------------------------------------------------------------------
+
+def cap_idle(events: Iterable[Event], limit: Optional[float]) -> Iterator[Event]:
+    """Shorten every gap between events to at most limit seconds (None/0: unchanged)."""
+    shift = 0.0
+    prev: Optional[float] = None
+    for t, typ, data in events:
+        if limit and prev is not None and t - prev > limit:
+            shift += (t - prev) - limit
+        prev = t
+        yield t - shift, typ, data
+
+
+def drop_empty_output(events: Iterable[Event]) -> Iterator[Event]:
+    """Skip output events with no data."""
+    for ev in events:
+        if ev[2] or ev[1] not in OUTPUT_TYPES:
+            yield ev
+
+
+def v2_header(header: Dict) -> Dict:
+    """A v2 header for header (v3 term.cols/rows become width/height)."""
+    cols, rows = header_size(header)
+    out = {"version": 2, "width": cols, "height": rows}
+    out.update({k: v for k, v in header.items() if k not in ("version", "width", "height", "term", "stdout")})
+    return out
+
+
+def iter_v2_lines(header: Dict, events: Iterable[Event]) -> Iterator[str]:
+    """Serialize header and events as asciicast v2 lines (newline-terminated)."""
+    yield json.dumps(v2_header(header), ensure_ascii=False) + "\n"
+    for t, typ, data in events:
+        yield json.dumps([round(t, 6), typ, data], ensure_ascii=False) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Compact event store
+# ---------------------------------------------------------------------------
+
+class EventStore:
+    """
+    Array-backed event list for tools that need random access. Each event
+    costs ~17 bytes plus its UTF-8 payload, instead of a Python list of three
+    objects (~200 bytes + payload).
+    """
+
+    def __init__(self) -> None:
+        self.times = array("d")
+        self.kinds = array("B")
+        self.offsets = array("Q", [0])
+        self.payload = bytearray()
+        self._codes: List[str] = []
+        self._code_ids: Dict[str, int] = {}
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event]) -> "EventStore":
+        store = cls()
+        store.extend(events)
+        return store
+
+    def append(self, t: float, typ: str, data: str) -> None:
+        code = self._code_ids.get(typ)
+        if code is None:
+            if len(self._codes) >= 256:
+                raise ValueError("more than 256 distinct event types")
+            code = self._code_ids[typ] = len(self._codes)
+            self._codes.append(typ)
+        self.times.append(t)
+        self.kinds.append(code)
+        self.payload += data.encode("utf-8", errors="surrogatepass")
+        self.offsets.append(len(self.payload))
+
+    def extend(self, events: Iterable[Event]) -> None:
+        for t, typ, data in events:
+            self.append(t, typ, data)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __getitem__(self, i: int) -> Event:
+        if i < 0:
+            i += len(self.times)
+        if not 0 <= i < len(self.times):
+            raise IndexError("event index out of range")
+        data = self.payload[self.offsets[i]:self.offsets[i + 1]].decode("utf-8", errors="surrogatepass")
+        return self.times[i], self._codes[self.kinds[i]], data
+
+    def __iter__(self) -> Iterator[Event]:
+        for i in range(len(self.times)):
+            yield self[i]
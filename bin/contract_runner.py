@@ -3,13 +3,28 @@
 
 Usage:
   python3 bin/contract_runner.py --contract contract.json --script ./myscript.sh -- [script-args]
+  python3 bin/contract_runner.py --spool [--art-dir DIR] --contract c.json --script ./s.sh
+  python3 bin/contract_runner.py --batch jobs.jsonl [--jobs N] [--tee-dir DIR | --spool]
+
+Batch mode prints one JSON result per line as jobs finish, then a final
+{"summary": {...}} line; exit code 1 if any job failed.
 
 Features implemented:
 - load contract JSON and apply settings
-- verify optional script_sha256
-- enforce timeout_seconds
+- verify optional script_sha256, memoized per (path, inode, size, mtime_ns, digest)
+- enforce timeout_seconds: the child runs in its own session; on timeout its whole
+  process group gets SIGTERM, then SIGKILL after resources.kill_grace_seconds
 - enforce max_output_bytes for combined stdout+stderr
+- single-threaded selectors pump over both pipes; optional tee of output to disk (--tee-dir)
+- apply resources.cpu_seconds / max_address_space_bytes / max_open_files via setrlimit, in a small
+  exec shim rather than preexec_fn (which is unsafe alongside batch worker threads)
+- report the child's rusage (CPU, max RSS, block I/O, context switches)
 - inject contract.env into child's environment
+- spool mode (--spool): stream output to artifact files under ART_DIR with running
+  SHA-256 and head/tail excerpts; result holds paths, sizes and digests only
+- result cache: contracts with "cacheable": true replay a stored successful result
+  keyed by script digest, args, contract env and the digests of contract "inputs"
+- batch mode: many jobs on a bounded worker pool with per-job timeouts
 - return structured JSON with exit code, timings and truncated outputs (base64)
 
 Notes:
@@ -23,14 +38,23 @@ import base64
 import hashlib
 import json
 import os
+import re
+import selectors
 import shlex
+import shutil
 import signal
 import subprocess
 import sys
 import tempfile
 import threading
 import time
-from typing import Dict, Optional
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows; limits and rusage are then skipped
+    resource = None
 
 
 def load_contract(path: str) -> Dict:
@@ -46,56 +70,555 @@ def sha256_of_file(path: str) -> str:
     return h.hexdigest()
 
 
-class OutputCollector:
-    def __init__(self, max_bytes: int):
+class VerifiedScriptCache:
+    """Scripts already checked against an expected digest, keyed by
+    (path, inode, size, mtime_ns, expected digest).
+
+    Any stat change produces a new key, so an edited script is rehashed; the
+    stale entry for that path is dropped. Shared by batch worker threads.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._keys: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: str, expected: str) -> tuple:
+        st = os.stat(path)
+        return (st.st_ino, st.st_size, st.st_mtime_ns, expected.lower())
+
+    def verify(self, path: str, expected: str) -> tuple:
+        """Return (ok, actual_digest_or_None, "hit"|"miss")."""
+        path = os.path.abspath(path)
+        key = self._key(path, expected)
+        with self._lock:
+            if self._keys.get(path) == key:
+                self._keys.move_to_end(path)
+                return True, None, "hit"
+        actual = sha256_of_file(path)
+        ok = actual.lower() == expected.lower()
+        with self._lock:
+            if ok and self._key(path, expected) == key:  # unchanged while hashing
+                self._keys[path] = key
+                self._keys.move_to_end(path)
+                while len(self._keys) > self.max_entries:
+                    self._keys.popitem(last=False)
+            else:
+                self._keys.pop(path, None)
+        return ok, actual, "miss"
+
+
+VERIFIED_SCRIPTS = VerifiedScriptCache()
+
+
+# ---------------------------------------------------------------------------
+# Result cache for deterministic ("cacheable": true) contracts
+# ---------------------------------------------------------------------------
+
+RESULT_CACHE_VERSION = 1
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_dir(art_dir: Optional[str] = None) -> str:
+    """CONTRACT_CACHE_DIR, else <art_dir or ART_DIR or "artifacts">/contract_cache."""
+    if os.environ.get("CONTRACT_CACHE_DIR"):
+        return os.environ["CONTRACT_CACHE_DIR"]
+    return os.path.join(art_dir or os.environ.get("ART_DIR", "artifacts"), "contract_cache")
+
+
+def result_cache_key(contract: Dict, script: str, script_args: list, script_digest: Optional[str] = None) -> str:
+    """Digest of everything a cacheable run's output may depend on.
+
+    Covers the script digest, args, the contract-injected env (not the whole
+    inherited environment), the network hint, max_output_bytes (it shapes the
+    captured output) and the digest of every path in contract "inputs".
+    Raises FileNotFoundError if the script or a declared input is missing.
+    """
+    if script_digest is None:
+        path = script if os.sep in script else (shutil.which(script) or script)
+        script_digest = sha256_of_file(path)
+    material = {
+        "version": RESULT_CACHE_VERSION,
+        "script_sha256": script_digest.lower(),
+        "args": [str(a) for a in script_args],
+        "env": {k: str(v) for k, v in contract.get("env", {}).items()},
+        "network": contract.get("network"),
+        "max_output_bytes": contract.get("resources", {}).get("max_output_bytes"),
+        "inputs": {p: sha256_of_file(p) for p in contract.get("inputs", [])},
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of successful runs: <root>/<key>/{meta.json,stdout,stderr}.
+
+    Entries are written to a temporary directory and renamed into place, so
+    concurrent batch workers never see half-written entries. Eviction is LRU by
+    meta.json mtime (touched on every hit) once the cache exceeds max_bytes;
+    the size of each root is scanned once per process and then kept as a
+    running total, so a put only lists the cache when it may be over the limit.
+    """
+
+    META_KEYS = ("exit_code", "duration_seconds", "stdout_truncated", "stderr_truncated",
+                 "stdout_dropped", "stderr_dropped")
+    _totals: Dict[str, int] = {}
+    _totals_lock = threading.Lock()
+
+    def __init__(self, root: str, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.root = root
         self.max_bytes = max_bytes
-        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return {"meta", "stdout", "stderr"} with the payloads as open binary
+        files (the caller closes them), or None on a miss. Holding the files
+        open keeps a concurrent evict from pulling them out from under the
+        replay. Incomplete entries (legacy, or half-evicted) are removed so the
+        next put can replace them."""
+        entry = os.path.join(self.root, key)
+        files = []
+        try:
+            with open(os.path.join(entry, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if not isinstance(meta, dict) or any(k not in meta for k in self.META_KEYS):
+                raise ValueError("incomplete cache entry")
+            for name in ("stdout", "stderr"):
+                files.append(open(os.path.join(entry, name), "rb"))
+            os.utime(os.path.join(entry, "meta.json"))
+        except (OSError, ValueError):
+            for f in files:
+                f.close()
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            return None
+        return {"meta": meta, "stdout": files[0], "stderr": files[1]}
+
+    def put(self, key: str, meta: Dict, stdout, stderr) -> None:
+        """Store an entry; stdout/stderr are bytes or paths of files to copy."""
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        size = None
+        try:
+            for name, src in (("stdout", stdout), ("stderr", stderr)):
+                dest = os.path.join(tmp, name)
+                if isinstance(src, (bytes, bytearray)):
+                    with open(dest, "wb") as f:
+                        f.write(src)
+                else:
+                    shutil.copyfile(src, dest)
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            entry_size = self._entry_size(tmp)
+            os.replace(tmp, os.path.join(self.root, key))
+            size = entry_size
+        except OSError:
+            pass  # already cached by a concurrent run, or the disk is full: not fatal
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        if size is None:
+            return
+        with self._totals_lock:
+            if self.root in self._totals:
+                self._totals[self.root] += size
+                over = self._totals[self.root] > self.max_bytes
+            else:
+                over = True  # first put for this root in this process: scan once
+            if over:
+                self._totals[self.root] = self.evict()
+
+    @staticmethod
+    def _entry_size(entry: str) -> int:
+        return sum(os.path.getsize(os.path.join(entry, f)) for f in ("meta.json", "stdout", "stderr"))
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache fits max_bytes;
+        return the remaining size."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            if name.startswith(".tmp-"):
+                continue
+            try:
+                size = self._entry_size(entry)
+                used = os.path.getmtime(os.path.join(entry, "meta.json"))
+            except OSError:
+                continue
+            entries.append((used, size, entry))
+            total += size
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+        return total
+
+
+READ_CHUNK = 64 * 1024
+# After the child exits, pipes still held open by its descendants are drained
+# until they have been quiet this long.
+DRAIN_GRACE_SECONDS = 2.0
+# Default SIGTERM → SIGKILL grace on timeout (contract: resources.kill_grace_seconds).
+KILL_GRACE_SECONDS = 5.0
+# How often the pump checks for child exit and deadlines while the child runs.
+POLL_INTERVAL = 0.1
+# Size of the head and tail excerpts kept per stream in spool mode.
+EXCERPT_BYTES = 4096
+
+
+class OutputBudget:
+    """Byte allowance shared by stdout and stderr (max_output_bytes is combined)."""
+
+    def __init__(self, max_bytes: int):
+        self.remaining = max_bytes
+
+    def take(self, n: int) -> int:
+        granted = min(n, max(self.remaining, 0))
+        self.remaining -= granted
+        return granted
+
+
+class OutputCollector:
+    """Captured bytes of one stream, charged against the shared OutputBudget.
+
+    keep=True holds the bytes in memory (inline mode). keep=False keeps only a
+    running SHA-256 and head/tail excerpts, with the bytes going to tee_path
+    (spool mode), so memory stays O(EXCERPT_BYTES) whatever the output size.
+    """
+
+    def __init__(self, budget: OutputBudget, tee_path: Optional[str] = None, keep: bool = True):
+        self.budget = budget
+        self.keep = keep
         self.data = bytearray()
+        self.size = 0
         self.truncated = False
+        self.dropped = 0
+        self.sha256 = hashlib.sha256()
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.tee_path = tee_path
+        self._tee = open(tee_path, "wb", buffering=0) if tee_path else None
 
     def feed(self, chunk: bytes):
-        with self.lock:
-            remaining = self.max_bytes - len(self.data)
-            if remaining <= 0:
-                self.truncated = True
-                return
-            if len(chunk) <= remaining:
-                self.data.extend(chunk)
+        granted = self.budget.take(len(chunk))
+        if granted:
+            kept = chunk[:granted]
+            self.size += granted
+            if self.keep:
+                self.data.extend(kept)
             else:
-                self.data.extend(chunk[:remaining])
-                self.truncated = True
+                self.sha256.update(kept)
+                if len(self.head) < EXCERPT_BYTES:
+                    self.head.extend(kept[:EXCERPT_BYTES - len(self.head)])
+                self.tail.extend(kept[-EXCERPT_BYTES:])
+                del self.tail[:-EXCERPT_BYTES]
+            if self._tee:
+                self._tee.write(kept)
+        if granted < len(chunk):
+            self.truncated = True
+            self.dropped += len(chunk) - granted
+
+    def close(self):
+        if self._tee:
+            self._tee.close()
+            self._tee = None
 
     def get_bytes(self) -> bytes:
-        with self.lock:
-            return bytes(self.data)
+        return bytes(self.data)
+
+    def artifact(self) -> Dict:
+        """Spool-mode summary: file name/path, size, digest and text excerpts."""
+        return {
+            "name": os.path.basename(self.tee_path),
+            "path": self.tee_path,
+            "size": self.size,
+            "sha256": self.sha256.hexdigest(),
+            "head": self.head.decode("utf-8", errors="replace"),
+            "tail": self.tail.decode("utf-8", errors="replace") if self.size > EXCERPT_BYTES else "",
+        }
+
+
+def spool_prefix(script: str) -> str:
+    """Unique artifact name prefix for one run: <script-stem>-<UTC stamp>-<random>."""
+    stem = os.path.splitext(os.path.basename(script))[0] or "run"
+    return f"{stem}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{os.urandom(4).hex()}"
+
+
+# ---------------------------------------------------------------------------
+# Resource limits and accounting
+# ---------------------------------------------------------------------------
+
+# contract.resources key -> resource.RLIMIT_* name
+RLIMIT_KEYS = {
+    "cpu_seconds": "RLIMIT_CPU",
+    "max_address_space_bytes": "RLIMIT_AS",
+    "max_open_files": "RLIMIT_NOFILE",
+}
+
+
+def resolve_limits(resources: Dict) -> Dict[str, int]:
+    """Return {contract key: value} for the rlimits requested in contract.resources.
+
+    Values are clamped to the current hard limit, which an unprivileged child
+    cannot raise.
+    """
+    if resource is None:
+        return {}
+    limits: Dict[str, int] = {}
+    for key, rname in RLIMIT_KEYS.items():
+        if resources.get(key) is None:
+            continue
+        value = int(resources[key])
+        _, hard = resource.getrlimit(getattr(resource, rname))
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        limits[key] = value
+    return limits
+
+
+# Applies the limits and execs the command. Runs as its own interpreter
+# because preexec_fn is not safe while other threads (batch workers) run.
+LIMITS_SHIM = """
+import json, os, resource, sys
+limits = json.loads(sys.argv[1])
+try:
+    for name, soft, hard in limits:
+        resource.setrlimit(getattr(resource, name), (soft, hard))
+except (ValueError, OSError) as e:
+    sys.stderr.write("[contract_runner] ERROR: setrlimit failed: %s\\n" % e)
+    os._exit(126)
+try:
+    os.execvp(sys.argv[2], sys.argv[2:])
+except OSError as e:
+    sys.stderr.write("[contract_runner] ERROR: exec %s failed: %s\\n" % (sys.argv[2], e))
+    os._exit(127)
+"""
 
 
-def stream_reader(pipe, collector: OutputCollector):
-    try:
-        while True:
-            chunk = pipe.read(1024)
-            if not chunk:
-                break
-            collector.feed(chunk)
-            # If collector is full, continue reading but don't store beyond limit
-    except Exception:
-        pass
+def _limits_argv(limits: Dict[str, int], cmd: List[str]) -> List[str]:
+    """Wrap cmd in LIMITS_SHIM so limits are applied in the child before exec."""
+    rlimits = []
+    for key, value in limits.items():
+        rname = RLIMIT_KEYS[key]
+        _, hard = resource.getrlimit(getattr(resource, rname))
+        if key == "cpu_seconds":
+            # SIGXCPU at the soft limit, SIGKILL one second later.
+            hard_cap = value + 1 if hard == resource.RLIM_INFINITY else min(value + 1, hard)
+            rlimits.append((rname, value, hard_cap))
+        else:
+            rlimits.append((rname, value, value))
+    return [sys.executable, "-S", "-c", LIMITS_SHIM, json.dumps(rlimits)] + cmd
+
+
+def rusage_dict(ru) -> Dict:
+    """Flatten a struct_rusage into the result's "rusage" object (max RSS in KiB on Linux)."""
+    return {
+        "user_cpu_seconds": round(ru.ru_utime, 6),
+        "sys_cpu_seconds": round(ru.ru_stime, 6),
+        "max_rss_kb": ru.ru_maxrss,
+        "block_input_ops": ru.ru_inblock,
+        "block_output_ops": ru.ru_oublock,
+        "voluntary_ctx_switches": ru.ru_nvcsw,
+        "involuntary_ctx_switches": ru.ru_nivcsw,
+    }
+
+
+class Child:
+    """Popen handle for a child started in its own session (process group).
+
+    Reaps with os.wait4 so the child's rusage is kept — Popen.poll()/wait()/
+    kill() would reap through waitpid and discard it, so they must not be
+    called on the wrapped process. Signals go to the whole group, and the
+    monotonic time of each phase boundary is recorded for phases().
+    """
+
+    def __init__(self, proc: subprocess.Popen):
+        self.proc = proc
+        self.rusage: Optional[Dict] = None
+        self.started = time.monotonic()
+        self.term_sent: Optional[float] = None
+        self.kill_sent: Optional[float] = None
+        self.exited: Optional[float] = None
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.proc.returncode
+
+    def _reap(self, options: int) -> None:
+        if self.proc.returncode is not None:
+            return
+        if not hasattr(os, "wait4"):
+            if options == 0:
+                self.proc.wait()
+            else:
+                self.proc.poll()
+        else:
+            pid, status, ru = os.wait4(self.proc.pid, options)
+            if pid:
+                self.proc.returncode = os.waitstatus_to_exitcode(status)
+                self.rusage = rusage_dict(ru)
+        if self.proc.returncode is not None:
+            self.exited = time.monotonic()
+
+    def poll(self) -> Optional[int]:
+        self._reap(os.WNOHANG)
+        return self.proc.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if timeout is None:
+            self._reap(0)
+            return self.proc.returncode
+        end = time.monotonic() + timeout
+        while self.poll() is None:
+            if time.monotonic() >= end:
+                raise subprocess.TimeoutExpired(self.proc.args, timeout)
+            time.sleep(0.05)
+        return self.proc.returncode
+
+    def signal_group(self, sig: int) -> None:
+        """Send sig to the child's process group (its pid, via start_new_session)."""
+        try:
+            os.killpg(self.proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def terminate(self) -> None:
+        if self.term_sent is None:
+            self.term_sent = time.monotonic()
+        self.signal_group(signal.SIGTERM)
 
+    def kill(self) -> None:
+        if self.kill_sent is None:
+            self.kill_sent = time.monotonic()
+        self.signal_group(signal.SIGKILL)
+
+    def escalate(self, grace: float) -> None:
+        """Blocking SIGTERM → grace → SIGKILL of the group, then reap."""
+        self.terminate()
+        try:
+            self.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            self.kill()
+            self.wait()
+        self.signal_group(signal.SIGKILL)  # stragglers that outlived the leader
+
+    def phases(self, drained: float) -> Dict:
+        """Seconds spent running, terminating (SIGTERM grace), killing and draining pipes."""
+        exited = self.exited if self.exited is not None else drained
+        run_end = self.term_sent if self.term_sent is not None else exited
+        term_end = self.kill_sent if self.kill_sent is not None else exited
+        return {
+            "escalation": "sigkill" if self.kill_sent else "sigterm" if self.term_sent else "none",
+            "run_seconds": round(run_end - self.started, 6),
+            "terminate_seconds": round(term_end - self.term_sent, 6) if self.term_sent else 0.0,
+            "kill_seconds": round(exited - self.kill_sent, 6) if self.kill_sent else 0.0,
+            "drain_seconds": round(max(drained - exited, 0.0), 6),
+        }
+
+
+def pump(proc: Child, streams: Dict, deadline: float, grace: float = KILL_GRACE_SECONDS) -> Tuple[bool, bool]:
+    """Read the child's pipes on this thread until EOF; return (timed_out,
+    pipes_left_open).
+
+    streams maps each pipe to its OutputCollector. Reads are non-blocking and
+    READ_CHUNK-sized; bytes over budget are still read (and dropped) so the child
+    never stalls on a full pipe. At the deadline the process group gets SIGTERM,
+    then SIGKILL if the child outlives grace; pipes keep being drained
+    throughout, so nothing written before the kill is lost. Once the child has
+    exited, pipes still held by its descendants are abandoned after
+    DRAIN_GRACE_SECONDS of quiet; pipes_left_open reports that anything they
+    write later is not captured.
+    """
+    sel = selectors.DefaultSelector()
+    for pipe, collector in streams.items():
+        os.set_blocking(pipe.fileno(), False)
+        sel.register(pipe, selectors.EVENT_READ, collector)
 
-def run_with_contract(contract: Dict, script: str, script_args: list) -> Dict:
+    timed_out = False
+    term_deadline: Optional[float] = None
+    try:
+        while sel.get_map():
+            now = time.monotonic()
+            if proc.returncode is None and proc.poll() is not None and timed_out:
+                # The leader exited on SIGTERM; kill group members still holding the pipes.
+                proc.signal_group(signal.SIGKILL)
+            if proc.returncode is None:
+                if term_deadline is None and now >= deadline:
+                    timed_out = True
+                    proc.terminate()
+                    term_deadline = now + grace
+                elif term_deadline is not None and now >= term_deadline:
+                    proc.kill()
+                    proc.wait()
+                    proc.signal_group(signal.SIGKILL)
+            exited = proc.returncode is not None
+            if exited and now >= max(deadline, proc.exited) + DRAIN_GRACE_SECONDS:
+                break
+            events = sel.select(timeout=DRAIN_GRACE_SECONDS if exited else POLL_INTERVAL)
+            if not events:
+                if exited:
+                    break
+                continue
+            for key, _ in events:
+                try:
+                    chunk = os.read(key.fd, READ_CHUNK)
+                except BlockingIOError:
+                    continue
+                if chunk:
+                    key.data.feed(chunk)
+                else:
+                    sel.unregister(key.fileobj)
+        pipes_left_open = bool(sel.get_map())
+    finally:
+        sel.close()
+    return timed_out, pipes_left_open
+
+
+def run_with_contract(
+    contract: Dict,
+    script: str,
+    script_args: list,
+    tee_dir: Optional[str] = None,
+    spool_dir: Optional[str] = None,
+    spool_name: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    cache_max_bytes: int = RESULT_CACHE_MAX_BYTES,
+) -> Dict:
+    """Run script under contract and return the structured result dict.
+
+    tee_dir    — if set, captured stdout/stderr are also written to
+                 <tee_dir>/stdout and <tee_dir>/stderr as they arrive.
+    spool_dir  — if set (spool mode, takes precedence over tee_dir), output is
+                 streamed to <spool_dir>/<name>.stdout.log and .stderr.log and
+                 the result carries "stdout"/"stderr" artifact objects (name,
+                 path, size, sha256, head, tail) instead of *_b64 fields. With
+                 spool_dir = ART_DIR the names can be passed straight to
+                 `evidence_graph.py link`.
+    spool_name — artifact name prefix (default: spool_prefix(script)).
+    cache_dir  — result cache for contracts with "cacheable": true
+                 (default: default_cache_dir()). A hit replays the stored output
+                 in whichever mode was requested, without running the script;
+                 only successful runs are stored. See result_cache_key().
+    """
     timeout = int(contract.get("resources", {}).get("timeout_seconds", 300))
     max_output = int(contract.get("resources", {}).get("max_output_bytes", 10 * 1024 * 1024))
+    grace = float(contract.get("resources", {}).get("kill_grace_seconds", KILL_GRACE_SECONDS))
 
     # integrity check
     expected_sha = contract.get("integrity", {}).get("script_sha256")
+    integrity_cache = None
     if expected_sha:
-        actual = sha256_of_file(script)
-        if actual.lower() != expected_sha.lower():
+        try:
+            verified, actual, integrity_cache = VERIFIED_SCRIPTS.verify(script, expected_sha)
+        except FileNotFoundError as e:
+            return {"ok": False, "error": "script_not_found", "detail": str(e)}
+        if not verified:
             return {
                 "ok": False,
                 "error": "script_sha256_mismatch",
                 "expected": expected_sha,
                 "actual": actual,
+                "integrity_cache": integrity_cache,
             }
 
     # Prepare environment for child
@@ -109,74 +632,290 @@ def run_with_contract(contract: Dict, script: str, script_args: list) -> Dict:
 
     cmd = [script] + script_args
 
-    collector = OutputCollector(max_output)
-    collector_err = OutputCollector(max_output)
+    cache = cache_key = cached = None
+    if contract.get("cacheable"):
+        cache = ResultCache(cache_dir or default_cache_dir(), cache_max_bytes)
+        try:
+            cache_key = result_cache_key(contract, script, script_args, expected_sha)
+        except FileNotFoundError as e:
+            return {"ok": False, "error": "input_not_found", "detail": str(e)}
+        cached = cache.get(cache_key)
+
+    # Limits go through LIMITS_SHIM (one extra exec, only when requested);
+    # they are clamped in the parent beforehand.
+    limits = resolve_limits(contract.get("resources", {}))
+
+    def make_collectors():
+        budget = OutputBudget(max_output)
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+            prefix = os.path.join(spool_dir, spool_name or spool_prefix(script))
+            return (OutputCollector(budget, prefix + ".stdout.log", keep=False),
+                    OutputCollector(budget, prefix + ".stderr.log", keep=False))
+        if tee_dir:
+            os.makedirs(tee_dir, exist_ok=True)
+        return (OutputCollector(budget, os.path.join(tee_dir, "stdout") if tee_dir else None),
+                OutputCollector(budget, os.path.join(tee_dir, "stderr") if tee_dir else None))
 
     start = time.time()
-    try:
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=child_env,
-        )
-    except FileNotFoundError as e:
-        return {"ok": False, "error": "script_not_found", "detail": str(e)}
-
-    threads = []
-    if proc.stdout:
-        t = threading.Thread(target=stream_reader, args=(proc.stdout, collector), daemon=True)
-        t.start()
-        threads.append(t)
-    if proc.stderr:
-        t2 = threading.Thread(target=stream_reader, args=(proc.stderr, collector_err), daemon=True)
-        t2.start()
-        threads.append(t2)
-
-    timed_out = False
-    try:
-        proc.wait(timeout=timeout)
-    except subprocess.TimeoutExpired:
-        timed_out = True
+    if cached:
+        collector, collector_err = make_collectors()
+        for c, src in ((collector, cached["stdout"]), (collector_err, cached["stderr"])):
+            with src as f:
+                for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+                    c.feed(chunk)
+            c.close()
+        meta = cached["meta"]
+        collector.truncated, collector_err.truncated = meta["stdout_truncated"], meta["stderr_truncated"]
+        collector.dropped, collector_err.dropped = meta["stdout_dropped"], meta["stderr_dropped"]
+        result = {
+            "ok": True,
+            "exit_code": meta["exit_code"],
+            "timed_out": False,
+            "duration_seconds": time.time() - start,
+            "cached_duration_seconds": meta["duration_seconds"],
+        }
+        proc = None
+    else:
+        if limits:
+            # The shim reports a missing script only as exit 127; check first.
+            found = os.path.isfile(script) if os.sep in script else shutil.which(script, path=child_env.get("PATH"))
+            if not found:
+                return {"ok": False, "error": "script_not_found", "detail": f"No such file or directory: {script!r}"}
         try:
-            proc.kill()
-        except Exception:
-            pass
+            proc = Child(subprocess.Popen(
+                _limits_argv(limits, cmd) if limits else cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=child_env,
+                start_new_session=True,
+            ))
+        except FileNotFoundError as e:
+            return {"ok": False, "error": "script_not_found", "detail": str(e)}
+
+        collector, collector_err = make_collectors()
+        deadline = time.monotonic() + timeout
+        try:
+            streams = {proc.proc.stdout: collector, proc.proc.stderr: collector_err}
+            timed_out, pipes_left_open = pump(proc, streams, deadline, grace)
+            # Both pipes closed but the child is still running (it closed them itself).
+            if proc.poll() is None:
+                try:
+                    proc.wait(timeout=max(deadline - time.monotonic(), 0))
+                except subprocess.TimeoutExpired:
+                    timed_out = True
+                    proc.escalate(grace)
+        finally:
+            proc.proc.stdout.close()
+            proc.proc.stderr.close()
+            collector.close()
+            collector_err.close()
+
+        end = time.time()
+        result = {
+            "ok": not timed_out and proc.returncode == 0,
+            "exit_code": proc.returncode,
+            "timed_out": timed_out,
+            "pipes_left_open": pipes_left_open,
+            "duration_seconds": end - start,
+            "phases": proc.phases(time.monotonic()),
+        }
+
+    if integrity_cache:
+        result["integrity_cache"] = integrity_cache
+    if cache_key:
+        result["result_cache"] = "hit" if cached else "miss"
+        result["result_cache_key"] = cache_key
+    if spool_dir:
+        result["stdout"] = collector.artifact()
+        result["stderr"] = collector_err.artifact()
+    else:
+        result["stdout_b64"] = base64.b64encode(collector.get_bytes()).decode("ascii")
+        result["stderr_b64"] = base64.b64encode(collector_err.get_bytes()).decode("ascii")
+    result.update({
+        "stdout_truncated": collector.truncated,
+        "stderr_truncated": collector_err.truncated,
+        "combined_output_bytes": collector.size + collector_err.size,
+        "dropped_output_bytes": collector.dropped + collector_err.dropped,
+    })
+    if tee_dir and not spool_dir:
+        result["stdout_path"] = collector.tee_path
+        result["stderr_path"] = collector_err.tee_path
+    if proc is not None:
+        if limits:
+            result["limits"] = limits
+        if proc.rusage is not None:
+            result["rusage"] = proc.rusage
+
+    # Output may be incomplete if a descendant still held a pipe: don't cache it.
+    if cache_key and not cached and result["ok"] and not result.get("pipes_left_open"):
+        cache.put(
+            cache_key,
+            {
+                "exit_code": result["exit_code"],
+                "duration_seconds": result["duration_seconds"],
+                "stdout_truncated": collector.truncated,
+                "stderr_truncated": collector_err.truncated,
+                "stdout_dropped": collector.dropped,
+                "stderr_dropped": collector_err.dropped,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            collector.get_bytes() if collector.keep else collector.tee_path,
+            collector_err.get_bytes() if collector_err.keep else collector_err.tee_path,
+        )
 
-    # Allow reader threads to drain
-    for t in threads:
-        t.join(timeout=1)
+    return result
 
-    end = time.time()
 
-    out_bytes = collector.get_bytes()
-    err_bytes = collector_err.get_bytes()
+# Job ids name the job's --tee-dir subdirectory, so they must be one path component.
+JOB_ID_RE = re.compile(r"[\w.-]+")
 
-    combined_len = len(out_bytes) + len(err_bytes)
-    output_truncated = collector.truncated or collector_err.truncated or (combined_len >= max_output)
 
-    result = {
-        "ok": not timed_out and proc.returncode == 0,
-        "exit_code": proc.returncode,
-        "timed_out": timed_out,
-        "duration_seconds": end - start,
-        "stdout_b64": base64.b64encode(out_bytes).decode("ascii"),
-        "stderr_b64": base64.b64encode(err_bytes).decode("ascii"),
-        "stdout_truncated": collector.truncated,
-        "stderr_truncated": collector_err.truncated,
-        "combined_output_bytes": combined_len,
-    }
+def load_jobs(path: str) -> List[Dict]:
+    """Parse a batch file: one JSON object per line, blank lines and # comments skipped.
 
-    return result
+    Each job has "script", optional "args" (list), optional "id" (default: the
+    line number; letters, digits, "_", "." and "-" only, unique within the
+    file), and "contract" given inline (object) or as a path to a contract JSON
+    file. An optional "timeout_seconds" overrides the contract's
+    resources.timeout_seconds. Malformed lines become jobs with an "error" key
+    so they are reported, not lost.
+    """
+    jobs: List[Dict] = []
+    contracts: Dict[str, Dict] = {}
+    seen_ids: set = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            job_id = str(lineno)
+            try:
+                raw = json.loads(line)
+                job_id = str(raw.get("id", job_id))
+                if not JOB_ID_RE.fullmatch(job_id) or job_id in (".", ".."):
+                    raise ValueError(f"invalid job id {job_id!r}")
+                if job_id in seen_ids:
+                    raise ValueError(f"duplicate job id {job_id!r}")
+                seen_ids.add(job_id)
+                contract = raw.get("contract", {})
+                if isinstance(contract, str):
+                    if contract not in contracts:
+                        contracts[contract] = load_contract(contract)
+                    contract = contracts[contract]
+                contract = dict(contract)
+                if "timeout_seconds" in raw:
+                    contract["resources"] = dict(contract.get("resources", {}))
+                    contract["resources"]["timeout_seconds"] = raw["timeout_seconds"]
+                args = raw.get("args", [])
+                if not isinstance(raw["script"], str) or not isinstance(args, list):
+                    raise ValueError("script must be a string and args a list")
+                jobs.append({"id": job_id, "contract": contract, "script": raw["script"],
+                             "args": [str(a) for a in args]})
+            except (ValueError, KeyError, TypeError, AttributeError, OSError) as e:
+                jobs.append({"id": job_id, "error": f"line {lineno}: {e}"})
+    return jobs
+
+
+def run_batch(
+    jobs: List[Dict],
+    workers: int,
+    tee_dir: Optional[str] = None,
+    spool_dir: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    cache_max_bytes: int = RESULT_CACHE_MAX_BYTES,
+) -> Iterator[Dict]:
+    """Run jobs on a bounded thread pool, yielding each result as it finishes.
+
+    Every result carries the job "id" and "started"/"finished" offsets in
+    seconds from batch start. The final item yielded is {"summary": {...}} with
+    job counts (including integrity and result cache hits/misses), wall_seconds,
+    busy_seconds (sum of job durations) and
+    slot_utilization = busy_seconds / (wall_seconds * workers).
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    workers = max(1, workers)
+    t0 = time.monotonic()
+
+    def run_one(job: Dict) -> Dict:
+        started = time.monotonic() - t0
+        if "error" in job:
+            result = {"ok": False, "error": "invalid_job", "detail": job["error"]}
+        else:
+            job_tee = os.path.join(tee_dir, job["id"]) if tee_dir else None
+            try:
+                result = run_with_contract(
+                    job["contract"], job["script"], job["args"], tee_dir=job_tee, spool_dir=spool_dir,
+                    cache_dir=cache_dir, cache_max_bytes=cache_max_bytes,
+                )
+            except Exception as e:  # a bad job must not take down the batch
+                result = {"ok": False, "error": "runner_exception", "detail": str(e)}
+        finished = time.monotonic() - t0
+        return {"id": job["id"], **result, "started": round(started, 6), "finished": round(finished, 6)}
+
+    counts = {"jobs": len(jobs), "ok": 0, "failed": 0, "timed_out": 0,
+              "integrity_cache_hits": 0, "integrity_cache_misses": 0,
+              "result_cache_hits": 0, "result_cache_misses": 0}
+    busy = 0.0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_one, job) for job in jobs]
+        for fut in as_completed(futures):
+            result = fut.result()
+            busy += result["finished"] - result["started"]
+            counts["ok" if result["ok"] else "failed"] += 1
+            counts["timed_out"] += bool(result.get("timed_out"))
+            cache = result.get("integrity_cache")
+            if cache:
+                counts["integrity_cache_hits" if cache == "hit" else "integrity_cache_misses"] += 1
+            cache = result.get("result_cache")
+            if cache:
+                counts["result_cache_hits" if cache == "hit" else "result_cache_misses"] += 1
+            yield result
+
+    wall = time.monotonic() - t0
+    yield {"summary": {
+        **counts,
+        "workers": workers,
+        "wall_seconds": round(wall, 6),
+        "busy_seconds": round(busy, 6),
+        "slot_utilization": round(busy / (wall * workers), 4) if wall > 0 else 0.0,
+    }}
 
 
 def main(argv=None):
     parser = argparse.ArgumentParser(description="Contract-enforcing runner")
-    parser.add_argument("--contract", required=True, help="Path to contract JSON")
-    parser.add_argument("--script", required=True, help="Script to run")
+    parser.add_argument("--contract", help="Path to contract JSON")
+    parser.add_argument("--script", help="Script to run")
+    parser.add_argument("--batch", help="JSON Lines file of jobs to run (see load_jobs)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker slots for --batch")
+    parser.add_argument("--tee-dir", default=None, help="Also write stdout/stderr to files in this directory")
+    parser.add_argument("--spool", action="store_true",
+                        help="Stream output to <art-dir>/<name>.{stdout,stderr}.log; result holds paths and digests")
+    parser.add_argument("--spool-name", default=None, help="Artifact name prefix for --spool (single run)")
+    parser.add_argument("--art-dir", default=os.environ.get("ART_DIR", "artifacts"), help="Spool directory")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Result cache for cacheable contracts (default: <art-dir>/contract_cache)")
+    parser.add_argument("--cache-max-bytes", type=int, default=RESULT_CACHE_MAX_BYTES, help="Result cache size bound")
     parser.add_argument("--args", nargs=argparse.REMAINDER, help="Arguments to script (prefix with --)")
     args = parser.parse_args(argv)
 
+    cache_dir = args.cache_dir or default_cache_dir(args.art_dir)
+    if args.batch:
+        if args.contract or args.script:
+            parser.error("--batch cannot be combined with --contract/--script")
+        all_ok = True
+        spool_dir = args.art_dir if args.spool else None
+        items = run_batch(load_jobs(args.batch), args.jobs, tee_dir=args.tee_dir, spool_dir=spool_dir,
+                          cache_dir=cache_dir, cache_max_bytes=args.cache_max_bytes)
+        for item in items:
+            all_ok = all_ok and item.get("ok", True)
+            sys.stdout.write(json.dumps(item) + "\n")
+            sys.stdout.flush()
+        sys.exit(0 if all_ok else 1)
+    if not (args.contract and args.script):
+        parser.error("--contract and --script are required (or use --batch)")
+
     contract = load_contract(args.contract)
 
     script_path = args.script
@@ -185,7 +924,16 @@ def main(argv=None):
     if script_args and script_args[0] == "--":
         script_args = script_args[1:]
 
-    result = run_with_contract(contract, script_path, script_args)
+    result = run_with_contract(
+        contract,
+        script_path,
+        script_args,
+        tee_dir=args.tee_dir,
+        spool_dir=args.art_dir if args.spool else None,
+        spool_name=args.spool_name,
+        cache_dir=cache_dir,
+        cache_max_bytes=args.cache_max_bytes,
+    )
     json.dump(result, sys.stdout, indent=2)
     sys.stdout.write("\n")
 
@@ -1,16 +1,28 @@
 #!/usr/bin/env python3
 """Create a self-contained HTML wrapper for an asciinema .cast file.
 
-Usage: python3 bin/embed_cast.py <input.cast> <output.html>
+Usage: python3 bin/embed_cast.py [--compress gzip|deflate] [--idle-limit SECONDS] <input.cast> <output.html>
 
 The output will inline asciinema-player JS and CSS (prefers local files under
 artifacts/, falls back to CDN), and embed the cast as a data: URL so the HTML
 is portable and can be captured by tools like Hunchly.
+
+With --compress, the cast, JS and CSS are each compressed and base64-encoded
+into inert <script type="application/octet-stream"> blocks, and a small
+bootstrap inflates them in the browser with DecompressionStream (works offline;
+needs a 2023+ browser). Before compression the cast is normalized to v2, empty
+output events are dropped and idle gaps are capped at --idle-limit seconds
+(default: the header's idle_time_limit, else 2; 0 keeps the timing). The
+whole pipeline streams, so memory stays flat for large recordings.
 """
 import sys
 import os
+import argparse
 import base64
 import urllib.request
+import zlib
+
+import castio
 
 ROOT = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
 ART = os.path.join(ROOT, 'artifacts')
@@ -20,10 +32,12 @@ JS_CDN = f'{CDN_BASE}/asciinema-player.min.js'
 CSS_CDN = f'{CDN_BASE}/asciinema-player.min.css'
 
 
-def read_local_or_fetch(path, url):
-    if os.path.isfile(path):
-        with open(path, 'r', encoding='utf-8', errors='replace') as fh:
-            return fh.read()
+def read_local_or_fetch(path, url, fallback=None):
+    """Read path, else fallback (a second local path), else fetch url."""
+    for candidate in (path, fallback):
+        if candidate and os.path.isfile(candidate):
+            with open(candidate, 'r', encoding='utf-8', errors='replace') as fh:
+                return fh.read()
     try:
         with urllib.request.urlopen(url, timeout=10) as r:
             return r.read().decode('utf-8')
@@ -31,6 +45,15 @@ def read_local_or_fetch(path, url):
         return ''
 
 
+def load_player_assets(art_dir=ART):
+    """Return (js, css) for the player: local copies in art_dir, else in the
+    repo's artifacts/, else the CDN."""
+    assets = []
+    for name, url in (('asciinema-player.min.js', JS_CDN), ('asciinema-player.min.css', CSS_CDN)):
+        assets.append(read_local_or_fetch(os.path.join(art_dir, name), url, os.path.join(ART, name)))
+    return tuple(assets)
+
+
 def make_data_url(path):
     with open(path, 'rb') as fh:
         data = fh.read()
@@ -39,6 +62,53 @@ def make_data_url(path):
     return f'data:application/octet-stream;base64,{b64}'
 
 
+# Compressed payload blocks: id -> element, inflated by COMPRESSED_BOOT.
+COMPRESSED_BLOCK = '<script type="application/octet-stream" id="{id}" data-encoding="{encoding}">'
+DEFAULT_IDLE_LIMIT = 2.0
+
+COMPRESSED_HEAD = """<!doctype html>
+<meta charset='utf-8'>
+<title>{title}</title>
+<body style='margin:16px;font-family:system-ui,Segoe UI,Arial,sans-serif'>
+<h2>{title}</h2>
+<div id="player" style='width:100%'></div>
+"""
+
+COMPRESSED_BOOT = """<script>
+(async function () {
+  async function inflate(id) {
+    const el = document.getElementById(id);
+    if (!el) return '';
+    const bin = atob(el.textContent.trim());
+    const bytes = new Uint8Array(bin.length);
+    for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+    const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream(el.dataset.encoding));
+    return await new Response(stream).text();
+  }
+  const css = document.createElement('style');
+  css.textContent = await inflate('player-css');
+  document.head.appendChild(css);
+  const js = document.createElement('script');
+  js.textContent = await inflate('player-js');
+  document.head.appendChild(js);
+  const url = URL.createObjectURL(new Blob([await inflate('cast-data')], {type: 'text/plain'}));
+  const box = document.getElementById('player');
+  if (window.AsciinemaPlayer && AsciinemaPlayer.create) {
+    AsciinemaPlayer.create(url, box, {preload: true});
+  } else {
+    const el = document.createElement('asciinema-player');
+    el.setAttribute('src', url);
+    el.setAttribute('preload', '');
+    el.style.cssText = 'width:100%;height:80vh';
+    box.appendChild(el);
+  }
+})().catch(function (e) {
+  document.getElementById('player').textContent = 'Playback failed: ' + e;
+});
+</script>
+</body>
+"""
+
 HTML_TMPL = """<!doctype html>
 <meta charset='utf-8'>
 <title>{title}</title>
@@ -55,35 +125,87 @@ HTML_TMPL = """<!doctype html>
 """
 
 
-def main():
-    if len(sys.argv) < 3:
-        print('Usage: embed_cast.py <input.cast> <output.html>')
-        sys.exit(2)
-    inp = sys.argv[1]
-    out = sys.argv[2]
+def iter_normalized_cast(path, idle_limit=None):
+    """Yield the cast at path as v2 bytes, minus empty output events and with
+    idle gaps capped (idle_limit None: the header's idle_time_limit, else
+    DEFAULT_IDLE_LIMIT; 0: unchanged)."""
+    with castio.open_cast(path) as cast:
+        if idle_limit is None:
+            idle_limit = cast.header.get('idle_time_limit') or DEFAULT_IDLE_LIMIT
+        events = castio.cap_idle(castio.drop_empty_output(cast), idle_limit)
+        for line in castio.iter_v2_lines(cast.header, events):
+            yield line.encode('utf-8')
+
+
+def iter_compressed_b64(chunks, encoding='gzip'):
+    """Compress byte chunks (gzip or zlib "deflate") and yield base64 text pieces."""
+    comp = zlib.compressobj(9, zlib.DEFLATED, 31 if encoding == 'gzip' else 15)
+    carry = b''
+    for chunk in chunks:
+        data = carry + comp.compress(chunk)
+        cut = len(data) - len(data) % 3
+        carry = data[cut:]
+        if cut:
+            yield base64.b64encode(data[:cut]).decode('ascii')
+    tail = carry + comp.flush()
+    if tail:
+        yield base64.b64encode(tail).decode('ascii')
+
+
+def write_compressed(inp, out, js, css, encoding='gzip', idle_limit=None):
+    """Stream a compressed self-contained wrapper for inp into out."""
+    title = os.path.basename(inp)
+    with open(out, 'w', encoding='utf-8') as fh:
+        fh.write(COMPRESSED_HEAD.format(title=title))
+        blocks = [('player-css', [css.encode('utf-8')] if css else None),
+                  ('player-js', [js.encode('utf-8')] if js else None),
+                  ('cast-data', iter_normalized_cast(inp, idle_limit))]
+        for block_id, chunks in blocks:
+            if chunks is None:
+                continue
+            fh.write(COMPRESSED_BLOCK.format(id=block_id, encoding=encoding))
+            for piece in iter_compressed_b64(chunks, encoding):
+                fh.write(piece)
+            fh.write('</script>\n')
+        fh.write(COMPRESSED_BOOT)
+
+
+def write_raw(inp, out, js, css):
+    """Write the plain wrapper: inline JS/CSS and the cast as a data: URL."""
+    title = os.path.basename(inp)
+    html = HTML_TMPL.format(title=title, css=css, js=js, cast_data=make_data_url(inp))
+    with open(out, 'w', encoding='utf-8') as fh:
+        fh.write(html)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Create a self-contained HTML wrapper for a .cast file')
+    ap.add_argument('input')
+    ap.add_argument('output')
+    ap.add_argument('--compress', choices=['gzip', 'deflate'], default=None,
+                    help='Compress cast, JS and CSS; inflate in the browser')
+    ap.add_argument('--idle-limit', type=float, default=None,
+                    help='With --compress: cap idle gaps at SECONDS (0 = keep timing)')
+    args = ap.parse_args(argv)
+    inp = args.input
+    out = args.output
     if not os.path.isfile(inp):
         print('Input not found:', inp)
         sys.exit(3)
 
-    js_path = os.path.join(ART, 'asciinema-player.min.js')
-    css_path = os.path.join(ART, 'asciinema-player.min.css')
-
-    js = read_local_or_fetch(js_path, JS_CDN)
-    css = read_local_or_fetch(css_path, CSS_CDN)
+    js, css = load_player_assets()
 
     if not js:
         print('Warning: could not find or fetch asciinema-player JS; output may not play.')
     if not css:
         print('Warning: could not find or fetch asciinema-player CSS; output may not style correctly.')
 
-    cast_data = make_data_url(inp)
-
-    title = os.path.basename(inp)
-    html = HTML_TMPL.format(title=title, css=css, js=js, cast_data=cast_data)
-
-    with open(out, 'w', encoding='utf-8') as fh:
-        fh.write(html)
+    if args.compress:
+        write_compressed(inp, out, js, css, args.compress, args.idle_limit)
+        print('Wrote compressed self-contained wrapper:', out)
+        return
 
+    write_raw(inp, out, js, css)
     print('Wrote self-contained wrapper:', out)
 
 
@@ -8,71 +8,77 @@ This creates a lightweight HTML file that contains:
 This is intended as a fallback for environments that strip or block scripts
 (for example, some capture/storage systems). It does not provide interactive
 playback but ensures the recorded output is preserved and viewable.
+
+The cast is read with castio in a single streaming pass: transcript lines are
+written as events arrive and the snapshot comes from replaying the output into
+a vtscreen.Screen of the recorded size, so cursor movement, clears and
+full-screen programs render as they did on the terminal. Memory does not grow
+with the recording length: --keyframes screens are spooled to a temporary
+file as they are rendered and copied in at the end.
+
+--at SECONDS (repeatable) adds the screen at that timestamp. It is resolved
+through the castindex .cast.idx sidecar (built on first use), so each one
+replays only from the nearest keyframe instead of from the start.
+
+Usage:
+  python3 bin/embed_cast_static.py [--keyframes SECONDS] [--at SECONDS ...] <path.cast>
 """
 from pathlib import Path
+import html
 import json
+import shutil
 import sys
+import tempfile
+
+import castindex
+import castio
+import vtscreen
+
 
 def parse_cast(path: Path):
-    text = path.read_text(encoding='utf-8', errors='ignore')
-    lines = [ln for ln in text.splitlines() if ln.strip() != '']
-    if not lines:
-        return None, []
-    header = json.loads(lines[0])
-    events = []
-    for ln in lines[1:]:
-        try:
-            ev = json.loads(ln)
-            events.append(ev)
-        except Exception:
-            # ignore malformed
-            continue
-    return header, events
+    """Return (header, events) with events in a compact castio.EventStore."""
+    with castio.open_cast(path) as cast:
+        if not cast.header:
+            return None, castio.EventStore()
+        return cast.header, castio.EventStore.from_events(cast)
+
+
+def transcript_line(t, typ, data):
+    if typ in castio.OUTPUT_TYPES:
+        return f'[{t:.6f}] {data}'
+    return f'[{t:.6f}] ({typ}) {data}'
+
 
 def render_transcript(events):
-    # events are typically [time, type, data]
-    out = []
-    for ev in events:
-        if not isinstance(ev, list) or len(ev) < 3:
-            continue
-        t, typ, data = ev[0], ev[1], ev[2]
-        if typ == 'o' or typ == 'stdout':
-            out.append(f'[{t:.6f}] {data}')
-        else:
-            out.append(f'[{t:.6f}] ({typ}) {data}')
-    return '\n'.join(out)
-
-def last_frame_text(events):
-    # naive reconstruction: apply output sequentially and keep the final text
-    # This is a minimal approach: treat each 'o' as literal output, join lines
-    buf = ''
-    for ev in events:
-        if not isinstance(ev, list) or len(ev) < 3:
-            continue
-        typ = ev[1]
-        data = ev[2]
-        if typ == 'o' or typ == 'stdout':
-            buf += data
-    # Take last screenful (last 100 lines) to keep output reasonable
-    lines = buf.splitlines()
-    if len(lines) > 200:
-        lines = lines[-200:]
-    return '\n'.join(lines)
+    # events are (time, type, data) tuples
+    return '\n'.join(transcript_line(*ev) for ev in events)
 
-def main():
-    if len(sys.argv) < 2:
-        print('usage: embed_cast_static.py <path.cast>')
-        sys.exit(2)
-    castp = Path(sys.argv[1])
-    if not castp.exists():
-        print('missing', castp)
-        sys.exit(3)
-    header, events = parse_cast(castp)
-    outp = castp.with_suffix(castp.suffix + '.static.html')
-    title = castp.name
-    transcript = render_transcript(events)
-    last = last_frame_text(events)
-    html = f"""<!doctype html>
+
+def last_frame_text(events, cols=80, rows=24):
+    # replay output and resize events through a VT100 screen model and
+    # return the final screen
+    return vtscreen.replay(vtscreen.Screen(cols, rows), events).text()
+
+
+def write_static(castp: Path, outp: Path, keyframe_interval=None, at=()):
+    """Stream castp into the static wrapper at outp; return the event count.
+
+    keyframe_interval — if set, also render the screen every N seconds of
+                        recording time in a collapsible "Keyframes" section.
+                        Must be > 0 (ValueError otherwise).
+    at                — timestamps to render in a "Snapshots" section, each
+                        seeked via castindex.screen_at().
+    """
+    if keyframe_interval is not None and not keyframe_interval > 0:
+        raise ValueError(f'keyframe interval must be > 0, got {keyframe_interval}')
+    title = html.escape(castp.name)
+    count = 0
+    frames = 0
+    with castio.open_cast(castp) as cast, open(outp, 'w', encoding='utf-8') as out, \
+            tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+        screen = vtscreen.Screen(*castio.header_size(cast.header))
+        next_frame = keyframe_interval
+        out.write(f"""<!doctype html>
 <meta charset='utf-8'>
 <title>{title} (static)</title>
 <style>body{{font-family:system-ui,Segoe UI,Arial,sans-serif;margin:16px}}pre{{background:#111;color:#eee;padding:12px;border-radius:6px;overflow:auto}}</style>
@@ -80,15 +86,68 @@ def main():
 <p>This is a static fallback generated from the .cast file. It will display a transcript and the last captured terminal frame if JavaScript is unavailable or stripped.</p>
 <noscript>
 <h3>Transcript</h3>
-<pre>{transcript}</pre>
+<pre>""")
+        for ev in cast:
+            if keyframe_interval:
+                while ev[0] >= next_frame:
+                    spool.write(f'<details><summary>t = {next_frame:.1f}s</summary>'
+                                f'<pre>{html.escape(screen.text(), quote=False)}</pre></details>\n')
+                    frames += 1
+                    next_frame += keyframe_interval
+            out.write(('\n' if count else '') + html.escape(transcript_line(*ev), quote=False))
+            vtscreen.replay(screen, [ev])
+            count += 1
+        out.write(f"""</pre>
 </noscript>
 <h3>Last frame snapshot</h3>
-<pre>{last}</pre>
-<hr>
-<p>Original metadata: {json.dumps(header)}</p>
-"""
-    outp.write_text(html, encoding='utf-8')
+<pre>{html.escape(screen.text(), quote=False)}</pre>
+""")
+        if at:
+            out.write('<h3>Snapshots</h3>\n')
+            for t in at:
+                text = castindex.screen_at(castp, t).text()
+                out.write(f'<h4>t = {t:.1f}s</h4>\n<pre>{html.escape(text, quote=False)}</pre>\n')
+        if frames:
+            out.write('<h3>Keyframes</h3>\n')
+            spool.seek(0)
+            shutil.copyfileobj(spool, out)
+        out.write(f"""<hr>
+<p>Original metadata: {html.escape(json.dumps(cast.header or None), quote=False)}</p>
+""")
+    return count
+
+
+def main():
+    args = sys.argv[1:]
+    interval = None
+    at = []
+    while len(args) >= 2 and args[0] in ('--keyframes', '--at'):
+        try:
+            value = float(args[1])
+        except ValueError:
+            value = float('nan')
+        if args[0] == '--keyframes':
+            if not value > 0:
+                print('--keyframes SECONDS must be a number > 0')
+                sys.exit(2)
+            interval = value
+        else:
+            if not value >= 0:
+                print('--at SECONDS must be a number >= 0')
+                sys.exit(2)
+            at.append(value)
+        args = args[2:]
+    if not args:
+        print('usage: embed_cast_static.py [--keyframes SECONDS] [--at SECONDS ...] <path.cast>')
+        sys.exit(2)
+    castp = Path(args[0])
+    if not castp.exists():
+        print('missing', castp)
+        sys.exit(3)
+    outp = castp.with_suffix(castp.suffix + '.static.html')
+    write_static(castp, outp, keyframe_interval=interval, at=at)
     print('Wrote static wrapper:', outp)
 
+
 if __name__ == '__main__':
     main()
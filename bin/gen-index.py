@@ -2,10 +2,15 @@
 from pathlib import Path
 from gen_index_ctx import set_context, get_art_dir, get_embed_limit
 from template import render_template
+import cast_optimize
+import castindex
 import os, mimetypes, base64, shutil,argparse
 from html import escape
 
 mimetypes.init()
+
+# Derived data the cast tools keep next to a .cast; not evidence, never listed.
+SIDECAR_SUFFIXES = (".cast" + castindex.INDEX_SUFFIX, ".cast" + cast_optimize.SIDECAR_SUFFIX)
  
 
 def is_text_file(mime):
@@ -150,16 +155,37 @@ def make_wrapper(name, src_path, mime):
             dst.write("</body>")
             return wp.name
  
+def optimize_casts(art_dir: Path):
+    """Rewrite each not-yet-optimized .cast in art_dir with cast_optimize."""
+    for path in sorted(art_dir.glob("*.cast")):
+        try:
+            if cast_optimize.is_optimized(path):
+                continue
+            report = cast_optimize.optimize(path, path)
+        except (ValueError, OSError) as e:
+            print(f"[optimize] keeping {path.name} unchanged: {e}")
+            continue
+        if report["kept_original"]:
+            print(f"[optimize] keeping {path.name} unchanged: optimized copy was not smaller")
+            continue
+        print(f"[optimize] {path.name}: {report['bytes_in']} -> {report['bytes_out']} bytes, "
+              f"{report['events_in']} -> {report['events_out']} events")
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--art-dir", default=os.environ.get("ART_DIR", "artifacts"))
     ap.add_argument("--embed-limit-bytes", type=int, default=int(os.environ.get("EMBED_LIMIT_BYTES", "1048576")))
+    ap.add_argument("--optimize-casts", action="store_true", default=os.environ.get("OPTIMIZE_CASTS") == "1",
+                    help="Cap idle time and merge output events in .cast files in place (see cast_optimize.py)")
     args = ap.parse_args()
 
     art_dir = Path(args.art_dir)
     art_dir.mkdir(parents=True, exist_ok=True)
     set_context(art_dir=art_dir, embed_limit=args.embed_limit_bytes)
 
+    if args.optimize_casts:
+        optimize_casts(art_dir)
+
     # Generate wrappers for previewable artifacts (optional: keep existing behavior)
     for name in sorted(os.listdir(art_dir)):
         src_path = art_dir / name
@@ -183,7 +209,7 @@ def main():
             links.append(f'<li><a href="{name}/">{name}/</a> (dir)</li>')
             continue
 
-        if not src_path.is_file() or name.endswith(".html"):
+        if not src_path.is_file() or name.endswith(".html") or name.endswith(SIDECAR_SUFFIXES):
             continue
 
         mime, _ = mimetypes.guess_type(str(src_path))
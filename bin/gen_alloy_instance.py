@@ -2,8 +2,20 @@
 
 from pathlib import Path
 import argparse
+import hashlib
+import json
 import re
 
+# Bump when the emitted Alloy changes shape so existing instances are regenerated.
+GENERATOR_VERSION = 1
+DIGEST_PREFIX = "// classification-digest: "
+MODEL_MODULE = "evidence_capture_model"
+COMMANDS = ("run {}", "run MissingSidecar", "run MissingWrapper")
+
+# --slices output, relative to the directory of --out
+SLICE_DIR = "slices"
+SLICE_MANIFEST = "manifest.json"
+
 
 def alloy_name(path: Path) -> str:
     name = "_".join(path.parts)
@@ -62,6 +74,30 @@ def metadata_stem(path: Path) -> str:
     return path.name.removesuffix(".meta.txt")
 
 
+def classification_digest(root: Path, artifacts: Path, classified: dict[Path, str]) -> str:
+    """
+    sha256 of everything the generated instance depends on: the generator
+    version, the artifacts dir and each scanned file's relative path and class.
+    File contents are not modeled, so they are not hashed.
+    """
+    payload = {
+        "generator": GENERATOR_VERSION,
+        "artifacts": artifacts.relative_to(root).as_posix(),
+        "files": [[f.relative_to(root).as_posix(), c] for f, c in sorted(classified.items())],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def read_digest(out: Path) -> str | None:
+    """The classification digest recorded on the first line of out, if any."""
+    try:
+        with out.open("r", encoding="utf-8") as fh:
+            first = fh.readline().rstrip("\n")
+    except OSError:
+        return None
+    return first[len(DIGEST_PREFIX):] if first.startswith(DIGEST_PREFIX) else None
+
+
 def emit_one_sig(lines: list[str], names: list[str], parent_sig: str) -> None:
     if names:
         lines.append(f"one sig {', '.join(names)} extends {parent_sig} {{}}")
@@ -77,46 +113,18 @@ def print_file_list(title: str, files: list[Path], root: Path) -> None:
         print(f"  - {f.relative_to(root)}")
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--root", required=True)
-    parser.add_argument("--artifacts", required=True)
-    parser.add_argument("--out", default="./spec/instance_generated.als")
-    args = parser.parse_args()
-
-    root = Path(args.root).resolve()
-    artifacts = Path(args.artifacts).resolve()
-    out = Path(args.out)
-
-    if not root.exists():
-        raise SystemExit(f"ROOT does not exist: {root}")
-
-    if not artifacts.exists():
-        raise SystemExit(f"ART_DIR does not exist: {artifacts}")
-
-    if not artifacts.is_dir():
-        raise SystemExit(f"ART_DIR is not a directory: {artifacts}")
-
-    if not artifacts.is_relative_to(root):
-        raise SystemExit(f"ART_DIR must be under ROOT: {artifacts} not under {root}")
-
-    files = sorted(p for p in artifacts.iterdir() if p.is_file())
-    classified = {f: classify(f) for f in files}
-
-    capture_files = [f for f in files if classified[f] == "capture"]
-    wrapper_files = [f for f in files if classified[f] == "wrapper"]
-    sidecar_files = [f for f in files if classified[f] == "metadata_sidecar"]
-
-    ignored_files = [f for f in files if classified[f] == "ignore"]
-    support_files = [f for f in files if classified[f] == "support"]
-    unknown_observed_files = [f for f in files if classified[f] == "unknown_observed"]
-
-    capture_stems = {capture_stem(c) for c in capture_files}
-    wrapper_by_stem = {wrapper_stem(f): f for f in wrapper_files}
-    sidecar_by_stem = {metadata_stem(f): f for f in sidecar_files}
-
-    modeled_capture_files = capture_files
-
+def instance_lines(
+    root: Path,
+    artifacts: Path,
+    modeled_capture_files: list[Path],
+    wrapper_by_stem: dict[str, Path],
+    sidecar_by_stem: dict[str, Path],
+) -> list[str]:
+    """
+    Alloy instance (sigs, facts and COMMANDS with exact scopes) for the
+    given captures and their wrappers and sidecars. Callers emit the header
+    (digest, module, open) above it.
+    """
     used_wrapper_files = [
         wrapper_by_stem[capture_stem(f)]
         for f in modeled_capture_files
@@ -129,16 +137,6 @@ def main() -> int:
         if capture_stem(f) in sidecar_by_stem
     ]
 
-    orphan_wrapper_files = [
-        f for f in wrapper_files
-        if wrapper_stem(f) not in capture_stems
-    ]
-
-    orphan_sidecar_files = [
-        f for f in sidecar_files
-        if metadata_stem(f) not in capture_stems
-    ]
-
     modeled_paths = []
     modeled_paths.extend(modeled_capture_files)
     modeled_paths.extend(used_wrapper_files)
@@ -172,8 +170,6 @@ def main() -> int:
     all_artifact_atoms = list(capture_atoms.values()) + list(wrapper_atoms.values())
 
     lines: list[str] = []
-    lines.append("open evidence_capture_model")
-    lines.append("")
 
     emit_one_sig(lines, list(path_atoms.values()), "Path")
     emit_one_sig(lines, list(capture_atoms.values()), "CaptureArtifact")
@@ -253,32 +249,192 @@ def main() -> int:
     lines.append("}")
     lines.append("")
 
-    lines.append(
-        f"run {{}} for exactly {len(path_atoms)} Path, "
+    scope = (
+        f"for exactly {len(path_atoms)} Path, "
         "exactly 1 CaptureRun, "
         f"exactly {len(capture_atoms)} CaptureArtifact, "
         f"exactly {len(wrapper_atoms)} WrapperArtifact, "
         f"exactly {len(sidecar_atoms)} MetadataSidecar"
     )
-    lines.append("")
+    for command in COMMANDS:
+        lines.append(f"{command} {scope}")
+        lines.append("")
 
-    lines.append(
-        f"run MissingSidecar for exactly {len(path_atoms)} Path, "
-        "exactly 1 CaptureRun, "
-        f"exactly {len(capture_atoms)} CaptureArtifact, "
-        f"exactly {len(wrapper_atoms)} WrapperArtifact, "
-        f"exactly {len(sidecar_atoms)} MetadataSidecar"
-    )
-    lines.append("")
+    return lines
 
-    lines.append(
-        f"run MissingWrapper for exactly {len(path_atoms)} Path, "
-        "exactly 1 CaptureRun, "
-        f"exactly {len(capture_atoms)} CaptureArtifact, "
-        f"exactly {len(wrapper_atoms)} WrapperArtifact, "
-        f"exactly {len(sidecar_atoms)} MetadataSidecar"
+
+def slice_capture(
+    root: Path,
+    artifacts: Path,
+    capture: Path,
+    wrapper_by_stem: dict[str, Path],
+    sidecar_by_stem: dict[str, Path],
+) -> dict:
+    """
+    One capture's independent sub-instance. The model's invariants only
+    relate a capture to its own wrapper and sidecar, so each capture can be
+    solved alone with a scope of at most 5 Paths instead of all of them.
+    """
+    stem = capture_stem(capture)
+    subset = {capture: "capture"}
+    if stem in wrapper_by_stem:
+        subset[wrapper_by_stem[stem]] = "wrapper"
+    if stem in sidecar_by_stem:
+        subset[sidecar_by_stem[stem]] = "metadata_sidecar"
+
+    name = alloy_name(capture.relative_to(root))
+    digest = classification_digest(root, artifacts, subset)
+    lines = [DIGEST_PREFIX + digest, f"module {SLICE_DIR}/{name}", f"open {MODEL_MODULE}", ""]
+    lines += instance_lines(root, artifacts, [capture], wrapper_by_stem, sidecar_by_stem)
+    return {
+        "name": name,
+        "stem": stem,
+        "file": f"{SLICE_DIR}/{name}.als",
+        "digest": digest,
+        "commands": list(COMMANDS),
+        "scope": {
+            "Path": 2 + len(subset),
+            "CaptureRun": 1,
+            "CaptureArtifact": 1,
+            "WrapperArtifact": int(stem in wrapper_by_stem),
+            "MetadataSidecar": int(stem in sidecar_by_stem),
+        },
+        "text": "\n".join(lines),
+    }
+
+
+def write_slices(model_dir: Path, slices: list[dict], digest: str, check: bool, force: bool) -> int:
+    """
+    Write changed slices, remove stale ones and refresh the manifest under
+    model_dir/SLICE_DIR. With check, write nothing and return 1 if anything
+    would change.
+    """
+    slice_dir = model_dir / SLICE_DIR
+    manifest_path = slice_dir / SLICE_MANIFEST
+    manifest = {
+        "version": GENERATOR_VERSION,
+        "digest": digest,
+        "model": f"{MODEL_MODULE}.als",
+        "slices": [{k: v for k, v in sl.items() if k != "text"} for sl in slices],
+    }
+    manifest_text = json.dumps(manifest, indent=2) + "\n"
+
+    wanted = {sl["name"] + ".als" for sl in slices}
+    stale_files = sorted(p for p in slice_dir.glob("*.als") if p.name not in wanted) if slice_dir.is_dir() else []
+    changed = [sl for sl in slices if force or read_digest(model_dir / sl["file"]) != sl["digest"]]
+    try:
+        manifest_current = manifest_path.read_text(encoding="utf-8") == manifest_text
+    except OSError:
+        manifest_current = False
+
+    if check:
+        if changed or stale_files or not manifest_current:
+            print(
+                f"[alloy] stale: {slice_dir} ({len(changed)} changed, {len(stale_files)} removed slices)"
+                " (run without --check to regenerate)"
+            )
+            return 1
+        print(f"[alloy] up to date: {slice_dir} ({len(slices)} slices)")
+        return 0
+
+    slice_dir.mkdir(parents=True, exist_ok=True)
+    for sl in changed:
+        (model_dir / sl["file"]).write_text(sl["text"], encoding="utf-8")
+    for p in stale_files:
+        p.unlink()
+    if not manifest_current:
+        manifest_path.write_text(manifest_text, encoding="utf-8")
+
+    print(f"[alloy] slices: {len(slices)} in {slice_dir}")
+    print(f"[alloy] slices written: {len(changed)}")
+    print(f"[alloy] slices removed: {len(stale_files)}")
+    print(f"[alloy] manifest: {manifest_path}{'' if not manifest_current else ' (unchanged)'}")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", required=True)
+    parser.add_argument("--artifacts", required=True)
+    parser.add_argument("--out", default="./spec/instance_generated.als")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit 0 if --out is up to date with the artifacts, 1 if it would change; write nothing",
     )
-    lines.append("")
+    parser.add_argument("--force", action="store_true", help="Rewrite --out even if it is up to date")
+    parser.add_argument(
+        "--slices",
+        action="store_true",
+        help=f"Write one small instance per capture to <dir of --out>/{SLICE_DIR}/ plus {SLICE_MANIFEST}",
+    )
+    args = parser.parse_args(argv)
+
+    root = Path(args.root).resolve()
+    artifacts = Path(args.artifacts).resolve()
+    out = Path(args.out)
+
+    if not root.exists():
+        raise SystemExit(f"ROOT does not exist: {root}")
+
+    if not artifacts.exists():
+        raise SystemExit(f"ART_DIR does not exist: {artifacts}")
+
+    if not artifacts.is_dir():
+        raise SystemExit(f"ART_DIR is not a directory: {artifacts}")
+
+    if not artifacts.is_relative_to(root):
+        raise SystemExit(f"ART_DIR must be under ROOT: {artifacts} not under {root}")
+
+    files = sorted(p for p in artifacts.iterdir() if p.is_file())
+    classified = {f: classify(f) for f in files}
+
+    digest = classification_digest(root, artifacts, classified)
+    capture_files = [f for f in files if classified[f] == "capture"]
+    wrapper_files = [f for f in files if classified[f] == "wrapper"]
+    sidecar_files = [f for f in files if classified[f] == "metadata_sidecar"]
+
+    ignored_files = [f for f in files if classified[f] == "ignore"]
+    support_files = [f for f in files if classified[f] == "support"]
+    unknown_observed_files = [f for f in files if classified[f] == "unknown_observed"]
+
+    capture_stems = {capture_stem(c) for c in capture_files}
+    wrapper_by_stem = {wrapper_stem(f): f for f in wrapper_files}
+    sidecar_by_stem = {metadata_stem(f): f for f in sidecar_files}
+
+    modeled_capture_files = capture_files
+
+    if args.slices:
+        slices = [
+            slice_capture(root, artifacts, c, wrapper_by_stem, sidecar_by_stem)
+            for c in modeled_capture_files
+        ]
+        return write_slices(out.parent, slices, digest, args.check, args.force)
+
+    current = read_digest(out)
+    if args.check:
+        if current == digest:
+            print(f"[alloy] up to date: {out}")
+            return 0
+        print(f"[alloy] stale: {out} (run without --check to regenerate)")
+        return 1
+    if current == digest and not args.force:
+        # unchanged file keeps its mtime, so downstream solving can be skipped
+        print(f"[alloy] unchanged: {out}")
+        return 0
+
+    orphan_wrapper_files = [
+        f for f in wrapper_files
+        if wrapper_stem(f) not in capture_stems
+    ]
+
+    orphan_sidecar_files = [
+        f for f in sidecar_files
+        if metadata_stem(f) not in capture_stems
+    ]
+
+    lines = [DIGEST_PREFIX + digest, f"open {MODEL_MODULE}", ""]
+    lines += instance_lines(root, artifacts, modeled_capture_files, wrapper_by_stem, sidecar_by_stem)
 
     out.parent.mkdir(parents=True, exist_ok=True)
     out.write_text("\n".join(lines), encoding="utf-8")
@@ -294,8 +450,8 @@ def main() -> int:
     print(f"[alloy] wrote {out}")
     print(f"[alloy] files scanned: {len(files)}")
     print(f"[alloy] captures modeled: {len(modeled_capture_files)}")
-    print(f"[alloy] wrappers modeled: {len(wrapper_atoms)}")
-    print(f"[alloy] metadata sidecars modeled: {len(sidecar_atoms)}")
+    print(f"[alloy] wrappers modeled: {len(modeled_capture_files) - len(captures_missing_wrapper)}")
+    print(f"[alloy] metadata sidecars modeled: {len(modeled_capture_files) - len(captures_missing_sidecar)}")
     print(f"[alloy] captures missing wrapper: {len(captures_missing_wrapper)}")
     print(f"[alloy] captures missing sidecar: {len(captures_missing_sidecar)}")
     print(f"[alloy] ignored: {len(ignored_files)}")
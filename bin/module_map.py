@@ -25,16 +25,43 @@ CLI usage:
   python3 bin/module_map.py update gen-index --description "..." --public-api gen_index,write_wrappers
   python3 bin/module_map.py show
   python3 bin/module_map.py show gen-index
+  python3 bin/module_map.py scan [--root DIR] [--dry-run]
+  python3 bin/module_map.py impact template.py [--direct] [--format json|lines]
+  python3 bin/module_map.py deps gen-index [--direct] [--format json|lines]
+
+`scan` derives records from the source tree instead of hand-typed `add` calls:
+bin/*.py files are parsed with ast (imports, top-level public defs, argparse
+subcommands as "cli:<name>"), and bin/**/*.sh plus *.mk files are searched for
+invocations of other bin/ scripts.  Parse results are cached per file in
+module_map.cache.json, keyed by content hash, so rescans only re-parse files
+that changed.
+
+`impact` (what depends on X) and `deps` (what X depends on) answer from
+module_map.index.json: reverse edges, strongly connected components and
+transitive closures stored as bitsets.  It is rebuilt whenever
+module_map.json is saved or its content hash no longer matches.
 """
 from __future__ import annotations
 
+import ast
+import hashlib
 import json
 import os
+import re
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 
 MODULE_MAP_FILE = "module_map.json"
+SCAN_CACHE_FILE = "module_map.cache.json"
+SCAN_CACHE_VERSION = 1
+GRAPH_INDEX_FILE = "module_map.index.json"
+GRAPH_INDEX_VERSION = 1
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Globs (relative to the scan root) that scan_modules() turns into records.
+SCAN_PATTERNS = ("bin/*.py", "bin/**/*.sh", "*.mk")
 
 
 # ---------------------------------------------------------------------------
@@ -53,7 +80,9 @@ def _load(art_dir: Path) -> List[Dict]:
 
 def _save(art_dir: Path, modules: List[Dict]) -> None:
     path = Path(art_dir) / MODULE_MAP_FILE
-    path.write_text(json.dumps(modules, indent=2), encoding="utf-8")
+    text = json.dumps(modules, indent=2)
+    path.write_text(text, encoding="utf-8")
+    _save_graph_index(art_dir, DependencyGraph(modules), _text_digest(text))
 
 
 def _find(modules: List[Dict], name: str) -> Optional[Dict]:
@@ -132,6 +161,476 @@ def list_modules(art_dir: Path) -> List[Dict]:
     return _load(Path(art_dir))
 
 
+# ---------------------------------------------------------------------------
+# Dependency graph  (L2: show change impact)
+# ---------------------------------------------------------------------------
+
+def _text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _bits_to_names(bits: int, names: List[str]) -> List[str]:
+    out = []
+    while bits:
+        low = bits & -bits
+        out.append(names[low.bit_length() - 1])
+        bits ^= low
+    return sorted(out)
+
+
+class DependencyGraph:
+    """
+    depends_on graph with precomputed transitive closures.
+
+    Nodes are module names plus any names that only appear in depends_on.
+    Strongly connected components are found with Tarjan's algorithm; closures
+    are then computed once per component over the condensation and stored
+    as int bitsets, so deps()/impact() are a dict lookup plus bit decoding.
+    """
+
+    def __init__(self, modules: Iterable[Dict] = ()):
+        modules = list(modules)
+        names = set()
+        for m in modules:
+            names.add(m["name"])
+            names.update(m.get("depends_on", []))
+        self.names: List[str] = sorted(names)
+        self.index = {n: i for i, n in enumerate(self.names)}
+        n = len(self.names)
+        self.forward: List[List[int]] = [[] for _ in range(n)]
+        self.reverse: List[List[int]] = [[] for _ in range(n)]
+        for m in modules:
+            i = self.index[m["name"]]
+            for dep in set(m.get("depends_on", [])):
+                j = self.index[dep]
+                self.forward[i].append(j)
+                self.reverse[j].append(i)
+        self.paths = {m["name"]: m.get("path", "") for m in modules}
+        self._build_closures()
+
+    def _components(self) -> List[List[int]]:
+        """Iterative Tarjan; components come out sinks-first (reverse topological)."""
+        n = len(self.names)
+        index = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        stack: List[int] = []
+        comps: List[List[int]] = []
+        counter = 0
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            work = [(root, 0)]
+            while work:
+                v, pos = work.pop()
+                if pos == 0:
+                    index[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = True
+                edges = self.forward[v]
+                if pos < len(edges):
+                    work.append((v, pos + 1))
+                    w = edges[pos]
+                    if index[w] == -1:
+                        work.append((w, 0))
+                    elif on_stack[w]:
+                        low[v] = min(low[v], index[w])
+                    continue
+                if low[v] == index[v]:
+                    comp = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        comp.append(w)
+                        if w == v:
+                            break
+                    comps.append(comp)
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[v])
+        return comps
+
+    def _build_closures(self) -> None:
+        comps = self._components()
+        comp_of = [0] * len(self.names)
+        for c, members in enumerate(comps):
+            for v in members:
+                comp_of[v] = c
+        comp_bits = [sum(1 << v for v in members) for members in comps]
+        cyclic = [
+            len(members) > 1 or members[0] in self.forward[members[0]]
+            for members in comps
+        ]
+        self.cycles = [
+            sorted(self.names[v] for v in comps[c]) for c in range(len(comps)) if cyclic[c]
+        ]
+
+        def closure(order: Iterable[int], edges: List[List[int]]) -> List[int]:
+            reach = [0] * len(comps)
+            for c in order:
+                bits = comp_bits[c] if cyclic[c] else 0
+                for v in comps[c]:
+                    for w in edges[v]:
+                        d = comp_of[w]
+                        if d != c:
+                            bits |= reach[d] | comp_bits[d]
+                reach[c] = bits
+            return [reach[comp_of[v]] for v in range(len(self.names))]
+
+        # Sinks-first order suits forward edges; its reverse suits reverse edges.
+        self._deps = closure(range(len(comps)), self.forward)
+        self._impact = closure(reversed(range(len(comps))), self.reverse)
+
+    # -- persistence --------------------------------------------------------
+
+    def to_dict(self) -> Dict:
+        return {
+            "names": self.names,
+            "paths": self.paths,
+            "forward": self.forward,
+            "reverse": self.reverse,
+            "cycles": self.cycles,
+            "deps": [format(b, "x") for b in self._deps],
+            "impact": [format(b, "x") for b in self._impact],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DependencyGraph":
+        g = cls.__new__(cls)
+        g.names = data["names"]
+        g.index = {n: i for i, n in enumerate(g.names)}
+        g.paths = data["paths"]
+        g.forward = data["forward"]
+        g.reverse = data["reverse"]
+        g.cycles = data["cycles"]
+        g._deps = [int(h, 16) for h in data["deps"]]
+        g._impact = [int(h, 16) for h in data["impact"]]
+        return g
+
+    # -- queries ------------------------------------------------------------
+
+    def resolve(self, ref: str) -> str:
+        """
+        Map a module name, a module path, or a path's basename to a module
+        name.  Raises KeyError when nothing matches.
+        """
+        if ref in self.index:
+            return ref
+        ref_path = Path(ref).as_posix().removeprefix("./")
+        for name, path in self.paths.items():
+            if path and Path(path).as_posix() == ref_path:
+                return name
+        base = Path(ref).name
+        matches = [n for n, path in self.paths.items() if path and Path(path).name == base]
+        if len(matches) == 1:
+            return matches[0]
+        raise KeyError(f"module not found: {ref}")
+
+    def deps(self, name: str, transitive: bool = True) -> List[str]:
+        i = self.index[name]
+        if not transitive:
+            return sorted(self.names[j] for j in self.forward[i])
+        return [n for n in _bits_to_names(self._deps[i], self.names) if n != name]
+
+    def impact(self, name: str, transitive: bool = True) -> List[str]:
+        i = self.index[name]
+        if not transitive:
+            return sorted(self.names[j] for j in self.reverse[i])
+        return [n for n in _bits_to_names(self._impact[i], self.names) if n != name]
+
+    def cycle_of(self, name: str) -> List[str]:
+        return next((c for c in self.cycles if name in c), [])
+
+
+def _save_graph_index(art_dir: Path, graph: DependencyGraph, digest: str) -> None:
+    path = Path(art_dir) / GRAPH_INDEX_FILE
+    data = {"version": GRAPH_INDEX_VERSION, "source_sha256": digest, **graph.to_dict()}
+    path.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+
+
+def load_graph(art_dir: Path) -> DependencyGraph:
+    """
+    Return the dependency graph for module_map.json, using the persisted
+    index when its source hash matches and rebuilding it otherwise.
+    """
+    art_dir = Path(art_dir)
+    src = art_dir / MODULE_MAP_FILE
+    text = src.read_text(encoding="utf-8") if src.exists() else "[]"
+    digest = _text_digest(text)
+    idx = art_dir / GRAPH_INDEX_FILE
+    if idx.exists():
+        try:
+            data = json.loads(idx.read_text(encoding="utf-8"))
+            if data.get("version") == GRAPH_INDEX_VERSION and data.get("source_sha256") == digest:
+                return DependencyGraph.from_dict(data)
+        except Exception:
+            pass
+    try:
+        modules = json.loads(text)
+    except Exception:
+        modules = []
+    graph = DependencyGraph(modules)
+    if src.exists():
+        try:
+            _save_graph_index(art_dir, graph, digest)
+        except OSError:
+            pass
+    return graph
+
+
+def query_graph(art_dir: Path, ref: str, direction: str, transitive: bool = True) -> Dict:
+    """
+    Answer an impact or deps query for ref (module name or path).
+
+    direction — 'impact' (modules that depend on ref) or 'deps' (modules
+                ref depends on)
+    Returns a dict with keys: module, <direction>, transitive, cycle.
+    Raises KeyError if ref does not resolve to a module.
+    """
+    graph = load_graph(art_dir)
+    name = graph.resolve(ref)
+    query = graph.impact if direction == "impact" else graph.deps
+    return {
+        "module": name,
+        direction: query(name, transitive=transitive),
+        "transitive": transitive,
+        "cycle": graph.cycle_of(name),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Source scan
+# ---------------------------------------------------------------------------
+
+# A bin/ script path inside shell or make text.  The lookbehind rejects
+# /bin/bash and friends while allowing ./bin/x, "bin/x", $(DIR)bin/x, ...
+_BIN_REF = re.compile(r"(?<![\w/.-])(?:\./)?(bin/[\w./-]+)")
+_SOURCE_REF = re.compile(r"^\s*(?:\.|source)\s+\S*?([\w.-]+\.sh)\b")
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def module_name_for(rel_path: str) -> str:
+    """
+    Map a repo-relative path to its module name.
+
+    bin/gen-index.py → gen-index, bin/probes/repo.sh → probes/repo,
+    hunchly.mk → hunchly.mk
+    """
+    p = Path(rel_path)
+    if p.parts[0] == "bin":
+        return str(p.relative_to("bin").with_suffix(""))
+    return str(p)
+
+
+def _first_line(text: Optional[str]) -> str:
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if line:
+            return line
+    return ""
+
+
+def parse_python(source: str) -> Dict:
+    """
+    Extract imports, string references, public API and description from
+    Python source.  Raises SyntaxError for unparsable input.
+    """
+    tree = ast.parse(source)
+    imports: List[str] = []
+    strings: List[str] = []
+    subcommands: List[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(a.name.split(".")[0] for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            imports.append(node.module.split(".")[0])
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            if node.value.endswith((".py", ".sh")) and len(node.value) < 256:
+                strings.append(node.value)
+        elif (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "add_parser"
+            and node.args
+            and isinstance(node.args[0], ast.Constant)
+            and isinstance(node.args[0].value, str)
+        ):
+            subcommands.append(node.args[0].value)
+
+    public_api = [
+        node.name for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        and not node.name.startswith("_")
+        and node.name != "main"
+    ]
+    public_api.extend(f"cli:{name}" for name in subcommands)
+    return {
+        "description": _first_line(ast.get_docstring(tree)),
+        "public_api": public_api,
+        "imports": sorted(set(imports)),
+        "refs": sorted(set(strings)),
+    }
+
+
+def parse_shell(text: str) -> Dict:
+    """Extract bin/ script invocations and sourced files from shell or make text."""
+    refs: List[str] = []
+    for line in text.splitlines():
+        if line.lstrip().startswith("#"):
+            continue
+        refs.extend(m.group(1).rstrip(".") for m in _BIN_REF.finditer(line))
+        m = _SOURCE_REF.match(line)
+        if m:
+            refs.append(m.group(1))
+    return {
+        "description": "",
+        "public_api": [],
+        "imports": [],
+        "refs": sorted(set(refs)),
+    }
+
+
+def _load_cache(art_dir: Path) -> Dict[str, Dict]:
+    path = Path(art_dir) / SCAN_CACHE_FILE
+    if path.exists():
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("version") == SCAN_CACHE_VERSION:
+                return data.get("files", {})
+        except Exception:
+            pass
+    return {}
+
+
+def _save_cache(art_dir: Path, files: Dict[str, Dict]) -> None:
+    path = Path(art_dir) / SCAN_CACHE_FILE
+    path.write_text(
+        json.dumps({"version": SCAN_CACHE_VERSION, "files": files}, indent=2),
+        encoding="utf-8",
+    )
+
+
+def _scan_file(path: Path, rel: str, cached: Optional[Dict], stats: Dict) -> Dict:
+    st = path.stat()
+    if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+        stats["cached"] += 1
+        return cached
+    digest = _sha256(path)
+    if cached and cached["sha256"] == digest:
+        stats["cached"] += 1
+        return dict(cached, size=st.st_size, mtime_ns=st.st_mtime_ns)
+    stats["parsed"] += 1
+    text = path.read_text(encoding="utf-8", errors="replace")
+    if rel.endswith(".py"):
+        try:
+            result = parse_python(text)
+        except SyntaxError as exc:
+            result = {"description": "", "public_api": [], "imports": [], "refs": [],
+                      "error": f"SyntaxError: {exc.msg} (line {exc.lineno})"}
+    else:
+        result = parse_shell(text)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest,
+            "result": result}
+
+
+def _resolve_deps(rel: str, result: Dict, by_path: Dict[str, str],
+                  by_import: Dict[str, str], by_basename: Dict[str, str]) -> List[str]:
+    own = by_path[rel]
+    deps: List[str] = []
+    for name in result["imports"]:
+        if name in by_import:
+            deps.append(by_import[name])
+    for ref in result["refs"]:
+        target = by_path.get(ref) or by_basename.get(Path(ref).name)
+        if target:
+            deps.append(target)
+    return sorted(set(d for d in deps if d != own))
+
+
+def scan_modules(
+    art_dir: Path,
+    root: Path = ROOT,
+    patterns: Iterable[str] = SCAN_PATTERNS,
+    dry_run: bool = False,
+) -> Dict:
+    """
+    Derive module records from the source tree under root and merge them
+    into module_map.json.
+
+    For each scanned module path, public_api and depends_on are replaced
+    with the scanned values; description is only filled in when empty, so
+    hand-written descriptions survive.  Records for paths outside the scan
+    are left untouched.  With dry_run nothing is written.
+
+    Returns a dict with keys: files, parsed, cached, added, updated, modules.
+    """
+    art_dir = Path(art_dir)
+    root = Path(root).resolve()
+    cache = _load_cache(art_dir)
+    stats = {"files": 0, "parsed": 0, "cached": 0, "added": 0, "updated": 0}
+
+    paths: Dict[str, Path] = {}
+    for pattern in patterns:
+        for p in root.glob(pattern):
+            if p.is_file():
+                paths[p.relative_to(root).as_posix()] = p
+    new_cache: Dict[str, Dict] = {}
+    for rel in sorted(paths):
+        new_cache[rel] = _scan_file(paths[rel], rel, cache.get(rel), stats)
+    stats["files"] = len(new_cache)
+
+    by_path = {rel: module_name_for(rel) for rel in new_cache}
+    by_import = {
+        Path(rel).stem: name for rel, name in by_path.items()
+        if rel.endswith(".py") and Path(rel).stem.isidentifier()
+    }
+    by_basename: Dict[str, str] = {}
+    for rel, name in by_path.items():
+        by_basename.setdefault(Path(rel).name, name)
+
+    modules = _load(art_dir)
+    by_name = {m["name"]: m for m in modules}
+    by_rec_path: Dict[str, Dict] = {}
+    for m in modules:
+        if m.get("path"):
+            by_rec_path.setdefault(m["path"], m)
+    for rel in sorted(new_cache):
+        result = new_cache[rel]["result"]
+        fields = {
+            "public_api": result["public_api"],
+            "depends_on": _resolve_deps(rel, result, by_path, by_import, by_basename),
+        }
+        rec = by_rec_path.get(rel) or by_name.get(by_path[rel])
+        if rec is None:
+            rec = {"name": by_path[rel], "path": rel,
+                   "description": result["description"], **fields}
+            modules.append(rec)
+            by_name[rec["name"]] = rec
+            by_rec_path[rel] = rec
+            stats["added"] += 1
+            continue
+        if not rec.get("description"):
+            fields["description"] = result["description"]
+        if any(rec.get(k) != v for k, v in fields.items()):
+            rec.update(fields)
+            stats["updated"] += 1
+
+    stats["modules"] = len(modules)
+    if not dry_run:
+        art_dir.mkdir(parents=True, exist_ok=True)
+        _save(art_dir, modules)
+        _save_cache(art_dir, new_cache)
+    return stats
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
@@ -169,6 +668,30 @@ def main(argv: Optional[List[str]] = None) -> None:
     p_show = sub.add_parser("show", help="Print module map as JSON")
     p_show.add_argument("name", nargs="?", default=None, help="Module name (omit for all)")
 
+    p_scan = sub.add_parser(
+        "scan", help="Derive module records from bin/*.py, bin/**/*.sh and *.mk"
+    )
+    p_scan.add_argument("--root", default=str(ROOT), help="Repository root to scan")
+    p_scan.add_argument(
+        "--dry-run", action="store_true", help="Report what would change; write nothing"
+    )
+
+    for direction, help_text in (
+        ("impact", "List modules affected by a change to MODULE (reverse deps)"),
+        ("deps", "List modules MODULE depends on"),
+    ):
+        p_q = sub.add_parser(direction, help=help_text)
+        p_q.add_argument("module", help="Module name, path, or file name (e.g. template.py)")
+        p_q.add_argument(
+            "--direct", action="store_true", help="Only direct edges, not the closure"
+        )
+        p_q.add_argument(
+            "--format",
+            choices=["json", "lines"],
+            default="json",
+            help="lines prints one module name per line (for shell/CI use)",
+        )
+
     args = ap.parse_args(argv)
     art_dir = Path(args.art_dir)
 
@@ -216,6 +739,30 @@ def main(argv: Optional[List[str]] = None) -> None:
             print(f"[module_map] ERROR: {exc}", file=sys.stderr)
             sys.exit(1)
 
+    elif args.cmd == "scan":
+        stats = scan_modules(art_dir, root=Path(args.root), dry_run=args.dry_run)
+        verb = "would write" if args.dry_run else "wrote"
+        print(f"[module_map] scanned {stats['files']} files "
+              f"(parsed {stats['parsed']}, cached {stats['cached']}); "
+              f"{stats['added']} added, {stats['updated']} updated → "
+              f"{verb} {art_dir / MODULE_MAP_FILE}")
+
+    elif args.cmd in ("impact", "deps"):
+        try:
+            result = query_graph(art_dir, args.module, args.cmd, transitive=not args.direct)
+        except KeyError as exc:
+            print(f"[module_map] ERROR: {exc}", file=sys.stderr)
+            sys.exit(1)
+        if result["cycle"]:
+            print(f"[module_map] WARNING: dependency cycle: {' -> '.join(result['cycle'])}",
+                  file=sys.stderr)
+        if args.format == "lines":
+            for name in result[args.cmd]:
+                print(name)
+        else:
+            json.dump(result, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+
     else:
         ap.print_help()
         sys.exit(1)
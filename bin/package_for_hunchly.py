@@ -2,63 +2,209 @@
 """Package asciinema cast artifacts for Hunchly ingestion.
 
 For each <name>.cast, this script will produce:
- - <name>.selfcontained.html (via bin/embed_cast.py)
- - <name>.static.html (via bin/embed_cast_static.py)
+ - <name>.selfcontained.html (via embed_cast.write_raw)
+ - <name>.static.html (via embed_cast_static.write_static)
  - <name>.hunchly.zip containing the three files
 
-Usage: python3 bin/package_for_hunchly.py [artifacts/*.cast]
-If no args provided, processes all .cast files under artifacts/.
+The wrappers are built in-process: the player JS/CSS is read (or fetched)
+once and handed to every worker, and casts are packaged concurrently in a
+process pool of --jobs workers (default: CPU count; 1 runs serially).
+
+Entries are streamed from disk into the zip. Each is deflated at
+--compress-level unless a quick sample (head, middle, tail) shows it barely
+compresses, in which case it is stored. The zip carries a
+hunchly-manifest.json whose digest covers the cast, the player assets and the
+packaging settings; when an existing zip's digest matches, the cast is
+skipped (--force repackages anyway).
+
+Usage: python3 bin/package_for_hunchly.py [--jobs N] [--compress-level 0-9] [--force] [--art-dir DIR] [artifacts/*.cast]
+If no casts are given, processes all .cast files under the artifacts dir.
 """
+import argparse
+import hashlib
+import json
+import os
 import sys
-import subprocess
-from pathlib import Path
 import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import embed_cast
+import embed_cast_static
 
 ROOT = Path(__file__).resolve().parents[1]
 ART = ROOT / 'artifacts'
-BIN = ROOT / 'bin'
 
-def run(cmd):
-    print('RUN:', ' '.join(cmd))
-    r = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if r.returncode != 0:
-        print('ERR:', r.stderr)
-    return r
+# (js, css) for the current process; set once per worker by _init_worker
+_ASSETS = None
+
+# Bump when the wrapper or zip layout changes so existing packages are rebuilt.
+PACKAGE_FORMAT = 1
+MANIFEST_NAME = 'hunchly-manifest.json'
+DEFAULT_COMPRESS_LEVEL = 6
+# Entries whose sample deflates to more than this fraction of its size are stored.
+STORE_RATIO = 0.9
+SAMPLE_BYTES = 16 * 1024
+
+
+def _init_worker(assets):
+    global _ASSETS
+    _ASSETS = assets
+
+
+def inputs_digest(castp: Path, assets, level: int) -> str:
+    """sha256 over everything a package is built from."""
+    h = hashlib.sha256()
+    h.update(json.dumps({'format': PACKAGE_FORMAT, 'level': level, 'name': castp.name}).encode())
+    for part in assets:
+        h.update(hashlib.sha256(part.encode('utf-8')).digest())
+    with open(castp, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def packaged_digest(zipf: Path):
+    """The inputs digest recorded in zipf's manifest, or None."""
+    try:
+        with zipfile.ZipFile(zipf) as z:
+            return json.loads(z.read(MANIFEST_NAME)).get('digest')
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
 
-def package_cast(castp: Path):
+def choose_compression(path: Path, level: int) -> int:
+    """ZIP_STORED if level is 0 or a sample of path barely deflates, else ZIP_DEFLATED."""
+    if level == 0:
+        return zipfile.ZIP_STORED
+    size = path.stat().st_size
+    with open(path, 'rb') as fh:
+        if size <= 3 * SAMPLE_BYTES:
+            sample = fh.read()
+        else:
+            sample = b''
+            for pos in (0, size // 2, size - SAMPLE_BYTES):
+                fh.seek(pos)
+                sample += fh.read(SAMPLE_BYTES)
+    if not sample or len(zlib.compress(sample, 1)) > STORE_RATIO * len(sample):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def package_cast(castp: Path, out_dir: Path = ART, assets=None,
+                 level: int = DEFAULT_COMPRESS_LEVEL, force: bool = False):
+    """Write the wrappers and zip for castp into out_dir.
+
+    Returns (zip path, written) — written is False when the existing zip's
+    manifest digest already matches the inputs.
+
+    assets — (js, css) from embed_cast.load_player_assets(); loaded here if
+             neither passed nor set up for this worker.
+    """
+    global _ASSETS
+    if assets is None:
+        if _ASSETS is None:
+            _ASSETS = embed_cast.load_player_assets()
+        assets = _ASSETS
+    js, css = assets
     name = castp.stem
-    selfcontained = ART / f'{name}.selfcontained.html'
-    static = ART / f'{name}.static.html'
-    zipf = ART / f'{name}.hunchly.zip'
+    selfcontained = out_dir / f'{name}.selfcontained.html'
+    static = out_dir / f'{name}.static.html'
+    zipf = out_dir / f'{name}.hunchly.zip'
+
+    digest = inputs_digest(castp, assets, level)
+    outputs = (zipf, selfcontained, static)
+    if not force and all(p.exists() for p in outputs) and packaged_digest(zipf) == digest:
+        return zipf, False
 
     # 1) create self-contained
-    run([sys.executable, str(BIN / 'embed_cast.py'), str(castp), str(selfcontained)])
+    embed_cast.write_raw(str(castp), str(selfcontained), js, css)
     # 2) create static fallback
-    run([sys.executable, str(BIN / 'embed_cast_static.py'), str(castp)])
+    embed_cast_static.write_static(castp, static)
+
+    # 3) create zip, streaming each file in; written under a temp name so an
+    #    interrupted run never leaves a zip whose manifest looks current
+    tmp = zipf.with_name(zipf.name + '.tmp')
+    entries = []
+    with zipfile.ZipFile(tmp, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=level or None) as z:
+        for path in (castp, selfcontained, static):
+            method = choose_compression(path, level)
+            z.write(path, arcname=path.name, compress_type=method)
+            entries.append({'name': path.name, 'size': path.stat().st_size,
+                            'compression': 'stored' if method == zipfile.ZIP_STORED else 'deflated'})
+        manifest = {'format': PACKAGE_FORMAT, 'digest': digest, 'compress_level': level, 'entries': entries}
+        z.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2))
+    os.replace(tmp, zipf)
+    return zipf, True
+
 
-    # 3) create zip
-    with zipfile.ZipFile(zipf, 'w', compression=zipfile.ZIP_DEFLATED) as z:
-        z.write(castp, arcname=castp.name)
-        if selfcontained.exists(): z.write(selfcontained, arcname=selfcontained.name)
-        if static.exists(): z.write(static, arcname=static.name)
+def _package_one(job):
+    castp, out_dir, level, force = job
+    try:
+        zipf, written = package_cast(castp, out_dir, level=level, force=force)
+        return castp, zipf, written, None
+    except Exception as e:  # reported per cast; one bad recording must not stop the batch
+        return castp, None, False, f'{type(e).__name__}: {e}'
 
-    print('Wrote package:', zipf)
-    return zipf
 
-def main():
-    args = sys.argv[1:]
-    if not args:
-        casts = list(ART.glob('*.cast'))
+def package_all(casts, out_dir: Path = ART, jobs=None, assets=None,
+                level: int = DEFAULT_COMPRESS_LEVEL, force: bool = False):
+    """Package casts, jobs at a time; yield (cast, zip path or None, written,
+    error or None) in input order."""
+    if assets is None:
+        assets = embed_cast.load_player_assets(str(out_dir))
+    work = [(Path(c), Path(out_dir), level, force) for c in casts]
+    jobs = min(jobs or os.cpu_count() or 1, len(work)) or 1
+    if jobs == 1:
+        _init_worker(assets)
+        yield from map(_package_one, work)
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(assets,)) as pool:
+        yield from pool.map(_package_one, work)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Package .cast artifacts for Hunchly ingestion')
+    ap.add_argument('casts', nargs='*')
+    ap.add_argument('--art-dir', default=os.environ.get('ART_DIR', str(ART)))
+    ap.add_argument('--jobs', type=int, default=None, help='Worker processes (default: CPU count)')
+    ap.add_argument('--compress-level', type=int, choices=range(10), default=DEFAULT_COMPRESS_LEVEL,
+                    metavar='0-9', help=f'Deflate level for zip entries (0 = store; default {DEFAULT_COMPRESS_LEVEL})')
+    ap.add_argument('--force', action='store_true', help='Repackage even if the zip is up to date')
+    args = ap.parse_args(argv)
+
+    art_dir = Path(args.art_dir)
+    if not args.casts:
+        casts = sorted(art_dir.glob('*.cast'))
     else:
-        casts = [Path(a) for a in args]
+        casts = [Path(a) for a in args.casts]
     if not casts:
         print('No casts found')
         sys.exit(1)
+    present = []
     for c in casts:
         if not c.exists():
             print('Missing', c)
             continue
-        package_cast(c)
+        present.append(c)
+
+    assets = embed_cast.load_player_assets(str(art_dir))
+    if not assets[0]:
+        print('Warning: could not find or fetch asciinema-player JS; output may not play.')
+    failed = 0
+    for castp, zipf, written, err in package_all(present, art_dir, args.jobs, assets,
+                                                 args.compress_level, args.force):
+        if err:
+            failed += 1
+            print(f'[package_for_hunchly] ERROR: {castp}: {err}', file=sys.stderr)
+        elif written:
+            print('Wrote package:', zipf)
+        else:
+            print('Up to date:', zipf)
+    if failed:
+        sys.exit(1)
+
 
 if __name__ == '__main__':
     main()
@@ -4,7 +4,8 @@ predict.py — L2/L3 prediction-vs-outcome logger for evidence-kit.
 
 Maps to the Layered Goal Graph:
   L2 (Action):  Log one prediction vs outcome
-  L3 (Evidence): prediction record  →  predictions.json
+  L3 (Evidence): prediction events  →  predictions.jsonl
+                 (materialized into predictions.json by 'compact')
 
 Each record captures:
   - id           unique UUID
@@ -12,23 +13,46 @@ Each record captures:
   - prediction   what you expect to happen
   - outcome      observed result (filled in by 'observe' subcommand)
   - status       'pending' | 'confirmed' | 'refuted'
+  - tags         optional labels used to group calibration analytics
+
+Storage:
+  predictions.jsonl       append-only event log: one "log" event per
+                          prediction, one "observe" event per outcome
+  predictions.idx.sqlite  id → byte offset index into the event log, so
+                          log and observe never rescan or rewrite it
+  predictions.json        materialized records, written by 'compact'
+
+  The index is derived data: it records how many log bytes it covers and
+  catches up (or rebuilds) whenever the log has moved on without it.
+  Appends hold an exclusive flock on the log, so concurrent writers never
+  record each other's offsets.
+  A legacy predictions.json with no event log is imported on first use.
 
 CLI usage:
-  python3 bin/predict.py log    "gen-index.py will exit 0 on an empty artifacts dir"
+  python3 bin/predict.py log    "gen-index.py will exit 0 on an empty artifacts dir" [--tag T ...]
   python3 bin/predict.py observe <id> "it exited 0" --confirmed
   python3 bin/predict.py observe <id> "it crashed" --refuted
   python3 bin/predict.py show
+  python3 bin/predict.py compact
+  python3 bin/predict.py analyze [--group-by tag|prefix|none] [--prefix-words N]
 """
 from __future__ import annotations
 
+import bisect
+import calendar
+import fcntl
 import json
+import math
 import os
+import sqlite3
 import time
 import uuid
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Tuple
 
 PREDICTIONS_FILE = "predictions.json"
+EVENTS_FILE = "predictions.jsonl"
+INDEX_FILE = "predictions.idx.sqlite"
 
 
 # ---------------------------------------------------------------------------
@@ -49,33 +73,209 @@ def _load(art_dir: Path) -> List[Dict]:
     return []
 
 
-def _save(art_dir: Path, records: List[Dict]) -> None:
-    path = Path(art_dir) / PREDICTIONS_FILE
-    path.write_text(json.dumps(records, indent=2), encoding="utf-8")
+def _dump_array(records: Iterable[Dict], fh: IO[str]) -> None:
+    """Write records as json.dumps(list(records), indent=2) would, streaming."""
+    first = True
+    for rec in records:
+        body = "\n".join("  " + ln for ln in json.dumps(rec, indent=2).splitlines())
+        fh.write(("[\n" if first else ",\n") + body)
+        first = False
+    fh.write("[]" if first else "\n]")
+
+
+def _record(log_ev: Dict, obs_ev: Optional[Dict]) -> Dict:
+    rec: Dict = {
+        "id": log_ev["id"],
+        "created_at": log_ev["created_at"],
+        "prediction": log_ev["prediction"],
+        "tags": log_ev.get("tags", []),
+        "outcome": None,
+        "resolved_at": None,
+        "status": "pending",
+    }
+    if obs_ev is not None:
+        rec["outcome"] = obs_ev["outcome"]
+        rec["resolved_at"] = obs_ev["resolved_at"]
+        rec["status"] = obs_ev["status"]
+    return rec
+
+
+# ---------------------------------------------------------------------------
+# Event store
+# ---------------------------------------------------------------------------
+
+class PredictionStore:
+    """
+    Append-only prediction event log plus its id → offset index.
+
+    Use as a context manager; every public method is O(1) in the number of
+    stored predictions apart from iter_records(), which streams them.
+    """
+
+    def __init__(self, art_dir: Path):
+        self.art_dir = Path(art_dir)
+        self.events_path = self.art_dir / EVENTS_FILE
+        self.art_dir.mkdir(parents=True, exist_ok=True)
+        if not self.events_path.exists():
+            self._import_legacy()
+        self.db = sqlite3.connect(str(self.art_dir / INDEX_FILE))
+        # The index is rebuildable from the log, so trade fsyncs for speed.
+        self.db.executescript(
+            "PRAGMA journal_mode = WAL;"
+            "PRAGMA synchronous = NORMAL;"
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "  id TEXT PRIMARY KEY, log_offset INTEGER NOT NULL, observe_offset INTEGER);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+        )
+        self._sync_index()
+
+    def __enter__(self) -> "PredictionStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    # -- index maintenance --------------------------------------------------
+
+    def _import_legacy(self) -> None:
+        records = _load(self.art_dir)
+        with open(self.events_path, "a", encoding="utf-8") as fh:
+            for rec in records:
+                ev = {"event": "log", "id": rec["id"], "created_at": rec["created_at"],
+                      "prediction": rec["prediction"]}
+                if rec.get("tags"):
+                    ev["tags"] = rec["tags"]
+                fh.write(json.dumps(ev) + "\n")
+                if rec.get("status") in ("confirmed", "refuted"):
+                    fh.write(json.dumps({
+                        "event": "observe", "id": rec["id"], "outcome": rec.get("outcome"),
+                        "resolved_at": rec.get("resolved_at"), "status": rec["status"],
+                    }) + "\n")
+
+    def _indexed_size(self) -> int:
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'log_size'").fetchone()
+        return row[0] if row else 0
+
+    def _set_indexed_size(self, size: int) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('log_size', ?)", (size,)
+        )
+
+    def _index_event(self, ev: Dict, offset: int) -> None:
+        if ev.get("event") == "log":
+            self.db.execute(
+                "INSERT OR REPLACE INTO predictions (id, log_offset, observe_offset) "
+                "VALUES (?, ?, NULL)",
+                (ev["id"], offset),
+            )
+        elif ev.get("event") == "observe":
+            self.db.execute(
+                "UPDATE predictions SET observe_offset = ? WHERE id = ?", (offset, ev["id"])
+            )
+
+    def _sync_index(self) -> None:
+        size = self.events_path.stat().st_size
+        start = self._indexed_size()
+        if start == size:
+            return
+        if start > size:
+            # Log was truncated or replaced: rebuild from scratch.
+            self.db.execute("DELETE FROM predictions")
+            start = 0
+        with open(self.events_path, "rb") as fh:
+            fh.seek(start)
+            offset = start
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    break  # torn trailing write; leave it for the next sync
+                try:
+                    self._index_event(json.loads(line), offset)
+                except (ValueError, KeyError):
+                    pass
+                offset += len(line)
+        self._set_indexed_size(offset)
+        self.db.commit()
+
+    # -- reads / writes -----------------------------------------------------
+
+    def _append(self, ev: Dict) -> None:
+        line = (json.dumps(ev) + "\n").encode("utf-8")
+        with open(self.events_path, "ab") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            # Index whatever other writers appended first, so the size
+            # recorded below never skips over their events.
+            self._sync_index()
+            offset = fh.seek(0, os.SEEK_END)
+            fh.write(line)
+            fh.flush()
+            self._index_event(ev, offset)
+            self._set_indexed_size(offset + len(line))
+            self.db.commit()
+
+    def _read_at(self, fh, offset: Optional[int]) -> Optional[Dict]:
+        if offset is None:
+            return None
+        fh.seek(offset)
+        return json.loads(fh.readline())
+
+    def log(self, prediction: str, tags: Optional[List[str]] = None) -> Dict:
+        ev: Dict = {"event": "log", "id": str(uuid.uuid4()), "created_at": _now(),
+                    "prediction": prediction}
+        if tags:
+            ev["tags"] = list(tags)
+        self._append(ev)
+        return _record(ev, None)
+
+    def observe(self, record_id: str, outcome: str, confirmed: bool) -> Dict:
+        row = self.db.execute(
+            "SELECT log_offset FROM predictions WHERE id = ?", (record_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"prediction record not found: {record_id}")
+        ev = {"event": "observe", "id": record_id, "outcome": outcome,
+              "resolved_at": _now(), "status": "confirmed" if confirmed else "refuted"}
+        self._append(ev)
+        with open(self.events_path, "rb") as fh:
+            return _record(self._read_at(fh, row[0]), ev)
+
+    def get(self, record_id: str) -> Dict:
+        row = self.db.execute(
+            "SELECT log_offset, observe_offset FROM predictions WHERE id = ?", (record_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"prediction record not found: {record_id}")
+        with open(self.events_path, "rb") as fh:
+            return _record(self._read_at(fh, row[0]), self._read_at(fh, row[1]))
+
+    def iter_records(self) -> Iterator[Dict]:
+        """Yield materialized records in creation order (newest last)."""
+        rows = self.db.execute(
+            "SELECT log_offset, observe_offset FROM predictions ORDER BY rowid"
+        )
+        with open(self.events_path, "rb") as fh:
+            for log_off, obs_off in rows:
+                yield _record(self._read_at(fh, log_off), self._read_at(fh, obs_off))
 
 
 # ---------------------------------------------------------------------------
 # API
 # ---------------------------------------------------------------------------
 
-def log_prediction(art_dir: Path, prediction: str) -> Dict:
+def log_prediction(
+    art_dir: Path,
+    prediction: str,
+    tags: Optional[List[str]] = None,
+) -> Dict:
     """
     Append a new prediction record with status='pending'.
+    tags — optional labels for grouping in analyze_predictions()
     Returns the new record dict.
     """
-    art_dir = Path(art_dir)
-    records = _load(art_dir)
-    record: Dict = {
-        "id": str(uuid.uuid4()),
-        "created_at": _now(),
-        "prediction": prediction,
-        "outcome": None,
-        "resolved_at": None,
-        "status": "pending",
-    }
-    records.append(record)
-    _save(art_dir, records)
-    return record
+    with PredictionStore(art_dir) as store:
+        return store.log(prediction, tags=tags)
 
 
 def record_outcome(
@@ -89,21 +289,256 @@ def record_outcome(
     outcome text and mark it 'confirmed' or 'refuted'.
     Raises KeyError if record_id is not found.
     """
-    art_dir = Path(art_dir)
-    records = _load(art_dir)
-    for rec in records:
-        if rec["id"] == record_id:
-            rec["outcome"] = outcome
-            rec["resolved_at"] = _now()
-            rec["status"] = "confirmed" if confirmed else "refuted"
-            _save(art_dir, records)
-            return rec
-    raise KeyError(f"prediction record not found: {record_id}")
+    with PredictionStore(art_dir) as store:
+        return store.observe(record_id, outcome, confirmed)
+
+
+def iter_predictions(art_dir: Path) -> Iterator[Dict]:
+    """Stream all prediction records (newest last)."""
+    with PredictionStore(art_dir) as store:
+        yield from store.iter_records()
 
 
 def show_predictions(art_dir: Path) -> List[Dict]:
     """Return all prediction records (newest last)."""
-    return _load(Path(art_dir))
+    return list(iter_predictions(art_dir))
+
+
+def compact(art_dir: Path) -> Path:
+    """
+    Materialize the event log into predictions.json (streamed, atomic replace).
+    Returns the path written.
+    """
+    art_dir = Path(art_dir)
+    out = art_dir / PREDICTIONS_FILE
+    tmp = out.with_name(out.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        _dump_array(iter_predictions(art_dir), fh)
+    os.replace(tmp, out)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Calibration analytics
+# ---------------------------------------------------------------------------
+
+def _epoch(ts: Optional[str]) -> Optional[float]:
+    """Fast path for the fixed "%Y-%m-%dT%H:%M:%SZ" format written by _now()."""
+    if not ts or len(ts) != 20:
+        return None
+    try:
+        return float(calendar.timegm((
+            int(ts[0:4]), int(ts[5:7]), int(ts[8:10]),
+            int(ts[11:13]), int(ts[14:16]), int(ts[17:19]), 0, 0, 0,
+        )))
+    except ValueError:
+        return None
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch (merging t-digest with the k1 scale function).
+
+    Keeps O(compression) centroids regardless of how many values are added;
+    accuracy is best near the tails, which is where p90/p99 live.
+    """
+
+    def __init__(self, compression: int = 100):
+        self.compression = compression
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._centroids: List[Tuple[float, float]] = []
+        self._buffer: List[Tuple[float, float]] = []
+
+    def add(self, x: float, weight: float = 1.0) -> None:
+        self._buffer.append((x, weight))
+        self.count += weight
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if len(self._buffer) >= 8 * self.compression:
+            self._compress()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        other._compress()
+        self._buffer.extend(other._centroids)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _k_limit(self, q: float) -> float:
+        # Largest cumulative fraction the current centroid may reach: k(q) + 1.
+        d = self.compression
+        k = d / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1) + 1
+        if k >= d / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / d) + 1) / 2
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        items = sorted(self._centroids + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in items)
+        merged: List[Tuple[float, float]] = []
+        mean, weight = items[0]
+        cum = 0.0
+        limit = self._k_limit(0.0)
+        for x, w in items[1:]:
+            if (cum + weight + w) / total <= limit:
+                weight += w
+                mean += (x - mean) * w / weight
+            else:
+                merged.append((mean, weight))
+                cum += weight
+                limit = self._k_limit(cum / total)
+                mean, weight = x, w
+        merged.append((mean, weight))
+        self._centroids = merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        self._compress()
+        cs = self._centroids
+        if not cs:
+            return None
+        if len(cs) == 1 or q <= 0:
+            return cs[0][0] if q > 0 else self.min
+        if q >= 1:
+            return self.max
+        target = q * self.count
+        # Interpolate between centroid centres (cumulative weight at mid-point).
+        centres = []
+        cum = 0.0
+        for _, w in cs:
+            centres.append(cum + w / 2)
+            cum += w
+        if target <= centres[0]:
+            return self.min + (cs[0][0] - self.min) * target / centres[0]
+        if target >= centres[-1]:
+            tail = self.count - centres[-1]
+            return cs[-1][0] + (self.max - cs[-1][0]) * (target - centres[-1]) / tail
+        i = bisect.bisect_right(centres, target)
+        lo, hi = centres[i - 1], centres[i]
+        frac = (target - lo) / (hi - lo)
+        return cs[i - 1][0] + (cs[i][0] - cs[i - 1][0]) * frac
+
+
+# Upper bounds (seconds) of the pending-age histogram buckets.
+PENDING_AGE_BUCKETS = (
+    ("<1h", 3600),
+    ("<1d", 86400),
+    ("<7d", 7 * 86400),
+    ("<30d", 30 * 86400),
+    (">=30d", math.inf),
+)
+
+
+class CalibrationStats:
+    """Running, mergeable calibration statistics for one group of predictions."""
+
+    def __init__(self):
+        self.total = 0
+        self.by_status = {"pending": 0, "confirmed": 0, "refuted": 0}
+        self.resolution = QuantileSketch()
+        self.resolution_sum = 0.0
+        self.pending_age = {label: 0 for label, _ in PENDING_AGE_BUCKETS}
+
+    def add(self, status: str, created: Optional[float], resolved: Optional[float],
+            now: float) -> None:
+        self.total += 1
+        self.by_status[status] = self.by_status.get(status, 0) + 1
+        if status == "pending":
+            if created is not None:
+                age = max(0.0, now - created)
+                for label, upper in PENDING_AGE_BUCKETS:
+                    if age < upper:
+                        self.pending_age[label] += 1
+                        break
+        elif created is not None and resolved is not None:
+            seconds = max(0.0, resolved - created)
+            self.resolution.add(seconds)
+            self.resolution_sum += seconds
+
+    def merge(self, other: "CalibrationStats") -> None:
+        self.total += other.total
+        for k, v in other.by_status.items():
+            self.by_status[k] = self.by_status.get(k, 0) + v
+        self.resolution.merge(other.resolution)
+        self.resolution_sum += other.resolution_sum
+        for k, v in other.pending_age.items():
+            self.pending_age[k] += v
+
+    def as_dict(self) -> Dict:
+        confirmed = self.by_status["confirmed"]
+        refuted = self.by_status["refuted"]
+        resolved = confirmed + refuted
+        n = self.resolution.count
+        q = self.resolution.quantile
+        return {
+            "total": self.total,
+            **self.by_status,
+            "confirmation_rate": confirmed / resolved if resolved else None,
+            "refutation_rate": refuted / resolved if resolved else None,
+            "resolution_seconds": {
+                "count": int(n),
+                "mean": self.resolution_sum / n if n else None,
+                "min": self.resolution.min if n else None,
+                "p50": q(0.5),
+                "p90": q(0.9),
+                "p99": q(0.99),
+                "max": self.resolution.max if n else None,
+            },
+            "pending_age_histogram": dict(self.pending_age),
+        }
+
+
+def _group_keys(rec: Dict, group_by: str, prefix_words: int) -> List[str]:
+    if group_by == "tag":
+        return rec.get("tags") or ["(untagged)"]
+    if group_by == "prefix":
+        return [" ".join(rec["prediction"].split()[:prefix_words]) or "(empty)"]
+    return []
+
+
+def analyze_predictions(
+    art_dir: Path,
+    group_by: str = "none",
+    prefix_words: int = 3,
+    now: Optional[float] = None,
+) -> Dict:
+    """
+    Compute calibration statistics in one streaming pass over the store.
+
+    group_by     — 'tag' (a record counts once per tag), 'prefix' (first
+                   prefix_words words of the prediction text) or 'none'
+    now          — reference epoch for pending ages (default: current time)
+
+    Memory is O(groups × sketch size), independent of the record count.
+    Returns a dict with keys: generated_at, group_by, overall, groups.
+    """
+    if group_by not in ("tag", "prefix", "none"):
+        raise ValueError(f"group_by must be tag, prefix or none, got: {group_by!r}")
+    now = time.time() if now is None else now
+    overall = CalibrationStats()
+    groups: Dict[str, CalibrationStats] = {}
+    for rec in iter_predictions(art_dir):
+        created = _epoch(rec["created_at"])
+        resolved = _epoch(rec["resolved_at"])
+        overall.add(rec["status"], created, resolved, now)
+        for key in _group_keys(rec, group_by, prefix_words):
+            stats = groups.get(key)
+            if stats is None:
+                stats = groups[key] = CalibrationStats()
+            stats.add(rec["status"], created, resolved, now)
+    return {
+        "generated_at": _now(),
+        "group_by": group_by,
+        "overall": overall.as_dict(),
+        "groups": {k: groups[k].as_dict() for k in sorted(groups)},
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -122,6 +557,9 @@ def main(argv: Optional[List[str]] = None) -> None:
 
     p_log = sub.add_parser("log", help="Record a new prediction (status=pending)")
     p_log.add_argument("prediction", help="What you expect to happen")
+    p_log.add_argument(
+        "--tag", action="append", default=[], help="Label for analyze --group-by tag (repeatable)"
+    )
 
     p_obs = sub.add_parser("observe", help="Record observed outcome for a prediction")
     p_obs.add_argument("id", help="Prediction record UUID")
@@ -131,12 +569,22 @@ def main(argv: Optional[List[str]] = None) -> None:
     group.add_argument("--refuted", action="store_true")
 
     sub.add_parser("show", help="Print all prediction records as JSON")
+    sub.add_parser("compact", help=f"Materialize the event log into {PREDICTIONS_FILE}")
+
+    p_an = sub.add_parser("analyze", help="Print calibration statistics as JSON")
+    p_an.add_argument("--group-by", choices=["tag", "prefix", "none"], default="none")
+    p_an.add_argument(
+        "--prefix-words",
+        type=int,
+        default=3,
+        help="Words of prediction text used as the group key for --group-by prefix",
+    )
 
     args = ap.parse_args(argv)
     art_dir = Path(args.art_dir)
 
     if args.cmd == "log":
-        rec = log_prediction(art_dir, args.prediction)
+        rec = log_prediction(art_dir, args.prediction, tags=args.tag)
         print(f"[predict] logged {rec['id']}")
         print(f"          prediction: {rec['prediction']}")
     elif args.cmd == "observe":
@@ -147,8 +595,16 @@ def main(argv: Optional[List[str]] = None) -> None:
             print(f"[predict] ERROR: {exc}", file=sys.stderr)
             sys.exit(1)
     elif args.cmd == "show":
-        records = show_predictions(art_dir)
-        json.dump(records, sys.stdout, indent=2)
+        _dump_array(iter_predictions(art_dir), sys.stdout)
+        sys.stdout.write("\n")
+    elif args.cmd == "compact":
+        out = compact(art_dir)
+        print(f"[predict] wrote {out}")
+    elif args.cmd == "analyze":
+        report = analyze_predictions(
+            art_dir, group_by=args.group_by, prefix_words=args.prefix_words
+        )
+        json.dump(report, sys.stdout, indent=2)
         sys.stdout.write("\n")
     else:
         ap.print_help()
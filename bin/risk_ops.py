@@ -25,18 +25,27 @@ Maps to the Layered Goal Graph:
 
 CLI usage (run from repo root):
   python3 bin/risk_ops.py declare  <op_name> <risk_level> <description> [--rollback CMD]
+                                   [--depends-on A,B]
+  python3 bin/risk_ops.py declare  --from-file ops.json
   python3 bin/risk_ops.py snapshot <op_name> <phase> <key=value ...>
   python3 bin/risk_ops.py log      <op_name> <event> [--details TEXT] [--severity LEVEL]
   python3 bin/risk_ops.py diff     <op_name>
   python3 bin/risk_ops.py show     [--registry|--trail|--snapshots]
+  python3 bin/risk_ops.py query    [--level LEVEL] [--prefix PREFIX]
+  python3 bin/risk_ops.py query    --trail [--op NAME] [--severity S] [--event E]
+                                   [--since TS] [--until TS] [--follow | --stats]
+  python3 bin/risk_ops.py rollback [op_name ... | --all] [--jobs N] [--timeout SECS] [--dry-run]
 """
 from __future__ import annotations
 
+import calendar
+import codecs
 import json
 import os
+import sys
 import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 RISK_REGISTRY_FILE = "risk_registry.json"
 AUDIT_TRAIL_FILE = "audit_trail.json"
@@ -46,13 +55,27 @@ VALID_RISK_LEVELS = ("low", "medium", "high", "critical")
 VALID_PHASES = ("pre", "post")
 VALID_SEVERITIES = ("info", "warning", "error", "critical")
 
+# Audit-trail events written by rollback(); they do not count as activity
+# that makes an operation a rollback candidate.
+ROLLBACK_EVENTS = ("rolled_back", "rollback_failed", "rollback_blocked")
+
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
+_TS_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
 def _now() -> str:
-    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    return time.strftime(_TS_FORMAT, time.gmtime())
+
+
+def _parse_ts(value: str) -> Optional[float]:
+    try:
+        return float(calendar.timegm(time.strptime(value, _TS_FORMAT)))
+    except (TypeError, ValueError):
+        return None
 
 
 def _load_json(path: Path, default):
@@ -80,12 +103,90 @@ def _save_registry(art_dir: Path, registry: List[Dict]) -> None:
     _write_json(Path(art_dir) / RISK_REGISTRY_FILE, registry)
 
 
+class RegistryIndex:
+    """
+    Keyed view of risk_registry.json.
+
+    On disk the registry stays a JSON array (see docs/INTERFACE_SPEC.md); in
+    memory it is held as an op_name → entry map plus a risk_level → op_names
+    secondary index, so duplicate checks and level filters never scan the
+    whole registry.  Names that appeared more than once are collected in
+    duplicates; declare_many() reports them when it rewrites the file.
+    """
+
+    def __init__(self, entries: Iterable[Dict] = ()):
+        self.by_name: Dict[str, Dict] = {}
+        self.duplicates: List[str] = []
+        self.by_level: Dict[str, List[str]] = {lvl: [] for lvl in VALID_RISK_LEVELS}
+        for entry in entries:
+            self.add(entry)
+
+    def __contains__(self, op_name: str) -> bool:
+        return op_name in self.by_name
+
+    def __len__(self) -> int:
+        return len(self.by_name)
+
+    def add(self, entry: Dict) -> None:
+        name = entry["op_name"]
+        old = self.by_name.get(name)
+        if old is not None:
+            # Legacy registries may hold duplicates; last declaration wins and
+            # the earlier one is dropped the next time the registry is saved.
+            self.duplicates.append(name)
+            self.by_level[old.get("risk_level", "")].remove(name)
+        self.by_name[name] = entry
+        self.by_level.setdefault(entry.get("risk_level", ""), []).append(name)
+
+    def get(self, op_name: str) -> Optional[Dict]:
+        return self.by_name.get(op_name)
+
+    def entries(self) -> List[Dict]:
+        """Return entries in declaration order (dicts preserve insertion order)."""
+        return list(self.by_name.values())
+
+    def query(self, level: Optional[str] = None, prefix: Optional[str] = None) -> List[Dict]:
+        names: Iterable[str] = self.by_level.get(level, []) if level else self.by_name
+        return [
+            self.by_name[n] for n in names
+            if not prefix or n.startswith(prefix)
+        ]
+
+
+def _load_registry_index(art_dir: Path) -> RegistryIndex:
+    return RegistryIndex(_load_registry(art_dir))
+
+
+def _make_registry_entry(
+    op_name: str,
+    risk_level: str,
+    description: str,
+    rollback_cmd: str = "",
+    depends_on: Optional[List[str]] = None,
+) -> Dict:
+    if not op_name:
+        raise ValueError("op_name must be a non-empty string")
+    if risk_level not in VALID_RISK_LEVELS:
+        raise ValueError(
+            f"risk_level must be one of {VALID_RISK_LEVELS}, got: {risk_level!r}"
+        )
+    return {
+        "op_name": op_name,
+        "risk_level": risk_level,
+        "description": description,
+        "rollback_cmd": rollback_cmd,
+        "depends_on": list(depends_on or []),
+        "declared_at": _now(),
+    }
+
+
 def declare_risk(
     art_dir: Path,
     op_name: str,
     risk_level: str,
     description: str,
     rollback_cmd: str = "",
+    depends_on: Optional[List[str]] = None,
 ) -> Dict:
     """
     Declare a risky operation and register it in risk_registry.json.
@@ -94,28 +195,104 @@ def declare_risk(
     risk_level  — one of: low, medium, high, critical
     description — human-readable explanation of why the operation is risky
     rollback_cmd — optional shell command to reverse the operation
+    depends_on  — optional already-declared op_names this operation builds on;
+                  rollback() reverses this operation before its dependencies
 
-    Raises ValueError for unknown risk_level or duplicate op_name.
+    Raises ValueError for unknown risk_level, duplicate op_name or an
+    undeclared dependency.
     Returns the new registry entry.
     """
-    if risk_level not in VALID_RISK_LEVELS:
-        raise ValueError(
-            f"risk_level must be one of {VALID_RISK_LEVELS}, got: {risk_level!r}"
-        )
-    art_dir = Path(art_dir)
-    registry = _load_registry(art_dir)
-    if any(r["op_name"] == op_name for r in registry):
-        raise ValueError(f"operation already declared: {op_name}")
-    entry: Dict = {
+    return declare_many(art_dir, [{
         "op_name": op_name,
         "risk_level": risk_level,
         "description": description,
         "rollback_cmd": rollback_cmd,
-        "declared_at": _now(),
-    }
-    registry.append(entry)
-    _save_registry(art_dir, registry)
-    return entry
+        "depends_on": depends_on or [],
+    }])[0]
+
+
+def declare_many(art_dir: Path, specs: Iterable[Dict]) -> List[Dict]:
+    """
+    Declare several risky operations with a single registry load and write.
+
+    specs — dicts with keys op_name, risk_level, description and optional
+            rollback_cmd / depends_on (the same shape as a registry entry)
+
+    The batch is all-or-nothing: every spec is validated (risk level,
+    duplicates against the registry and within the batch) before anything
+    is written.  Raises ValueError on the first invalid spec.
+    Returns the new registry entries in input order.
+    """
+    art_dir = Path(art_dir)
+    index = _load_registry_index(art_dir)
+    new_entries: List[Dict] = []
+    for spec in specs:
+        if not isinstance(spec, dict):
+            raise ValueError(f"declaration must be a JSON object, got: {spec!r}")
+        entry = _make_registry_entry(
+            str(spec.get("op_name", "")),
+            spec.get("risk_level", ""),
+            str(spec.get("description", "")),
+            rollback_cmd=str(spec.get("rollback_cmd", "") or ""),
+            depends_on=[str(d) for d in spec.get("depends_on") or []],
+        )
+        if entry["op_name"] in index:
+            raise ValueError(f"operation already declared: {entry['op_name']}")
+        for dep in entry["depends_on"]:
+            if dep not in index:
+                raise ValueError(
+                    f"{entry['op_name']}: depends on undeclared operation: {dep}"
+                )
+        index.add(entry)
+        new_entries.append(entry)
+    if new_entries:
+        _save_registry(art_dir, index.entries())
+        for name in index.duplicates:
+            print(f"[risk_ops] WARNING: dropped duplicate declaration of {name!r} "
+                  "from the registry; kept the last one", file=sys.stderr)
+    return new_entries
+
+
+def load_declarations(path: Path) -> List[Dict]:
+    """
+    Read bulk declarations for declare_many() from path.
+
+    Accepts either a JSON array of objects or JSON Lines (one object per
+    line; blank lines ignored).  Raises ValueError on malformed input.
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if text.lstrip().startswith("["):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"{path}: invalid JSON: {exc}") from None
+    specs: List[Dict] = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            specs.append(json.loads(line))
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"{path}:{lineno}: invalid JSON: {exc}") from None
+    return specs
+
+
+def query_registry(
+    art_dir: Path,
+    level: Optional[str] = None,
+    prefix: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Return registry entries filtered by risk_level and/or op_name prefix.
+
+    Only risk_registry.json is read; the audit trail and snapshots are not
+    touched.  Raises ValueError for an unknown level.
+    """
+    if level is not None and level not in VALID_RISK_LEVELS:
+        raise ValueError(
+            f"risk_level must be one of {VALID_RISK_LEVELS}, got: {level!r}"
+        )
+    return _load_registry_index(Path(art_dir)).query(level=level, prefix=prefix)
 
 
 # ---------------------------------------------------------------------------
@@ -211,6 +388,127 @@ def _save_trail(art_dir: Path, trail: List[Dict]) -> None:
     _write_json(Path(art_dir) / AUDIT_TRAIL_FILE, trail)
 
 
+def _append_trail(art_dir: Path, entry: Dict) -> None:
+    """
+    Append entry to audit_trail.json in place.
+
+    The file is kept byte-identical to json.dumps(trail, indent=2): only the
+    closing bracket is rewritten, so appends cost O(entry) instead of a full
+    load and rewrite, and offsets of existing entries never move (which is
+    what query --trail --follow relies on).  Falls back to a full rewrite
+    when the file is missing or does not end in a JSON array.
+    """
+    path = Path(art_dir) / AUDIT_TRAIL_FILE
+    body = "\n".join("  " + ln for ln in json.dumps(entry, indent=2).splitlines())
+    if path.exists():
+        with open(path, "r+b") as fh:
+            size = fh.seek(0, os.SEEK_END)
+            tail_start = max(0, size - 4096)
+            fh.seek(tail_start)
+            tail = fh.read().rstrip()
+            close = len(tail) - 1
+            if tail.endswith(b"]"):
+                before = tail[:close].rstrip()
+                if before.endswith(b"["):
+                    fh.seek(tail_start + close)
+                    fh.write(("\n" + body + "\n]").encode("utf-8"))
+                    fh.truncate()
+                    return
+                if before.endswith(b"}"):
+                    fh.seek(tail_start + len(before))
+                    fh.write((",\n" + body + "\n]").encode("utf-8"))
+                    fh.truncate()
+                    return
+    trail = _load_trail(art_dir)
+    trail.append(entry)
+    _save_trail(art_dir, trail)
+
+
+_WS = " \t\r\n"
+
+
+def _scan_trail(path: Path, offset: int = 0) -> Iterator[Tuple[Dict, int]]:
+    """
+    Incrementally decode the JSON array in path, yielding (entry, offset).
+
+    offset is the byte position just after the yielded entry; passing it
+    back in resumes the scan at the next element.  Memory use is bounded by
+    the read chunk plus the largest single entry.  Scanning stops quietly
+    at the end of the array, at EOF, or at the first malformed element.
+
+    Bytes are decoded with surrogateescape so offsets stay exact even past
+    invalid UTF-8; an entry containing such bytes is re-decoded with U+FFFD
+    replacements before it is yielded.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")("surrogateescape")
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        buf = ""
+        pos = 0
+        mark, mark_bytes = 0, offset      # buf[mark] sits at byte mark_bytes
+        state = "open" if offset == 0 else "sep"
+        eof = False
+
+        def refill() -> bool:
+            nonlocal buf, pos, mark, eof
+            if eof:
+                return False
+            chunk = fh.read(1 << 16)
+            eof = not chunk
+            buf = buf[mark:] + utf8.decode(chunk, final=eof)
+            pos -= mark
+            mark = 0
+            return True
+
+        while True:
+            while pos < len(buf) and buf[pos] in _WS:
+                pos += 1
+            if pos >= len(buf):
+                if not refill():
+                    return
+                continue
+            ch = buf[pos]
+            if state == "open":
+                if ch != "[":
+                    return
+                pos += 1
+                state = "first"
+            elif ch == "]" and state in ("first", "sep"):
+                return
+            elif state == "sep":
+                if ch != ",":
+                    return
+                pos += 1
+                state = "value"
+            else:
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if not refill():
+                        return
+                    continue
+                try:
+                    mark_bytes += len(buf[mark:end].encode("utf-8"))
+                except UnicodeEncodeError:
+                    mark_bytes += len(buf[mark:end].encode("utf-8", "surrogateescape"))
+                    raw = buf[pos:end].encode("utf-8", "surrogateescape")
+                    obj = json.loads(raw.decode("utf-8", "replace"))
+                mark = pos = end
+                state = "sep"
+                if isinstance(obj, dict):
+                    yield obj, mark_bytes
+
+
+def iter_trail(art_dir: Path) -> Iterator[Dict]:
+    """Stream audit-trail entries in order without loading the whole file."""
+    path = Path(art_dir) / AUDIT_TRAIL_FILE
+    if not path.exists():
+        return
+    for entry, _ in _scan_trail(path):
+        yield entry
+
+
 def log_event(
     art_dir: Path,
     op_name: str,
@@ -231,8 +529,6 @@ def log_event(
         raise ValueError(
             f"severity must be one of {VALID_SEVERITIES}, got: {severity!r}"
         )
-    art_dir = Path(art_dir)
-    trail = _load_trail(art_dir)
     entry: Dict = {
         "op_name": op_name,
         "event": event,
@@ -240,18 +536,338 @@ def log_event(
         "severity": severity,
         "logged_at": _now(),
     }
-    trail.append(entry)
-    _save_trail(art_dir, trail)
+    _append_trail(Path(art_dir), entry)
     return entry
 
 
+def _bound_ts(value: Optional[str], end_of_day: bool) -> Optional[str]:
+    """Normalise a --since/--until bound; a bare date covers the whole day."""
+    if not value:
+        return None
+    if len(value) == 10:
+        value += "T23:59:59Z" if end_of_day else "T00:00:00Z"
+    if _parse_ts(value) is None:
+        raise ValueError(f"timestamp must be YYYY-MM-DD or {_TS_FORMAT}, got: {value!r}")
+    return value
+
+
+class TrailFilter:
+    """Predicate over audit-trail entries; unset fields match everything."""
+
+    def __init__(
+        self,
+        op_name: Optional[str] = None,
+        severity: Optional[str] = None,
+        event: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ):
+        if severity is not None and severity not in VALID_SEVERITIES:
+            raise ValueError(
+                f"severity must be one of {VALID_SEVERITIES}, got: {severity!r}"
+            )
+        self.op_name = op_name
+        self.severity = severity
+        self.event = event
+        # logged_at is fixed-width ISO-8601 UTC, so string order is time order
+        self.since = _bound_ts(since, end_of_day=False)
+        self.until = _bound_ts(until, end_of_day=True)
+
+    def __call__(self, entry: Dict) -> bool:
+        if self.op_name is not None and entry.get("op_name") != self.op_name:
+            return False
+        if self.severity is not None and entry.get("severity") != self.severity:
+            return False
+        if self.event is not None and entry.get("event") != self.event:
+            return False
+        logged_at = entry.get("logged_at") or ""
+        if self.since is not None and logged_at < self.since:
+            return False
+        if self.until is not None and logged_at > self.until:
+            return False
+        return True
+
+
+def query_trail(art_dir: Path, match: Optional[TrailFilter] = None) -> Iterator[Dict]:
+    """Stream audit-trail entries accepted by match (all entries when None)."""
+    for entry in iter_trail(art_dir):
+        if match is None or match(entry):
+            yield entry
+
+
+def follow_trail(
+    art_dir: Path,
+    match: Optional[TrailFilter] = None,
+    interval: float = 0.5,
+) -> Iterator[Dict]:
+    """
+    Like query_trail(), then keep polling for appended entries (tail -f).
+
+    Resumes from the byte offset after the last entry seen.  If the file
+    shrinks or is replaced (rewritten or rotated), following restarts at the
+    new file's end: entries already in it are not yielded again.
+    """
+    path = Path(art_dir) / AUDIT_TRAIL_FILE
+    offset = 0
+    inode = None
+    while True:
+        if path.exists():
+            st = path.stat()
+            if inode is not None and (st.st_ino != inode or st.st_size < offset):
+                offset = 0
+                for _, offset in _scan_trail(path):
+                    pass
+            inode = st.st_ino
+            for entry, offset in _scan_trail(path, offset):
+                if match is None or match(entry):
+                    yield entry
+        time.sleep(interval)
+
+
+class TrailStats:
+    """
+    Single-pass aggregation over audit-trail entries.
+
+    Memory grows with the number of distinct operations, never with the
+    number of events: per-severity / per-event counters, plus per-op
+    duration aggregates built from started → completed pairs (a "failed"
+    event discards the open start).
+    """
+
+    def __init__(self):
+        self.events = 0
+        self.by_severity: Dict[str, int] = {s: 0 for s in VALID_SEVERITIES}
+        self.by_event: Dict[str, int] = {}
+        self.first_logged_at: Optional[str] = None
+        self.last_logged_at: Optional[str] = None
+        self._open: Dict[str, float] = {}
+        self._durations: Dict[str, Dict] = {}
+
+    def feed(self, entry: Dict) -> None:
+        self.events += 1
+        sev = entry.get("severity", "")
+        self.by_severity[sev] = self.by_severity.get(sev, 0) + 1
+        event = entry.get("event", "")
+        self.by_event[event] = self.by_event.get(event, 0) + 1
+        logged_at = entry.get("logged_at")
+        if logged_at:
+            if self.first_logged_at is None:
+                self.first_logged_at = logged_at
+            self.last_logged_at = logged_at
+
+        op = entry.get("op_name", "")
+        ts = _parse_ts(logged_at)
+        if event == "started" and ts is not None:
+            self._open[op] = ts
+        elif event == "completed" and op in self._open and ts is not None:
+            seconds = ts - self._open.pop(op)
+            d = self._durations.setdefault(
+                op, {"count": 0, "total_seconds": 0.0, "min_seconds": seconds,
+                     "max_seconds": seconds}
+            )
+            d["count"] += 1
+            d["total_seconds"] += seconds
+            d["min_seconds"] = min(d["min_seconds"], seconds)
+            d["max_seconds"] = max(d["max_seconds"], seconds)
+        elif event == "failed":
+            self._open.pop(op, None)
+
+    def as_dict(self) -> Dict:
+        durations = {}
+        for op, d in self._durations.items():
+            durations[op] = dict(d, mean_seconds=d["total_seconds"] / d["count"])
+        return {
+            "events": self.events,
+            "first_logged_at": self.first_logged_at,
+            "last_logged_at": self.last_logged_at,
+            "by_severity": self.by_severity,
+            "by_event": self.by_event,
+            "durations": durations,
+            "open_operations": sorted(self._open),
+        }
+
+
+def trail_stats(art_dir: Path, match: Optional[TrailFilter] = None) -> Dict:
+    """Aggregate the (filtered) audit trail in one streaming pass."""
+    stats = TrailStats()
+    for entry in query_trail(art_dir, match):
+        stats.feed(entry)
+    return stats.as_dict()
+
+
+# ---------------------------------------------------------------------------
+# Rollback  (L2: make operations reversible)
+# ---------------------------------------------------------------------------
+
+def rollback_candidates(art_dir: Path) -> List[str]:
+    """
+    Return op_names with audit-trail activity since their last rollback,
+    in the order they first appeared in the trail.
+    """
+    pending: Dict[str, None] = {}
+    for entry in iter_trail(Path(art_dir)):
+        name = entry.get("op_name")
+        if entry.get("event") == "rolled_back":
+            pending.pop(name, None)
+        elif entry.get("event") not in ROLLBACK_EVENTS:
+            pending.setdefault(name, None)
+    return list(pending)
+
+
+def plan_rollback(index: RegistryIndex, op_names: Iterable[str]) -> List[List[str]]:
+    """
+    Order op_names into rollback waves.
+
+    An operation is reversed before everything it depends_on, so each wave
+    only contains operations whose dependents (within the plan) sit in an
+    earlier wave.  Operations within a wave are independent and may run
+    concurrently.
+
+    Raises KeyError for an undeclared op_name and ValueError when the
+    depends_on graph among the planned operations has a cycle.
+    """
+    selected: List[str] = []
+    for name in op_names:
+        if name not in index:
+            raise KeyError(f"operation not declared: {name}")
+        if name not in selected:
+            selected.append(name)
+    members = set(selected)
+
+    # blockers[x] = planned ops that depend on x and so must be undone first
+    blockers: Dict[str, Set[str]] = {n: set() for n in selected}
+    for name in selected:
+        for dep in index.get(name).get("depends_on", []):
+            if dep in members and dep != name:
+                blockers[dep].add(name)
+
+    waves: List[List[str]] = []
+    done: Set[str] = set()
+    while len(done) < len(selected):
+        wave = [n for n in selected if n not in done and blockers[n] <= done]
+        if not wave:
+            cycle = sorted(n for n in selected if n not in done)
+            raise ValueError(f"dependency cycle among operations: {', '.join(cycle)}")
+        waves.append(wave)
+        done.update(wave)
+    return waves
+
+
+def _run_rollback_cmd(op_name: str, cmd: str, timeout: int) -> Dict:
+    from contract_runner import run_with_contract
+
+    contract = {
+        "resources": {"timeout_seconds": timeout},
+        "env": {"RISK_OP_NAME": op_name},
+    }
+    return run_with_contract(contract, "/bin/sh", ["-c", cmd])
+
+
+def _rollback_details(result: Dict) -> str:
+    if "error" in result:
+        return f"error={result['error']}"
+    return (
+        f"exit_code={result['exit_code']} timed_out={str(result['timed_out']).lower()} "
+        f"duration_seconds={result['duration_seconds']:.3f}"
+    )
+
+
+def rollback(
+    art_dir: Path,
+    op_names: Optional[List[str]] = None,
+    jobs: int = 4,
+    timeout: int = 300,
+    dry_run: bool = False,
+    all_candidates: bool = False,
+) -> Dict:
+    """
+    Execute registered rollback_cmd values in dependency order.
+
+    op_names       — operations to reverse; defaults to rollback_candidates()
+    jobs           — maximum rollbacks running concurrently within a wave
+    timeout        — per-command timeout in seconds (enforced by contract_runner)
+    dry_run        — only build and return the plan
+    all_candidates — required to actually run the defaulted candidates; without
+                     it a call with no op_names only plans (as dry_run)
+
+    Each command runs under contract_runner.run_with_contract() via /bin/sh
+    with RISK_OP_NAME set.  Every outcome is appended to the audit trail as
+    rolled_back (info), rollback_failed (error) or rollback_blocked (warning);
+    an operation is blocked when something that depends on it failed to roll
+    back, or it has no rollback_cmd.
+
+    Returns a dict with keys: ok, plan, results.
+    Raises KeyError / ValueError as plan_rollback().
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    art_dir = Path(art_dir)
+    index = _load_registry_index(art_dir)
+    if op_names is None:
+        op_names = [n for n in rollback_candidates(art_dir) if n in index]
+        # Reversing every op the trail mentions is too broad to do implicitly.
+        dry_run = dry_run or not all_candidates
+    waves = plan_rollback(index, op_names)
+    report: Dict = {"ok": True, "plan": waves, "results": []}
+    if dry_run:
+        return report
+
+    failed: Set[str] = set()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for wave in waves:
+            futures = {}
+            for name in wave:
+                entry = index.get(name)
+                dependents_failed = sorted(
+                    n for n in failed if name in index.get(n).get("depends_on", [])
+                )
+                reason = ""
+                if dependents_failed:
+                    reason = f"dependents not rolled back: {', '.join(dependents_failed)}"
+                elif not entry.get("rollback_cmd"):
+                    reason = "no rollback_cmd registered"
+                if reason:
+                    failed.add(name)
+                    log_event(art_dir, name, "rollback_blocked", details=reason,
+                              severity="warning")
+                    report["results"].append(
+                        {"op_name": name, "status": "blocked", "details": reason}
+                    )
+                    continue
+                fut = pool.submit(_run_rollback_cmd, name, entry["rollback_cmd"], timeout)
+                futures[fut] = name
+
+            # Trail writes stay on this thread; only the commands run concurrently.
+            for fut in as_completed(futures):
+                name = futures[fut]
+                result = fut.result()
+                ok = bool(result.get("ok"))
+                details = _rollback_details(result)
+                if ok:
+                    log_event(art_dir, name, "rolled_back", details=details)
+                else:
+                    failed.add(name)
+                    log_event(art_dir, name, "rollback_failed", details=details,
+                              severity="error")
+                report["results"].append({
+                    "op_name": name,
+                    "status": "rolled_back" if ok else "failed",
+                    "details": details,
+                    "exit_code": result.get("exit_code"),
+                    "timed_out": result.get("timed_out", False),
+                    "duration_seconds": result.get("duration_seconds"),
+                })
+
+    report["ok"] = not failed
+    return report
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
 def main(argv: Optional[List[str]] = None) -> None:
     import argparse
-    import sys
 
     ap = argparse.ArgumentParser(
         description=(
@@ -264,19 +880,32 @@ def main(argv: Optional[List[str]] = None) -> None:
 
     # declare
     p_dec = sub.add_parser("declare", help="Declare a risky operation (L3: risk declaration)")
-    p_dec.add_argument("op_name", help="Short operation identifier")
+    p_dec.add_argument("op_name", nargs="?", help="Short operation identifier")
     p_dec.add_argument(
         "risk_level",
+        nargs="?",
         choices=list(VALID_RISK_LEVELS),
         help="Risk level: low | medium | high | critical",
     )
-    p_dec.add_argument("description", help="Why this operation is risky")
+    p_dec.add_argument("description", nargs="?", help="Why this operation is risky")
     p_dec.add_argument(
         "--rollback",
         default="",
         metavar="CMD",
         help="Shell command to reverse the operation (makes it reversible)",
     )
+    p_dec.add_argument(
+        "--depends-on",
+        default="",
+        metavar="A,B",
+        help="Comma-separated already-declared operations this one builds on",
+    )
+    p_dec.add_argument(
+        "--from-file",
+        default=None,
+        metavar="PATH",
+        help="Bulk-declare operations from a JSON array or JSON Lines file",
+    )
 
     # snapshot
     p_snap = sub.add_parser(
@@ -324,14 +953,93 @@ def main(argv: Optional[List[str]] = None) -> None:
         "--snapshots", action="store_true", help="Show pre_post_snapshots.json"
     )
 
+    # query
+    p_query = sub.add_parser(
+        "query",
+        help="Filter the risk registry, or stream the audit trail with --trail (L4)",
+    )
+    p_query.add_argument(
+        "--level",
+        default=None,
+        choices=list(VALID_RISK_LEVELS),
+        help="Only operations with this risk level",
+    )
+    p_query.add_argument(
+        "--prefix", default=None, help="Only operations whose op_name starts with PREFIX"
+    )
+    p_query.add_argument(
+        "--trail",
+        action="store_true",
+        help="Stream matching audit-trail entries as JSON Lines instead",
+    )
+    p_query.add_argument("--op", default=None, metavar="NAME", help="(--trail) op_name")
+    p_query.add_argument(
+        "--severity", default=None, choices=list(VALID_SEVERITIES), help="(--trail) severity"
+    )
+    p_query.add_argument("--event", default=None, help="(--trail) event label")
+    p_query.add_argument(
+        "--since", default=None, metavar="TS", help="(--trail) logged_at >= TS (date or ISO)"
+    )
+    p_query.add_argument(
+        "--until", default=None, metavar="TS", help="(--trail) logged_at <= TS (date or ISO)"
+    )
+    trail_mode = p_query.add_mutually_exclusive_group()
+    trail_mode.add_argument(
+        "--follow", action="store_true", help="(--trail) keep printing new entries"
+    )
+    trail_mode.add_argument(
+        "--stats",
+        action="store_true",
+        help="(--trail) print severity/event counts and op durations instead",
+    )
+
+    # rollback
+    p_rb = sub.add_parser(
+        "rollback",
+        help="Run registered rollback commands in dependency order (L2: reversible ops)",
+    )
+    p_rb.add_argument(
+        "op_names",
+        nargs="*",
+        metavar="op_name",
+        help="Operations to roll back (none: print the plan for --all and stop)",
+    )
+    p_rb.add_argument(
+        "--all",
+        action="store_true",
+        dest="all_candidates",
+        help="Roll back every op active in the audit trail since its last rollback",
+    )
+    p_rb.add_argument("--jobs", type=int, default=4, help="Concurrent rollbacks per wave")
+    p_rb.add_argument(
+        "--timeout", type=int, default=300, metavar="SECS", help="Per-command timeout"
+    )
+    p_rb.add_argument(
+        "--dry-run", action="store_true", help="Print the plan without running anything"
+    )
+
     args = ap.parse_args(argv)
     art_dir = Path(args.art_dir)
 
-    if args.cmd == "declare":
+    if args.cmd == "declare" and args.from_file:
+        if args.op_name or args.risk_level or args.description:
+            p_dec.error("--from-file cannot be combined with positional arguments")
+        try:
+            entries = declare_many(art_dir, load_declarations(Path(args.from_file)))
+            print(f"[risk_ops] declared {len(entries)} operation(s) "
+                  f"→ {art_dir / RISK_REGISTRY_FILE}")
+        except (OSError, ValueError) as exc:
+            print(f"[risk_ops] ERROR: {exc}", file=sys.stderr)
+            sys.exit(1)
+
+    elif args.cmd == "declare":
+        if not (args.op_name and args.risk_level and args.description is not None):
+            p_dec.error("op_name, risk_level and description are required")
         try:
             entry = declare_risk(
                 art_dir, args.op_name, args.risk_level, args.description,
                 rollback_cmd=args.rollback,
+                depends_on=[s.strip() for s in args.depends_on.split(",") if s.strip()],
             )
             print(f"[risk_ops] declared '{entry['op_name']}' ({entry['risk_level']}) "
                   f"→ {art_dir / RISK_REGISTRY_FILE}")
@@ -393,6 +1101,58 @@ def main(argv: Optional[List[str]] = None) -> None:
         json.dump(data, sys.stdout, indent=2)
         sys.stdout.write("\n")
 
+    elif args.cmd == "query" and args.trail:
+        if args.level or args.prefix:
+            p_query.error("--level/--prefix apply to the registry, not --trail")
+        try:
+            match = TrailFilter(
+                op_name=args.op, severity=args.severity, event=args.event,
+                since=args.since, until=args.until,
+            )
+        except ValueError as exc:
+            print(f"[risk_ops] ERROR: {exc}", file=sys.stderr)
+            sys.exit(1)
+        if args.stats:
+            json.dump(trail_stats(art_dir, match), sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        else:
+            entries = follow_trail(art_dir, match) if args.follow else query_trail(art_dir, match)
+            try:
+                for entry in entries:
+                    sys.stdout.write(json.dumps(entry) + "\n")
+                    if args.follow:
+                        sys.stdout.flush()
+            except KeyboardInterrupt:
+                pass
+
+    elif args.cmd == "query":
+        if args.op or args.severity or args.event or args.since or args.until \
+                or args.follow or args.stats:
+            p_query.error("trail filters require --trail")
+        data = query_registry(art_dir, level=args.level, prefix=args.prefix)
+        json.dump(data, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    elif args.cmd == "rollback":
+        if args.op_names and args.all_candidates:
+            p_rb.error("--all cannot be combined with op names")
+        if not args.op_names and not args.all_candidates and not args.dry_run:
+            print("[risk_ops] no op names given; printing the --all plan without "
+                  "running anything", file=sys.stderr)
+        try:
+            report = rollback(
+                art_dir, args.op_names or None,
+                jobs=args.jobs, timeout=args.timeout, dry_run=args.dry_run,
+                all_candidates=args.all_candidates,
+            )
+        except (KeyError, ValueError) as exc:
+            print(f"[risk_ops] ERROR: {exc}", file=sys.stderr)
+            sys.exit(1)
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        if not report["ok"]:
+            sys.exit(1)
+
     else:
         ap.print_help()
         sys.exit(1)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+select_tests.py — change-based test selection for CI.
+
+Maps to the Layered Goal Graph:
+  L1 (Objective):  Make it easier to change in the future
+  L2 (Action):     Show change impact  →  only run what a change can break
+
+Pipeline:
+  1. changed paths    git diff --name-only BASE (plus untracked files), or --paths
+  2. module_map scan  refresh module_map.json from the tree (incremental)
+  3. affected set     changed modules plus their transitive impact closure
+  4. test coverage    per-test-node module references, derived statically from
+                      tests/*.py with ast and cached per file hash in
+                      test_selection.cache.json
+  5. selection        pytest node IDs and smoke stages touching the affected set
+
+Paths under --art-dir are generated output (including this tool's own
+module_map and test-selection caches) and never select tests. Anything else
+the tool cannot classify (workflow files, unmapped paths, a missing git base)
+selects everything: a false "nothing to run" is worse than a slow CI.
+
+CLI usage (run from repo root):
+  python3 bin/select_tests.py --base origin/main             # print the selection
+  python3 bin/select_tests.py --base origin/main --run       # and run it
+  python3 bin/select_tests.py --paths bin/template.py --format lines
+  python3 bin/select_tests.py --all --run
+"""
+from __future__ import annotations
+
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import module_map
+
+TEST_CACHE_FILE = "test_selection.cache.json"
+TEST_CACHE_VERSION = 1
+
+ROOT = module_map.ROOT
+TEST_GLOB = "tests/test_*.py"
+
+# Changes under these prefixes (or with these suffixes) never select tests.
+IGNORED_PREFIXES = ("docs/", "sessions/", "examples/", "contrib/")
+IGNORED_SUFFIXES = (".md",)
+
+# Non-code inputs read by a module at runtime, which module_map scan cannot see.
+PATH_RULES = {
+    "templates/": ["gen-index"],
+    "media-pack/": ["gen-index"],
+}
+
+# Smoke stages: run when any trigger module is in the affected set.
+SMOKE_STAGES: Dict[str, Dict] = {
+    "smoke-test": {
+        "modules": ["smoke_test", "hunchly.mk"],
+        "cmd": ["make", "-f", "hunchly.mk", "smoke-test"],
+    },
+}
+
+
+# ---------------------------------------------------------------------------
+# Changed paths
+# ---------------------------------------------------------------------------
+
+def changed_paths(base: str, root: Path = ROOT) -> Optional[List[str]]:
+    """
+    Return repo-relative paths changed since the merge base of base and HEAD
+    (including uncommitted and untracked files), or None if git cannot answer.
+
+    Diffing against the merge base rather than base itself keeps commits that
+    landed on base after this branch forked from counting as changes.
+    """
+    try:
+        out = subprocess.run(["git", "merge-base", base, "HEAD"], cwd=root,
+                             capture_output=True, text=True, check=True)
+        base = out.stdout.strip() or base
+    except (OSError, subprocess.CalledProcessError):
+        pass  # unrelated histories or a shallow clone: fall back to base itself
+    cmds = (
+        ["git", "diff", "--name-only", base],
+        ["git", "ls-files", "--others", "--exclude-standard"],
+    )
+    paths: Set[str] = set()
+    for cmd in cmds:
+        try:
+            out = subprocess.run(cmd, cwd=root, capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        paths.update(ln.strip() for ln in out.stdout.splitlines() if ln.strip())
+    return sorted(paths)
+
+
+# ---------------------------------------------------------------------------
+# Static test → module coverage
+# ---------------------------------------------------------------------------
+
+def _refs(node: ast.AST, imports: Dict[str, str]) -> Dict[str, Set[str]]:
+    """Names, imported modules and script-like strings used anywhere in node."""
+    names: Set[str] = set()
+    modules: Set[str] = set()
+    strings: Set[str] = set()
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Name):
+            names.add(sub.id)
+        elif isinstance(sub, ast.Import):
+            modules.update(a.name.split(".")[0] for a in sub.names)
+        elif isinstance(sub, ast.ImportFrom) and sub.level == 0 and sub.module:
+            modules.add(sub.module.split(".")[0])
+        elif isinstance(sub, ast.Constant) and isinstance(sub.value, str):
+            if sub.value.endswith((".py", ".sh")) and len(sub.value) < 256:
+                strings.add(Path(sub.value).name)
+    modules.update(imports[n] for n in names if n in imports)
+    return {"names": names, "modules": modules, "strings": strings}
+
+
+def parse_test_file(source: str, rel: str) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Map each pytest node ID in source to the import names and script file
+    names it references, following module-level helpers and constants
+    transitively (test → run_gen() → GEN → "gen-index.py").
+    """
+    tree = ast.parse(source)
+    imports: Dict[str, str] = {}
+    helpers: Dict[str, ast.AST] = {}
+    tests: Dict[str, ast.AST] = {}
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for a in node.names:
+                imports[(a.asname or a.name).split(".")[0]] = a.name.split(".")[0]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            for a in node.names:
+                imports[a.asname or a.name] = node.module.split(".")[0]
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            (tests if node.name.startswith("test") else helpers)[node.name] = node
+        elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef) and item.name.startswith("test"):
+                    tests[f"{node.name}::{item.name}"] = item
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for t in targets:
+                if isinstance(t, ast.Name):
+                    helpers[t.id] = node
+
+    memo: Dict[str, Dict[str, Set[str]]] = {}
+
+    def expand(node: ast.AST, seen: Set[str]) -> Dict[str, Set[str]]:
+        refs = _refs(node, imports)
+        for name in refs["names"] & set(helpers):
+            if name in seen:
+                continue
+            if name not in memo:
+                memo[name] = expand(helpers[name], seen | {name})
+            refs["modules"] |= memo[name]["modules"]
+            refs["strings"] |= memo[name]["strings"]
+        return refs
+
+    nodes: Dict[str, Dict[str, List[str]]] = {}
+    for name, node in tests.items():
+        refs = expand(node, set())
+        nodes[f"{rel}::{name}"] = {
+            "imports": sorted(refs["modules"]),
+            "strings": sorted(refs["strings"]),
+        }
+    return nodes
+
+
+def _sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def test_coverage(art_dir: Path, root: Path = ROOT) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Return the node-ID → references map for every test file, reusing
+    cached parses for files whose content hash is unchanged.
+    """
+    cache_path = Path(art_dir) / TEST_CACHE_FILE
+    cached: Dict[str, Dict] = {}
+    if cache_path.exists():
+        try:
+            data = json.loads(cache_path.read_text(encoding="utf-8"))
+            if data.get("version") == TEST_CACHE_VERSION:
+                cached = data.get("files", {})
+        except Exception:
+            pass
+    files: Dict[str, Dict] = {}
+    for p in sorted(Path(root).glob(TEST_GLOB)):
+        rel = p.relative_to(root).as_posix()
+        text = p.read_text(encoding="utf-8", errors="replace")
+        digest = _sha256_text(text)
+        if rel in cached and cached[rel]["sha256"] == digest:
+            files[rel] = cached[rel]
+            continue
+        try:
+            nodes = parse_test_file(text, rel)
+        except SyntaxError:
+            nodes = {}
+        files[rel] = {"sha256": digest, "nodes": nodes}
+    if files != cached:
+        Path(art_dir).mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(
+            json.dumps({"version": TEST_CACHE_VERSION, "files": files}, indent=2),
+            encoding="utf-8",
+        )
+    nodes: Dict[str, Dict[str, List[str]]] = {}
+    for entry in files.values():
+        nodes.update(entry["nodes"])
+    return nodes
+
+
+# ---------------------------------------------------------------------------
+# Selection
+# ---------------------------------------------------------------------------
+
+def _module_for_path(graph: module_map.DependencyGraph, path: str) -> Optional[str]:
+    return next((n for n, p in graph.paths.items() if p == path), None)
+
+
+def select(
+    art_dir: Path,
+    changed: Optional[Iterable[str]],
+    root: Path = ROOT,
+    run_all: bool = False,
+) -> Dict:
+    """
+    Compute which pytest nodes and smoke stages a set of changed paths needs.
+
+    changed — repo-relative paths; None means "unknown" and selects everything
+    Returns a dict with keys: changed, affected_modules, run_all, reasons,
+    pytest, smoke.
+    """
+    art_dir = Path(art_dir)
+    root = Path(root).resolve()
+    module_map.scan_modules(art_dir, root=root)
+    graph = module_map.load_graph(art_dir)
+    coverage = test_coverage(art_dir, root=root)
+
+    reasons: List[str] = []
+    if run_all:
+        reasons.append("--all requested")
+    if changed is None:
+        run_all = True
+        reasons.append("changed paths unknown (git diff failed)")
+        changed = []
+    changed = sorted(set(changed))
+    try:
+        art_prefix = art_dir.resolve().relative_to(root).as_posix() + "/"
+    except ValueError:
+        art_prefix = None  # art dir outside the repo: nothing to skip
+
+    affected: Set[str] = set()
+    changed_tests: Set[str] = set()
+    for path in changed:
+        if path.startswith("tests/"):
+            changed_tests.add(path)
+            continue
+        if path.startswith(IGNORED_PREFIXES) or path.endswith(IGNORED_SUFFIXES):
+            continue
+        if art_prefix and path.startswith(art_prefix):
+            continue
+        name = _module_for_path(graph, path)
+        seeds = [name] if name else next(
+            (mods for prefix, mods in PATH_RULES.items() if path.startswith(prefix)), None
+        )
+        if seeds is None:
+            run_all = True
+            reasons.append(f"unmapped path: {path}")
+            continue
+        for seed in seeds:
+            if seed in graph.index:
+                affected.add(seed)
+                affected.update(graph.impact(seed))
+
+    by_import = {
+        Path(p).stem: n for n, p in graph.paths.items()
+        if p.endswith(".py") and Path(p).stem.isidentifier()
+    }
+    by_basename = {Path(p).name: n for n, p in graph.paths.items() if p}
+
+    selected: List[str] = []
+    for node_id, refs in sorted(coverage.items()):
+        modules = {by_import[i] for i in refs["imports"] if i in by_import}
+        modules |= {by_basename[s] for s in refs["strings"] if s in by_basename}
+        if (
+            run_all
+            or node_id.split("::")[0] in changed_tests
+            or not modules  # unknown coverage: always run
+            or modules & affected
+        ):
+            selected.append(node_id)
+
+    smoke = [
+        stage for stage, spec in SMOKE_STAGES.items()
+        if run_all or affected.intersection(spec["modules"])
+    ]
+    return {
+        "changed": changed,
+        "affected_modules": sorted(affected),
+        "run_all": run_all,
+        "reasons": reasons,
+        "pytest": selected,
+        "smoke": smoke,
+    }
+
+
+def run_selection(selection: Dict, root: Path = ROOT) -> int:
+    """Run the selected pytest nodes and smoke stages; return 0 if all passed."""
+    rc = 0
+    if selection["pytest"]:
+        cmd = [sys.executable, "-m", "pytest", "-q"]
+        if not selection["run_all"]:
+            cmd += selection["pytest"]
+        print(f"[select_tests] RUN: pytest ({len(selection['pytest'])} node(s))", flush=True)
+        rc |= subprocess.call(cmd, cwd=root)
+    for stage in selection["smoke"]:
+        cmd = SMOKE_STAGES[stage]["cmd"]
+        print(f"[select_tests] RUN: {stage}: {' '.join(cmd)}", flush=True)
+        rc |= subprocess.call(cmd, cwd=root)
+    if not selection["pytest"] and not selection["smoke"]:
+        print("[select_tests] nothing affected; no tests selected")
+    return 1 if rc else 0
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+
+    ap = argparse.ArgumentParser(
+        description="Select tests affected by a change (L2: Show change impact)"
+    )
+    ap.add_argument("--art-dir", default=os.environ.get("ART_DIR", "artifacts"))
+    ap.add_argument("--root", default=str(ROOT), help="Repository root")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--base", default="HEAD", help="Git ref whose merge base with HEAD to diff against (default: HEAD)")
+    src.add_argument("--paths", nargs="+", default=None, help="Changed paths (skip git)")
+    src.add_argument("--all", action="store_true", help="Select everything")
+    ap.add_argument("--run", action="store_true", help="Run the selection")
+    ap.add_argument("--format", choices=["json", "lines"], default="json")
+    args = ap.parse_args(argv)
+
+    root = Path(args.root).resolve()
+    if args.all:
+        changed: Optional[List[str]] = []
+    elif args.paths is not None:
+        changed = args.paths
+    else:
+        changed = changed_paths(args.base, root)
+    selection = select(Path(args.art_dir), changed, root=root, run_all=args.all)
+
+    if args.format == "lines":
+        for node_id in selection["pytest"]:
+            print(node_id)
+        for stage in selection["smoke"]:
+            print(f"smoke:{stage}")
+    else:
+        json.dump(selection, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if args.run:
+        sys.stdout.flush()
+        sys.exit(run_selection(selection, root))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,89 +3,174 @@
 
 Prints whether a data:application/octet-stream;base64 source exists, decodes it,
 parses JSON, and prints basic metadata.
+
+Both wrapper styles written by embed_cast.py are understood: the plain
+<asciinema-player src="data:..."> embed and the --compress block
+(<script id="cast-data" data-encoding="gzip|deflate">), which is inflated
+here too. The wrapper is scanned and the payload decoded in chunks, then
+parsed with castio's streaming reader, so memory stays flat for large
+recordings. The payload is decoded twice — once to print DECODED_BYTES and
+check UTF-8 (RAW_NOT_UTF8) and once to parse — so the output keeps the order
+of the original whole-file version; ENCODING is printed first for
+compressed embeds.
+
+Usage:
+  python3 bin/verify_selfcontained.py [wrapper.html]   (default: artifacts/smoke.cast.selfcontained.html)
 """
-import re
 import base64
-import json
+import binascii
+import codecs
+import re
 import sys
+import zlib
 from pathlib import Path
 
-p = Path('artifacts/smoke.cast.selfcontained.html')
-if not p.exists():
-    print('FILE_MISSING', p)
-    sys.exit(2)
-
-html = p.read_text(encoding='utf-8', errors='ignore')
-# Find asciinema-player src with base64 payload
-m = re.search(r'<asciinema-player[^>]*src="data:application/octet-stream;base64,([^" >]+)"', html)
-if not m:
-    print('EMBED_NOT_FOUND')
-    sys.exit(3)
-
-b64 = m.group(1)
-try:
-    raw = base64.b64decode(b64)
-except Exception as e:
-    print('BASE64_DECODE_ERROR', e)
-    sys.exit(4)
-
-print('DECODED_BYTES', len(raw))
-# Asciinema v2 often stores a JSON header on the first line, followed by newline-delimited
-# event arrays. We'll attempt to parse that form: first line -> header JSON, remaining
-# lines -> events (each line is a JSON array). If payload is pure JSON, fall back to that.
-text = None
-try:
-    text = raw.decode('utf-8')
-except Exception:
-    print('RAW_NOT_UTF8')
-    sys.exit(6)
-
-# Split into lines and try parsing the first line as header
-lines = [ln for ln in text.splitlines() if ln.strip() != '']
-if not lines:
-    print('NO_LINES')
-    sys.exit(7)
-
-try:
-    header = json.loads(lines[0])
-    print('HEADER_KEYS', list(header.keys()))
+import castio
+
+CHUNK = 1 << 20
+# asciinema-player element whose src is an inline base64 payload, or the
+# compressed cast block from embed_cast.py --compress
+EMBED_RE = re.compile(
+    rb'<asciinema-player[^>]*src="data:application/octet-stream;base64,'
+    rb'|<script type="application/octet-stream" id="cast-data" data-encoding="(?P<encoding>[a-z-]+)">'
+)
+
+
+def find_embed(path: Path):
+    """Return (encoding or None, iterator of base64 payload chunks).
+
+    Raises LookupError if no embed is found.
+    """
+    f = open(path, 'rb')
+    window = b''
+    while True:
+        chunk = f.read(CHUNK)
+        window += chunk
+        m = EMBED_RE.search(window)
+        if m:
+            encoding = m.group('encoding')
+            return encoding and encoding.decode('ascii'), _iter_payload(f, window[m.end():])
+        if not chunk:
+            f.close()
+            raise LookupError('embed not found')
+        # keep enough of the tail for a match straddling chunk boundaries
+        window = window[-4096:]
+
+
+def _iter_payload(f, rest: bytes):
+    with f:
+        while True:
+            end = re.search(rb'[" ><]', rest)
+            if end:
+                yield rest[:end.start()]
+                return
+            yield rest
+            rest = f.read(CHUNK)
+            if not rest:
+                return
+
+
+def iter_inflated(chunks, encoding):
+    """Decompress gzip/zlib ("deflate") or raw deflate ("deflate-raw") chunks."""
+    wbits = {'gzip': 31, 'deflate': 15, 'deflate-raw': -15}[encoding]
+    d = zlib.decompressobj(wbits)
+    for chunk in chunks:
+        out = d.decompress(chunk)
+        if out:
+            yield out
+    tail = d.flush()
+    if tail:
+        yield tail
+
+
+def iter_decoded(b64_chunks, counter):
+    """Decode base64 chunks incrementally, counting decoded bytes in counter[0]."""
+    carry = b''
+    for chunk in b64_chunks:
+        data = carry + chunk
+        cut = len(data) - len(data) % 4
+        carry = data[cut:]
+        raw = base64.b64decode(data[:cut], validate=False)
+        counter[0] += len(raw)
+        yield raw
+    if carry:
+        raw = base64.b64decode(carry + b'=' * (-len(carry) % 4))
+        counter[0] += len(raw)
+        yield raw
+
+
+def _payload(chunks, encoding, counter):
+    payload = iter_decoded(chunks, counter)
+    return iter_inflated(payload, encoding) if encoding else payload
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    p = Path(argv[0]) if argv else Path('artifacts/smoke.cast.selfcontained.html')
+    if not p.exists():
+        print('FILE_MISSING', p)
+        sys.exit(2)
+
+    try:
+        encoding, chunks = find_embed(p)
+    except LookupError:
+        print('EMBED_NOT_FOUND')
+        sys.exit(3)
+    if encoding:
+        print('ENCODING', encoding)
+
+    # First pass: decode only, to report the size and check the text is UTF-8
+    # before anything is parsed (the output order predates streaming).
+    decoded = [0]
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    is_utf8 = True
+    try:
+        for raw in _payload(chunks, encoding, decoded):
+            if is_utf8:
+                try:
+                    utf8.decode(raw)
+                except UnicodeDecodeError:
+                    is_utf8 = False
+    except (binascii.Error, ValueError, KeyError, zlib.error) as e:
+        print('BASE64_DECODE_ERROR', e)
+        sys.exit(4)
+    print('DECODED_BYTES', decoded[0])
+    try:
+        utf8.decode(b'', final=True)
+    except UnicodeDecodeError:
+        is_utf8 = False
+    if not is_utf8:
+        print('RAW_NOT_UTF8')
+        sys.exit(6)
+
+    # Second pass: parse.
+    _, chunks = find_embed(p)
+    cast = castio.open_cast(_payload(chunks, encoding, [0]),
+                            on_malformed=lambda ln: print('EVENT_LINE_PARSE_FAIL', ln[:120]))
+    header = cast.header
+    if not header:
+        print('NO_LINES' if not cast.malformed else 'JSON_PARSE_ERROR')
+        sys.exit(7 if not cast.malformed else 5)
+    if cast.version == 1:
+        print('JSON_TOP_KEYS', list(header.keys()) + ['stdout'])
+    else:
+        print('HEADER_KEYS', list(header.keys()))
     for k in ('version', 'width', 'height', 'duration', 'env'):
         if k in header:
             print(f'{k.upper()}:', header[k])
-    # parse remaining lines as events
-    events = []
-    for ln in lines[1:]:
-        try:
-            ev = json.loads(ln)
-            events.append(ev)
-        except Exception:
-            # ignore malformed event lines but report
-            print('EVENT_LINE_PARSE_FAIL', ln[:120])
-    print('EVENT_COUNT', len(events))
-    if events:
-        print('FIRST_EVENT', events[0])
+    count = 0
+    first_event = None
+    for ev in cast:
+        if first_event is None:
+            first_event = list(ev)
+        count += 1
+
+    print('EVENT_COUNT', count)
+    if first_event is not None:
+        print('FIRST_EVENT', first_event)
     print('OK')
     sys.exit(0)
-except Exception:
-    # Not the header+lines format. Try parse raw as JSON document.
-    try:
-        j = json.loads(text)
-        print('JSON_TOP_KEYS', list(j.keys()))
-        for k in ('version', 'width', 'height', 'duration', 'env'):
-            if k in j:
-                print(f'{k.upper()}:', j[k])
-        # attempt to find events
-        events = j.get('stdout') or j.get('events') or j.get('events', None)
-        if isinstance(events, list):
-            print('EVENT_COUNT', len(events))
-            if events:
-                print('FIRST_EVENT', events[0])
-        else:
-            print('EVENTS_FIELD_TYPE', type(events))
-        print('OK')
-        sys.exit(0)
-    except Exception as e:
-        print('JSON_PARSE_ERROR', e)
-        preview = text[:400]
-        print('PREVIEW', preview)
-        sys.exit(5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+vtscreen.py — minimal VT100/ANSI screen model for rendering cast frames.
+
+A fixed cols x rows grid of characters that terminal output is replayed into.
+Handles what shell and TUI recordings actually use: printable text with
+autowrap, CR/LF/BS/TAB, cursor movement and positioning, erase in line and
+display, insert/delete of lines and characters, scroll regions, save/restore
+cursor, and the alternate screen (so a TUI that exits leaves the shell screen
+behind, as on a real terminal). Colours and other attributes (SGR) are
+parsed and ignored — the model renders text only.
+
+Output is tokenized with one regex and each token is applied in O(its
+length), so replaying a recording costs O(total bytes). Escape sequences
+split across feed() calls are carried over; malformed ones are stepped over
+the way a terminal would, without losing the text after them.
+
+Library usage:
+  screen = vtscreen.Screen(80, 24)
+  screen.feed("\\x1b[2J\\x1b[Hhello")
+  print(screen.text())
+  state = screen.to_dict()            # JSON-serializable keyframe
+  screen = vtscreen.Screen.from_dict(state)
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+TOKEN_RE = re.compile(
+    r"(?P<text>[^\x00-\x1f\x7f\x1b]+)"
+    r"|\x1b\[(?P<params>[0-?]*)[ -/]*(?P<final>[@-~])"
+    r"|(?P<string>\x1b[P\]X^_][^\x07\x1b]*(?:\x07|\x1b\\))"
+    r"|\x1b(?P<esc2>[()*+#%].)"
+    r"|\x1b(?P<esc>[^\[P\]X^_()*+#%])"
+    r"|(?P<ctl>[\x00-\x1a\x1c-\x1f\x7f])"
+)
+
+# What an escape sequence cut off by the end of a feed() chunk can look like.
+INCOMPLETE_RE = re.compile(
+    r"\x1b(?:\[[0-?]*[ -/]*|(?P<string>[P\]X^_][^\x07\x1b]*\x1b?)|[()*+#%])?"
+)
+# Malformed-sequence recovery: a CSI interrupted by a control character, and
+# a string (OSC/DCS...) interrupted by an ESC that does not terminate it.
+CSI_PREFIX_RE = re.compile(r"\x1b\[[0-?]*[ -/]*")
+CSI_BODY_RE = re.compile(r"[ -?]*")
+STRING_PREFIX_RE = re.compile(r"\x1b[P\]X^_][^\x07\x1b]*")
+
+# An unterminated sequence longer than this is not carried over: a string is
+# dropped (it holds no screen text), anything else is parsed as malformed.
+MAX_PENDING = 4096
+
+
+def parse_size(data: str) -> Optional[Tuple[int, int]]:
+    """Parse a resize event payload "COLSxROWS"."""
+    m = re.fullmatch(r"\s*(\d+)x(\d+)\s*", data)
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+class Screen:
+    def __init__(self, cols: int = 80, rows: int = 24):
+        self.cols = max(1, cols)
+        self.rows = max(1, rows)
+        self.grid: List[List[str]] = self._blank_grid()
+        self.x = 0
+        self.y = 0
+        self.top = 0
+        self.bottom = self.rows - 1
+        self.saved = (0, 0)
+        self.alt: Optional[Dict] = None  # saved primary screen while the alternate one is active
+        self._pending = ""
+
+    # ------------------------------------------------------------------ state
+
+    def _blank_row(self) -> List[str]:
+        return [" "] * self.cols
+
+    def _blank_grid(self) -> List[List[str]]:
+        return [self._blank_row() for _ in range(self.rows)]
+
+    def lines(self) -> List[str]:
+        return ["".join(row).rstrip() for row in self.grid]
+
+    def text(self) -> str:
+        """Screen contents: trailing spaces and trailing blank rows removed."""
+        lines = self.lines()
+        while lines and not lines[-1]:
+            lines.pop()
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict:
+        return {
+            "cols": self.cols,
+            "rows": self.rows,
+            "lines": ["".join(row) for row in self.grid],
+            "cursor": [self.x, self.y],
+            "scroll": [self.top, self.bottom],
+            "saved": list(self.saved),
+            "alt": self.alt,
+            "pending": self._pending,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> "Screen":
+        screen = cls(state["cols"], state["rows"])
+        screen.grid = [list(line.ljust(screen.cols)[:screen.cols]) for line in state["lines"]]
+        screen.x, screen.y = state["cursor"]
+        screen.top, screen.bottom = state["scroll"]
+        screen.saved = tuple(state["saved"])
+        screen.alt = state.get("alt")
+        screen._pending = state.get("pending", "")
+        return screen
+
+    def resize(self, cols: int, rows: int) -> None:
+        cols, rows = max(1, cols), max(1, rows)
+        if (cols, rows) == (self.cols, self.rows):
+            return
+        grid = [(row + [" "] * cols)[:cols] for row in self.grid]
+        if rows < len(grid):
+            # keep the rows around the cursor, as terminals do when shrinking
+            drop = max(0, min(self.y + 1, len(grid)) - rows)
+            grid = grid[drop:drop + rows]
+            self.y -= drop
+        self.cols, self.rows = cols, rows
+        grid += [self._blank_row() for _ in range(rows - len(grid))]
+        self.grid = grid
+        self.x = min(self.x, cols - 1)
+        self.y = min(max(self.y, 0), rows - 1)
+        self.top, self.bottom = 0, rows - 1
+        if self.alt is not None:
+            lines = [line.ljust(cols)[:cols] for line in self.alt["lines"][:rows]]
+            cx, cy = self.alt["cursor"]
+            self.alt = {
+                "lines": lines + [" " * cols] * (rows - len(lines)),
+                "cursor": [min(cx, cols - 1), min(cy, rows - 1)],
+            }
+
+    # ------------------------------------------------------------------ input
+
+    def feed(self, data: str) -> None:
+        if self._pending:
+            data = self._pending + data
+            self._pending = ""
+        pos, n = 0, len(data)
+        match = TOKEN_RE.match
+        while pos < n:
+            m = match(data, pos)
+            if m is None:
+                # data[pos] is an ESC that starts no complete sequence
+                tail = INCOMPLETE_RE.fullmatch(data, pos)
+                if tail:
+                    # cut off at the end of this chunk: carry it over
+                    if n - pos <= MAX_PENDING:
+                        self._pending = data[pos:]
+                        return
+                    if tail.group("string"):
+                        return
+                pos = self._recover(data, pos)
+                continue
+            pos = m.end()
+            kind = m.lastgroup
+            if kind == "text":
+                self._write(m.group("text"))
+            elif kind == "final":
+                self._csi(m.group("params"), m.group("final"))
+            elif kind == "ctl":
+                self._control(m.group("ctl"))
+            elif kind == "esc":
+                self._escape(m.group("esc"))
+            # "string" (OSC/DCS titles etc.) and "esc2" (charset selection) have no effect on text
+
+    def _recover(self, data: str, pos: int) -> int:
+        """Step past a malformed sequence at data[pos]; return the index to resume at.
+
+        As on a terminal, a C0 control inside a CSI is executed and the CSI
+        continues (CAN/SUB cancel it instead); an ESC inside a string
+        aborts the string and starts a new sequence. Anything else: the
+        lone ESC is skipped.
+        """
+        n = len(data)
+        m = CSI_PREFIX_RE.match(data, pos)
+        if m and m.end() < n and data[m.end()] != "\x1b" and data[m.end()] < " ":
+            # Walk the CSI by index, executing the controls embedded in it.
+            parts = [m.group(0)]
+            i = m.end()
+            while i < n and data[i] != "\x1b" and data[i] < " ":
+                if data[i] in "\x18\x1a":
+                    return i + 1
+                self._control(data[i])
+                body = CSI_BODY_RE.match(data, i + 1)
+                parts.append(body.group(0))
+                i = body.end()
+            if i == n:
+                seq = "".join(parts)
+                if len(seq) <= MAX_PENDING:
+                    self._pending = seq
+                return n
+            if "@" <= data[i] <= "~":
+                seq = TOKEN_RE.fullmatch("".join(parts) + data[i])
+                if seq and seq.lastgroup == "final":
+                    self._csi(seq.group("params"), seq.group("final"))
+                return i + 1
+            return i  # interrupted by ESC or DEL: the CSI is abandoned
+        m = STRING_PREFIX_RE.match(data, pos)
+        if m and m.end() < n:
+            return m.end()
+        return pos + 1
+
+    def _write(self, text: str) -> None:
+        cols = self.cols
+        i, end = 0, len(text)
+        while i < end:
+            if self.x >= cols:
+                self.x = 0
+                self._linefeed()
+            n = min(cols - self.x, end - i)
+            self.grid[self.y][self.x:self.x + n] = text[i:i + n]
+            self.x += n
+            i += n
+
+    def _linefeed(self) -> None:
+        if self.y == self.bottom:
+            self._scroll_up(1)
+        elif self.y < self.rows - 1:
+            self.y += 1
+
+    def _scroll_up(self, n: int, top: Optional[int] = None) -> None:
+        top = self.top if top is None else top
+        n = min(n, self.bottom - top + 1)
+        del self.grid[top:top + n]
+        self.grid[self.bottom - n + 1:self.bottom - n + 1] = [self._blank_row() for _ in range(n)]
+
+    def _scroll_down(self, n: int, top: Optional[int] = None) -> None:
+        top = self.top if top is None else top
+        n = min(n, self.bottom - top + 1)
+        del self.grid[self.bottom - n + 1:self.bottom + 1]
+        self.grid[top:top] = [self._blank_row() for _ in range(n)]
+
+    def _control(self, ch: str) -> None:
+        if ch == "\n" or ch == "\x0b" or ch == "\x0c":
+            self._linefeed()
+        elif ch == "\r":
+            self.x = 0
+        elif ch == "\b":
+            self.x = max(0, min(self.x, self.cols - 1) - 1)
+        elif ch == "\t":
+            self.x = min(self.cols - 1, (self.x // 8 + 1) * 8)
+
+    def _escape(self, ch: str) -> None:
+        if ch == "7":
+            self.saved = (self.x, self.y)
+        elif ch == "8":
+            self.x, self.y = self.saved
+        elif ch == "D":
+            self._linefeed()
+        elif ch == "E":
+            self.x = 0
+            self._linefeed()
+        elif ch == "M":
+            if self.y == self.top:
+                self._scroll_down(1)
+            elif self.y > 0:
+                self.y -= 1
+        elif ch == "c":
+            self.__init__(self.cols, self.rows)
+
+    def _erase(self, y: int, x0: int, x1: int) -> None:
+        row = self.grid[y]
+        row[x0:x1] = [" "] * (max(x1, x0) - x0)
+
+    def _set_alt(self, on: bool) -> None:
+        if on and self.alt is None:
+            self.alt = {"lines": ["".join(r) for r in self.grid], "cursor": [self.x, self.y]}
+            self.grid = self._blank_grid()
+        elif not on and self.alt is not None:
+            saved = self.alt
+            self.alt = None
+            self.grid = [list(line) for line in saved["lines"]]
+            self.x, self.y = saved["cursor"]
+
+    def _csi(self, params: str, final: str) -> None:
+        private = params[:1] in ("?", ">", "<", "=")
+        body = params[1:] if private else params
+        args = [int(p) if p.isdigit() else 0 for p in body.split(";")] if body else []
+
+        def arg(i: int = 0, default: int = 1) -> int:
+            v = args[i] if i < len(args) else 0
+            return v if v else default
+
+        cols, rows = self.cols, self.rows
+        x = min(self.x, cols - 1)
+        if private:
+            if final in "hl" and params[0] == "?":
+                for mode in args:
+                    if mode in (47, 1047, 1049):
+                        self._set_alt(final == "h")
+            return
+        if final == "A":
+            self.y = max(self.top if self.y >= self.top else 0, self.y - arg())
+        elif final == "B" or final == "e":
+            self.y = min(self.bottom if self.y <= self.bottom else rows - 1, self.y + arg())
+        elif final == "C" or final == "a":
+            self.x = min(cols - 1, x + arg())
+        elif final == "D":
+            self.x = max(0, x - arg())
+        elif final == "E":
+            self.x, self.y = 0, min(rows - 1, self.y + arg())
+        elif final == "F":
+            self.x, self.y = 0, max(0, self.y - arg())
+        elif final == "G" or final == "`":
+            self.x = min(cols - 1, arg() - 1)
+        elif final == "d":
+            self.y = min(rows - 1, arg() - 1)
+        elif final == "H" or final == "f":
+            self.y = min(rows - 1, arg(0) - 1)
+            self.x = min(cols - 1, arg(1) - 1)
+        elif final == "J":
+            mode = arg(0, 0)
+            if mode == 0:
+                self._erase(self.y, x, cols)
+                for y in range(self.y + 1, rows):
+                    self.grid[y] = self._blank_row()
+            elif mode == 1:
+                for y in range(self.y):
+                    self.grid[y] = self._blank_row()
+                self._erase(self.y, 0, x + 1)
+            else:
+                self.grid = self._blank_grid()
+        elif final == "K":
+            mode = arg(0, 0)
+            if mode == 0:
+                self._erase(self.y, x, cols)
+            elif mode == 1:
+                self._erase(self.y, 0, x + 1)
+            else:
+                self._erase(self.y, 0, cols)
+        elif final == "L":
+            if self.top <= self.y <= self.bottom:
+                self._scroll_down(arg(), top=self.y)
+        elif final == "M":
+            if self.top <= self.y <= self.bottom:
+                self._scroll_up(arg(), top=self.y)
+        elif final == "S":
+            self._scroll_up(arg())
+        elif final == "T":
+            self._scroll_down(arg())
+        elif final == "P":
+            row = self.grid[self.y]
+            n = min(arg(), cols - x)
+            del row[x:x + n]
+            row.extend([" "] * n)
+        elif final == "@":
+            row = self.grid[self.y]
+            n = min(arg(), cols - x)
+            row[x:x] = [" "] * n
+            del row[cols:]
+        elif final == "X":
+            self._erase(self.y, x, min(cols, x + arg()))
+        elif final == "r":
+            top, bottom = arg(0) - 1, arg(1, rows) - 1
+            if 0 <= top < bottom < rows:
+                self.top, self.bottom = top, bottom
+                self.x, self.y = 0, 0
+        elif final == "s":
+            self.saved = (self.x, self.y)
+        elif final == "u":
+            self.x, self.y = self.saved
+        # "m" (SGR) and everything else: no effect on text
+
+
+def replay(screen: Screen, events: Iterable[Tuple[float, str, str]]) -> Screen:
+    """Apply output ("o") and resize ("r") events to screen."""
+    for _, typ, data in events:
+        if typ == "o" or typ == "stdout":
+            screen.feed(data)
+        elif typ == "r":
+            size = parse_size(data)
+            if size:
+                screen.resize(*size)
+    return screen
+
+
+def keyframes(
+    screen: Screen, events: Iterable[Tuple[float, str, str]], interval: float
+) -> Iterator[Tuple[float, str]]:
+    """Replay events, yielding (t, screen text) every `interval` seconds of
+    recording time and once more at the end. Raises ValueError unless
+    interval > 0."""
+    if not interval > 0:
+        raise ValueError(f"keyframe interval must be > 0, got {interval}")
+    next_t = interval
+    last_t = 0.0
+    for ev in events:
+        t = ev[0]
+        while t >= next_t:
+            yield next_t, screen.text()
+            next_t += interval
+        replay(screen, [ev])
+        last_t = t
+    yield last_t, screen.text()
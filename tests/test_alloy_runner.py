@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import alloy_runner  # noqa: E402
+
+# Stand-in solver: appends each call to calls.log, then answers by command index.
+FAKE_SOLVER = '''
+import sys, time
+index, model = sys.argv[1], sys.argv[2]
+open(sys.argv[3], "a").write(f"{model}#{index}\\n")
+if "slow" in open(model).read() and index == "1":
+    time.sleep(30)
+print("00. check  C  0  UNSAT" if index == "0" else "01. run  R  1/1  SAT")
+'''
+
+
+def test_parse_commands_and_module_closure(tmp_path):
+    (tmp_path / 'base.als').write_text('sig A {}\n')
+    sub = tmp_path / 'slices'
+    sub.mkdir()
+    model = sub / 'one.als'
+    model.write_text('module slices/one\nopen base\n/* run Hidden */\n-- check Gone\n'
+                     'run {\n  some A\n} for 3\ncheck Ok for 2 // trailing\nLabel: run Named for 1\n')
+    cmds = alloy_runner.parse_commands(model)
+    assert [(c['index'], c['kind'], c['command']) for c in cmds] == [
+        (0, 'run', 'run { some A } for 3'), (1, 'check', 'check Ok for 2'), (2, 'run', 'run Named for 1')]
+    assert alloy_runner.module_closure(model) == sorted([model.resolve(), (tmp_path / 'base.als').resolve()])
+
+
+def test_runs_commands_in_parallel_with_timeouts_report_and_cache(tmp_path, capsys):
+    spec = tmp_path / 'spec'
+    spec.mkdir()
+    (spec / 'lib.als').write_text('sig A {}\n')
+    (spec / 'fast.als').write_text('open lib\ncheck C for 2\nrun R for 2\n')
+    (spec / 'slow.als').write_text('// slow\nopen lib\ncheck C for 2\nrun R for 2\n')
+    jar = tmp_path / 'alloy.jar'
+    jar.write_bytes(b'jar')
+    solver = tmp_path / 'solver.py'
+    solver.write_text(FAKE_SOLVER)
+    calls = tmp_path / 'calls.log'
+    report = tmp_path / 'report.json'
+    args = ['--spec-dir', str(spec), '--jar', str(jar), '--jobs', '4', '--timeout', '1',
+            '--cmd', f'{sys.executable} {solver} {{index}} {{model}} {calls}',
+            '--cache-dir', str(tmp_path / 'cache'), '--report', str(report)]
+
+    try:
+        alloy_runner.main(args)
+    except SystemExit as e:
+        assert e.code == 1  # the slow run timed out
+    data = json.loads(report.read_text())
+    outcomes = {(Path(r['model']).name, r['index']): r['outcome'] for r in data['results']}
+    assert outcomes == {('fast.als', 0): 'unsat', ('fast.als', 1): 'sat',
+                        ('slow.als', 0): 'unsat', ('slow.als', 1): 'timeout'}
+    assert data['summary']['commands'] == 4 and data['summary']['timeout'] == 1
+    assert data['summary']['cache_hits'] == 0
+    assert len(calls.read_text().splitlines()) == 4
+
+    # unchanged models are answered from the cache; the timeout is retried
+    capsys.readouterr()
+    try:
+        alloy_runner.main(args)
+    except SystemExit:
+        pass
+    assert json.loads(report.read_text())['summary']['cache_hits'] == 3
+    assert len(calls.read_text().splitlines()) == 5
+
+    # editing an opened module invalidates every model that opens it
+    (spec / 'lib.als').write_text('sig A {}\nsig B {}\n')
+    (spec / 'slow.als').write_text('open lib\ncheck C for 2\nrun R for 2\n')
+    try:
+        alloy_runner.main(args)
+    except SystemExit as e:
+        assert e.code == 0
+    data = json.loads(report.read_text())
+    assert data['summary']['cache_hits'] == 0 and data['summary']['violated_checks'] == 0
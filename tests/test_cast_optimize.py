@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import castio  # noqa: E402
+import cast_optimize  # noqa: E402
+
+
+def write_cast(path, events, **header):
+    head = {'version': 2, 'width': 20, 'height': 5, **header}
+    path.write_text('\n'.join([json.dumps(head)] + [json.dumps(e) for e in events]) + '\n')
+
+
+def test_optimize_caps_idle_merges_output_and_drops_noop_resizes(tmp_path):
+    src = tmp_path / 'in.cast'
+    write_cast(src, [
+        [0.0, 'o', 'h'], [0.001, 'o', 'i'], [0.002, 'o', ''],
+        [0.5, 'r', '20x5'],
+        [60.0, 'o', '\x1b[2'], [60.005, 'o', 'Jok'],
+        [60.1, 'r', '30x5'], [60.2, 'i', 'q'],
+    ], duration=60.2)
+    report = cast_optimize.optimize(src, tmp_path / 'out.cast', merge_window=0.01)
+
+    with castio.open_cast(tmp_path / 'out.cast') as cast:
+        assert 'duration' not in cast.header
+        assert cast.header['cast_optimize']['idle_limit'] == 2.0
+        assert list(cast) == [(0.0, 'o', 'hi'), (2.001, 'o', '\x1b[2Jok'), (2.101, 'r', '30x5'), (2.201, 'i', 'q')]
+    assert (report['events_in'], report['events_out']) == (8, 4)
+    assert report['screen_equal'] and report['bytes_out'] < report['bytes_in']
+    assert cast_optimize.is_optimized(tmp_path / 'out.cast')
+    assert not cast_optimize.is_optimized(src)
+
+
+def test_gen_index_optimizes_casts_once(tmp_path):
+    cast = tmp_path / 'rec.cast'
+    burst = [[i * 0.0005, 'o', ch] for i, ch in enumerate('abcdefghij' * 3)]
+    write_cast(cast, burst + [[30.0, 'o', 'c']])
+    env = dict(os.environ, ART_DIR=str(tmp_path), OPTIMIZE_CASTS='1')
+    gen = [sys.executable, os.path.join(ROOT, 'bin', 'gen-index.py')]
+
+    out = subprocess.run(gen, env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert '[optimize] rec.cast: ' in out
+    with castio.open_cast(cast) as reader:
+        assert list(reader) == [(0.0, 'o', 'abcdefghij' * 3), (burst[-1][0] + 2.0, 'o', 'c')]
+    assert (tmp_path / 'rec.cast.html').exists()
+
+    out = subprocess.run(gen, env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert '[optimize]' not in out
+
+
+def test_optimize_keeps_original_when_not_smaller(tmp_path):
+    cast = tmp_path / 'tiny.cast'
+    write_cast(cast, [[0.0, 'o', 'a']])
+    original = cast.read_bytes()
+    report = cast_optimize.optimize(cast, cast)
+    assert report['kept_original'] and report['bytes_out'] == report['bytes_in']
+    assert cast.read_bytes() == original
+    assert cast_optimize.is_optimized(cast)
+
+    copy = tmp_path / 'copy.cast'
+    assert cast_optimize.optimize(cast, copy)['kept_original']
+    assert copy.read_bytes() == original and cast_optimize.is_optimized(copy)
+
+    # an edited cast is tried again
+    write_cast(cast, [[0.0, 'o', 'b']])
+    os.utime(cast, ns=(1, 1))
+    assert not cast_optimize.is_optimized(cast)
+
+    env = dict(os.environ, ART_DIR=str(tmp_path), OPTIMIZE_CASTS='1')
+    gen = [sys.executable, os.path.join(ROOT, 'bin', 'gen-index.py')]
+    out = subprocess.run(gen, env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert 'keeping tiny.cast unchanged: optimized copy was not smaller' in out
+    out = subprocess.run(gen, env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert '[optimize]' not in out
+    (tmp_path / 'tiny.cast.idx').write_text('{}\n')
+    subprocess.run(gen, env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    index = (tmp_path / 'index.html').read_text()
+    assert 'tiny.cast<' in index.replace('</a>', '<')
+    assert 'optimize.json' not in index and 'tiny.cast.idx' not in index
@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import castindex  # noqa: E402
+import castio  # noqa: E402
+import vtscreen  # noqa: E402
+
+
+def _write_cast(path, version):
+    lines = [json.dumps({'version': version, 'width': 20, 'height': 4,
+                         'term': {'cols': 20, 'rows': 4}})]
+    prev = 0.0
+    for i in range(60):
+        t = i * 0.5
+        data = f'\x1b[2J\x1b[Hframe {i}\r\nline' if i % 10 == 0 else f' {i}\r\n'
+        lines.append(json.dumps([t - prev if version == 3 else t, 'o', data]))
+        prev = t
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def _full_replay(path, t):
+    with castio.open_cast(path) as cast:
+        screen = vtscreen.Screen(*castio.header_size(cast.header))
+        return vtscreen.replay(screen, (ev for ev in cast if ev[0] <= t)).text()
+
+
+def test_seek_matches_full_replay(tmp_path):
+    for version in (2, 3):
+        cast = tmp_path / f'v{version}.cast'
+        _write_cast(cast, version)
+        castindex.build_index(cast, every_seconds=3)
+        meta, keyframes = castindex.load_index(cast, rebuild=False)
+        assert meta['events'] == 60 and len(keyframes) > 5
+        for t in (0, 1.2, 7.5, 14.9, 29.5, 100):
+            assert castindex.screen_at(cast, t).text() == _full_replay(cast, t)
+
+
+def test_stale_index_is_rebuilt_and_thumbnails_written(tmp_path):
+    cast = tmp_path / 'rec.cast'
+    _write_cast(cast, 2)
+    castindex.build_index(cast)
+    with open(cast, 'a') as f:
+        f.write(json.dumps([40.0, 'o', '\x1b[2J\x1b[Hthe end']) + '\n')
+    assert castindex.screen_at(cast, 50).text() == 'the end'
+    out = castindex.write_thumbnails(cast)
+    _, keyframes = castindex.load_index(cast, rebuild=False)
+    assert out.name == 'rec.cast.thumbs.html'
+    assert out.read_text().count('<figure>') == len(keyframes)
@@ -0,0 +1,75 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import castio  # noqa: E402
+
+V2 = (
+    b'{"version": 2, "width": 10, "height": 3}\n'
+    b'[0.5, "o", "ab"]\n'
+    b'not json\n'
+    b'[1.25, "r", "20x5"]\n'
+    b'[2.0, "o", "\\u00e9"]\n'
+)
+
+
+def test_v2_events_stream_from_arbitrary_chunks():
+    chunks = [V2[i:i + 7] for i in range(0, len(V2), 7)]
+    cast = castio.open_cast(iter(chunks))
+    assert castio.header_size(cast.header) == (10, 3)
+    assert list(cast) == [(0.5, 'o', 'ab'), (1.25, 'r', '20x5'), (2.0, 'o', '\u00e9')]
+    assert cast.malformed == 1
+
+
+def test_v3_intervals_are_accumulated(tmp_path):
+    p = tmp_path / 'rec.cast'
+    p.write_text(
+        '{"version": 3, "term": {"cols": 100, "rows": 30}}\n'
+        '# a comment\n'
+        '[0.5, "o", "a"]\n'
+        '[0.25, "o", "b"]\n'
+        '[1.0, "x", "0"]\n'
+    )
+    with castio.open_cast(p) as cast:
+        assert castio.header_size(cast.header) == (100, 30)
+        assert [ev[0] for ev in cast] == [0.5, 0.75, 1.75]
+        assert cast.malformed == 0
+
+
+def test_v1_document_is_accepted():
+    doc = b'{\n "version": 1, "width": 5, "height": 2,\n "stdout": [[0.5, "a"], [0.5, "b"]]\n}\n'
+    cast = castio.open_cast(doc)
+    assert cast.version == 1
+    assert list(cast) == [(0.5, 'o', 'a'), (1.0, 'o', 'b')]
+
+
+def test_bad_header_does_not_read_the_whole_stream(monkeypatch):
+    pulled = []
+
+    def lines(first):
+        yield first
+        for i in range(1000):
+            pulled.append(i)
+            yield b'x' * 100 + b'\n'
+
+    cast = castio.open_cast(lines(b'not a header\n'))
+    assert cast.header == {} and cast.malformed == 1 and pulled == []
+
+    monkeypatch.setattr(castio, 'MAX_V1_BYTES', 1000)
+    cast = castio.open_cast(lines(b'{"version": 1,\n'))
+    assert cast.header == {} and cast.malformed == 1 and len(pulled) < 20
+
+
+def test_malformed_lines_are_reported():
+    seen = []
+    assert len(list(castio.open_cast(V2, on_malformed=seen.append))) == 3
+    assert seen == ['not json']
+
+
+def test_event_store_round_trips():
+    events = list(castio.open_cast(V2))
+    store = castio.EventStore.from_events(events)
+    assert len(store) == 3
+    assert list(store) == events
+    assert store[-1] == (2.0, 'o', '\u00e9')
@@ -0,0 +1,252 @@
+import base64
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import contract_runner  # noqa: E402
+
+
+def _script(tmp_path, body, name='job.sh'):
+    p = tmp_path / name
+    p.write_text('#!/bin/sh\n' + body)
+    p.chmod(0o755)
+    return str(p)
+
+
+def test_large_output_is_captured_and_teed(tmp_path):
+    script = _script(tmp_path, 'head -c 1000000 /dev/zero\necho err >&2\necho done\n')
+    tee = tmp_path / 'tee'
+    r = contract_runner.run_with_contract({}, script, [], tee_dir=str(tee))
+    assert r['ok'] and not r['stdout_truncated']
+    out = base64.b64decode(r['stdout_b64'])
+    assert len(out) == 1000005 and out.endswith(b'done\n')
+    assert (tee / 'stdout').read_bytes() == out
+    assert (tee / 'stderr').read_bytes() == b'err\n'
+
+
+def test_max_output_bytes_is_combined(tmp_path):
+    script = _script(tmp_path, 'head -c 600 /dev/zero\nhead -c 600 /dev/zero >&2\n')
+    r = contract_runner.run_with_contract({'resources': {'max_output_bytes': 1000}}, script, [])
+    assert r['combined_output_bytes'] == 1000
+    assert r['dropped_output_bytes'] == 200
+    assert r['stderr_truncated']
+
+
+def test_timeout_keeps_output_written_before_kill(tmp_path):
+    script = _script(tmp_path, 'echo start\nexec sleep 10\n')
+    r = contract_runner.run_with_contract({'resources': {'timeout_seconds': 1}}, script, [])
+    assert r['timed_out'] and not r['ok']
+    assert base64.b64decode(r['stdout_b64']) == b'start\n'
+
+
+def test_batch_streams_results_and_summary(tmp_path):
+    fast = _script(tmp_path, 'echo "$1"\n', 'fast.sh')
+    slow = _script(tmp_path, 'exec sleep 5\n', 'slow.sh')
+    jobs = tmp_path / 'jobs.jsonl'
+    jobs.write_text(
+        '{"id": "a", "script": "%s", "args": ["hi"]}\n'
+        '# comment\n'
+        '{"id": "b", "script": "%s", "timeout_seconds": 1}\n'
+        'not json\n' % (fast, slow)
+    )
+    items = list(contract_runner.run_batch(contract_runner.load_jobs(str(jobs)), workers=2))
+    summary = items.pop()['summary']
+    by_id = {r['id']: r for r in items}
+
+    assert base64.b64decode(by_id['a']['stdout_b64']) == b'hi\n'
+    assert by_id['b']['timed_out']
+    assert by_id['4']['error'] == 'invalid_job'
+    assert items[-1]['id'] == 'b'  # results arrive in completion order
+    assert summary['jobs'] == 3 and summary['ok'] == 1 and summary['timed_out'] == 1
+    assert 0 < summary['slot_utilization'] <= 1
+
+
+def test_batch_rejects_unsafe_and_duplicate_job_ids(tmp_path):
+    script = _script(tmp_path, 'echo ok\n')
+    jobs = tmp_path / 'jobs.jsonl'
+    jobs.write_text(''.join(
+        '{"id": %s, "script": "%s"}\n' % (json.dumps(i), script)
+        for i in ('a', '../escape', '/abs', '..', 'a', 'b.1')
+    ))
+    loaded = contract_runner.load_jobs(str(jobs))
+    assert [('error' in j) for j in loaded] == [False, True, True, True, True, False]
+    assert 'duplicate' in loaded[4]['error']
+
+    tee = tmp_path / 'tee'
+    items = list(contract_runner.run_batch(loaded, workers=2, tee_dir=str(tee)))
+    assert items.pop()['summary']['ok'] == 2
+    assert sorted(p.name for p in tee.iterdir()) == ['a', 'b.1']
+    assert not (tmp_path / 'escape').exists()
+
+
+def test_spool_mode_writes_artifacts_with_digests(tmp_path):
+    import hashlib
+    script = _script(tmp_path, 'printf "first\\n"\nhead -c 20000 /dev/zero | tr "\\0" x\nprintf "\\nlast\\n"\n')
+    art = tmp_path / 'art'
+    r = contract_runner.run_with_contract({}, script, [], spool_dir=str(art), spool_name='run1')
+    assert 'stdout_b64' not in r
+    out = r['stdout']
+    data = (art / 'run1.stdout.log').read_bytes()
+    assert out['name'] == 'run1.stdout.log' and out['size'] == len(data) == r['combined_output_bytes']
+    assert out['sha256'] == hashlib.sha256(data).hexdigest()
+    assert out['head'].startswith('first\n') and out['tail'].endswith('\nlast\n')
+    assert len(out['head']) == contract_runner.EXCERPT_BYTES
+    assert r['stderr']['size'] == 0 and r['stderr']['tail'] == ''
+
+
+def test_rusage_is_reported_and_limits_applied(tmp_path):
+    script = _script(tmp_path, 'ulimit -n\n')
+    contract = {'resources': {'max_open_files': 64, 'cpu_seconds': 30}}
+    r = contract_runner.run_with_contract(contract, script, [])
+    assert base64.b64decode(r['stdout_b64']) == b'64\n'
+    assert r['limits'] == {'cpu_seconds': 30, 'max_open_files': 64}
+    assert r['rusage']['max_rss_kb'] > 0
+    assert set(r['rusage']) >= {'user_cpu_seconds', 'sys_cpu_seconds', 'voluntary_ctx_switches'}
+
+
+def test_limits_apply_in_batch_threads_without_preexec_fn(tmp_path, monkeypatch):
+    real_popen = contract_runner.subprocess.Popen
+
+    def popen(*args, **kwargs):
+        assert kwargs.get('preexec_fn') is None
+        return real_popen(*args, **kwargs)
+
+    monkeypatch.setattr(contract_runner.subprocess, 'Popen', popen)
+    script = _script(tmp_path, 'ulimit -n\n')
+    jobs = [{'id': str(i), 'contract': {'resources': {'max_open_files': 32 + i}},
+             'script': script, 'args': []} for i in range(4)]
+    items = list(contract_runner.run_batch(jobs, workers=4))
+    assert items.pop()['summary']['ok'] == 4
+    for r in items:
+        assert base64.b64decode(r['stdout_b64']) == f"{32 + int(r['id'])}\n".encode()
+
+    r = contract_runner.run_with_contract({'resources': {'max_open_files': 64}}, str(tmp_path / 'nope.sh'), [])
+    assert r['error'] == 'script_not_found'
+
+
+def test_cpu_limit_stops_busy_child(tmp_path):
+    script = _script(tmp_path, 'while :; do :; done\n')
+    r = contract_runner.run_with_contract({'resources': {'cpu_seconds': 1, 'timeout_seconds': 20}}, script, [])
+    assert not r['ok'] and not r['timed_out']
+    assert r['exit_code'] < 0
+    assert r['rusage']['user_cpu_seconds'] + r['rusage']['sys_cpu_seconds'] >= 0.9
+
+
+def test_timeout_kills_whole_process_group(tmp_path):
+    import time
+    script = _script(tmp_path, 'sleep 30 &\necho started\nsleep 30\n')
+    t0 = time.monotonic()
+    r = contract_runner.run_with_contract({'resources': {'timeout_seconds': 1}}, script, [])
+    assert r['timed_out'] and time.monotonic() - t0 < 2.5
+    assert base64.b64decode(r['stdout_b64']) == b'started\n'
+    assert r['phases']['escalation'] == 'sigterm'
+
+
+def test_descendant_holding_a_pipe_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(contract_runner, 'DRAIN_GRACE_SECONDS', 0.2)
+    script = _script(tmp_path, '(sleep 2; echo late) &\necho early\n')
+    contract = {'cacheable': True}
+    r = contract_runner.run_with_contract(contract, script, [], cache_dir=str(tmp_path / 'cache'))
+    assert r['ok'] and r['pipes_left_open']
+    assert base64.b64decode(r['stdout_b64']) == b'early\n'
+    # possibly incomplete output is never cached
+    assert not (tmp_path / 'cache' / r['result_cache_key']).exists()
+
+    done = contract_runner.run_with_contract({}, _script(tmp_path, 'echo hi\n', 'plain.sh'), [])
+    assert done['pipes_left_open'] is False
+
+
+def test_sigterm_ignored_escalates_to_sigkill(tmp_path):
+    script = _script(tmp_path, "trap '' TERM\nwhile :; do sleep 0.1; done\n")
+    contract = {'resources': {'timeout_seconds': 1, 'kill_grace_seconds': 0.5}}
+    r = contract_runner.run_with_contract(contract, script, [])
+    phases = r['phases']
+    assert r['timed_out'] and phases['escalation'] == 'sigkill'
+    assert 0.9 <= phases['run_seconds'] < 1.5
+    assert 0.4 <= phases['terminate_seconds'] < 1.0
+
+
+def test_integrity_check_is_memoized_until_the_script_changes(tmp_path):
+    import hashlib
+    script = _script(tmp_path, 'echo v1\n', 'pinned.sh')
+    digest = hashlib.sha256(open(script, 'rb').read()).hexdigest()
+    contract = {'integrity': {'script_sha256': digest}}
+
+    assert contract_runner.run_with_contract(contract, script, [])['integrity_cache'] == 'miss'
+    assert contract_runner.run_with_contract(contract, script, [])['integrity_cache'] == 'hit'
+
+    with open(script, 'a') as f:
+        f.write('echo v2\n')
+    r = contract_runner.run_with_contract(contract, script, [])
+    assert r['error'] == 'script_sha256_mismatch' and r['integrity_cache'] == 'miss'
+
+
+def test_cacheable_contract_replays_until_an_input_changes(tmp_path):
+    counter = tmp_path / 'runs'
+    data = tmp_path / 'input.txt'
+    data.write_text('one\n')
+    script = _script(tmp_path, 'echo run >> "%s"\ncat "%s"\n' % (counter, data))
+    contract = {'cacheable': True, 'inputs': [str(data)], 'env': {'MODE': 'x'}}
+    cache = str(tmp_path / 'cache')
+
+    first = contract_runner.run_with_contract(contract, script, [], cache_dir=cache)
+    second = contract_runner.run_with_contract(contract, script, [], cache_dir=cache)
+    assert (first['result_cache'], second['result_cache']) == ('miss', 'hit')
+    assert second['stdout_b64'] == first['stdout_b64'] and 'rusage' not in second
+    assert counter.read_text() == 'run\n'
+
+    spooled = contract_runner.run_with_contract(contract, script, [], cache_dir=cache, spool_dir=str(tmp_path / 'art'))
+    assert spooled['result_cache'] == 'hit' and spooled['stdout']['head'] == 'one\n'
+
+    data.write_text('two\n')
+    third = contract_runner.run_with_contract(contract, script, [], cache_dir=cache)
+    assert third['result_cache'] == 'miss'
+    assert base64.b64decode(third['stdout_b64']) == b'two\n'
+
+
+def _cache_meta():
+    return dict.fromkeys(contract_runner.ResultCache.META_KEYS, 0)
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    cache = contract_runner.ResultCache(str(tmp_path), max_bytes=500)
+    meta = _cache_meta()
+    cache.put('a', meta, b'x' * 100, b'')
+    cache.put('b', meta, b'y' * 100, b'')
+    os.utime(tmp_path / 'a' / 'meta.json', (1, 1))
+    cache.put('c', meta, b'z' * 100, b'')
+    assert cache.get('a') is None
+    for key in ('b', 'c'):
+        hit = cache.get(key)
+        hit['stdout'].close()
+        hit['stderr'].close()
+
+
+def test_result_cache_scans_only_when_over_the_limit(tmp_path, monkeypatch):
+    cache = contract_runner.ResultCache(str(tmp_path), max_bytes=10_000)
+    scans = []
+    real_evict = contract_runner.ResultCache.evict
+    monkeypatch.setattr(contract_runner.ResultCache, 'evict',
+                        lambda self: scans.append(1) or real_evict(self))
+    for key in 'abcde':
+        cache.put(key, _cache_meta(), b'x' * 100, b'')
+    assert len(scans) == 1  # the first put seeds the running total
+    cache.put('big', _cache_meta(), b'x' * 10_000, b'')
+    assert len(scans) == 2
+
+
+def test_incomplete_cache_entry_is_a_miss(tmp_path):
+    script = _script(tmp_path, 'echo fresh\n')
+    contract = {'cacheable': True}
+    cache = str(tmp_path / 'cache')
+    first = contract_runner.run_with_contract(contract, script, [], cache_dir=cache)
+    entry = os.path.join(cache, first['result_cache_key'])
+    os.remove(os.path.join(entry, 'stdout'))
+
+    again = contract_runner.run_with_contract(contract, script, [], cache_dir=cache)
+    assert again['ok'] and again['result_cache'] == 'miss'
+    assert base64.b64decode(again['stdout_b64']) == b'fresh\n'
+    third = contract_runner.run_with_contract(contract, script, [], cache_dir=cache)
+    assert third['result_cache'] == 'hit'
@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import castio  # noqa: E402
+import embed_cast  # noqa: E402
+import embed_cast_static  # noqa: E402
+import vtscreen  # noqa: E402
+import verify_selfcontained  # noqa: E402
+
+
+def test_compressed_wrapper_round_trips_with_idle_capped(tmp_path):
+    cast = tmp_path / 'rec.cast'
+    events = [[0.5, 'o', 'a'], [1.0, 'o', ''], [61.0, 'o', 'bé'], [61.5, 'r', '90x30']]
+    cast.write_text('\n'.join([json.dumps({'version': 2, 'width': 80, 'height': 24})]
+                              + [json.dumps(e) for e in events]) + '\n')
+    out = tmp_path / 'rec.html'
+    embed_cast.write_compressed(str(cast), str(out), js='var x = 1;', css='', encoding='gzip', idle_limit=2)
+
+    html = out.read_text()
+    assert 'id="player-js"' in html and 'id="player-css"' not in html
+    encoding, chunks = verify_selfcontained.find_embed(out)
+    assert encoding == 'gzip'
+    payload = verify_selfcontained.iter_inflated(verify_selfcontained.iter_decoded(chunks, [0]), encoding)
+    got = castio.open_cast(payload)
+    assert got.header == {'version': 2, 'width': 80, 'height': 24}
+    assert list(got) == [(0.5, 'o', 'a'), (2.5, 'o', 'bé'), (3.0, 'r', '90x30')]
+
+
+def test_static_keyframe_interval_must_be_positive(tmp_path):
+    cast = tmp_path / 'a.cast'
+    cast.write_text(json.dumps({'version': 2}) + '\n' + json.dumps([1.0, 'o', 'x']) + '\n')
+    for bad in ('0', '-1', 'nan'):
+        r = subprocess.run([sys.executable, os.path.join(ROOT, 'bin', 'embed_cast_static.py'), '--keyframes', bad,
+                            str(cast)], capture_output=True, text=True, timeout=10)
+        assert r.returncode == 2 and '> 0' in r.stdout
+    with pytest.raises(ValueError):
+        embed_cast_static.write_static(cast, tmp_path / 'out.html', keyframe_interval=0)
+    with pytest.raises(ValueError):
+        list(vtscreen.keyframes(vtscreen.Screen(), [(1.0, 'o', 'x')], -1))
+
+
+def test_static_snapshots_seek_through_the_cast_index(tmp_path):
+    cast = tmp_path / 'a.cast'
+    events = [[float(i), 'o', f'\x1b[H\x1b[2Jframe {i}'] for i in range(30)]
+    cast.write_text('\n'.join([json.dumps({'version': 2, 'width': 20, 'height': 2})]
+                              + [json.dumps(e) for e in events]) + '\n')
+    r = subprocess.run([sys.executable, os.path.join(ROOT, 'bin', 'embed_cast_static.py'),
+                        '--at', '12.5', '--at', '25', str(cast)], capture_output=True, text=True, timeout=10)
+    assert r.returncode == 0, r.stdout
+    html = (tmp_path / 'a.cast.static.html').read_text()
+    snapshots = html.split('<h3>Snapshots</h3>')[1]
+    assert '<h4>t = 12.5s</h4>\n<pre>frame 12</pre>' in snapshots
+    assert '<h4>t = 25.0s</h4>\n<pre>frame 25</pre>' in snapshots
+    assert (tmp_path / 'a.cast.idx').exists()
+
+
+def test_static_keyframes_are_written_in_order(tmp_path):
+    cast = tmp_path / 'a.cast'
+    events = [[float(i), 'o', f'\x1b[H\x1b[2Jframe {i}'] for i in range(5)]
+    cast.write_text('\n'.join([json.dumps({'version': 2, 'width': 20, 'height': 2})]
+                              + [json.dumps(e) for e in events]) + '\n')
+    embed_cast_static.write_static(cast, tmp_path / 'out.html', keyframe_interval=2)
+    keyframes = (tmp_path / 'out.html').read_text().split('<h3>Keyframes</h3>\n')[1]
+    assert keyframes.startswith('<details><summary>t = 2.0s</summary><pre>frame 1</pre></details>\n'
+                                '<details><summary>t = 4.0s</summary><pre>frame 3</pre></details>\n<hr>')
+
+
+def test_verify_selfcontained_keeps_its_report_order(tmp_path):
+    import base64
+    payload = (json.dumps({'version': 2, 'width': 80, 'height': 24}) + '\n[0.1, "o", "hi"]\nbad\n').encode()
+    verify = [sys.executable, os.path.join(ROOT, 'bin', 'verify_selfcontained.py')]
+    for name, data in (('ok.html', payload), ('bin.html', b'\xff' + payload)):
+        (tmp_path / name).write_text('<asciinema-player src="data:application/octet-stream;base64,%s" preload>'
+                                     % base64.b64encode(data).decode())
+    r = subprocess.run(verify + [str(tmp_path / 'ok.html')], capture_output=True, text=True, timeout=10)
+    keys = [ln.split()[0] for ln in r.stdout.splitlines()]
+    assert r.returncode == 0 and keys == ['DECODED_BYTES', 'HEADER_KEYS', 'VERSION:', 'WIDTH:', 'HEIGHT:',
+                                          'EVENT_LINE_PARSE_FAIL', 'EVENT_COUNT', 'FIRST_EVENT', 'OK']
+    assert 'EVENT_LINE_PARSE_FAIL bad' in r.stdout
+    r = subprocess.run(verify + [str(tmp_path / 'bin.html')], capture_output=True, text=True, timeout=10)
+    assert r.returncode == 6 and r.stdout.splitlines()[-1] == 'RAW_NOT_UTF8'
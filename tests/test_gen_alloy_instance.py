@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import gen_alloy_instance  # noqa: E402
+
+
+def make_tree(tmp_path):
+    art = tmp_path / 'artifacts'
+    art.mkdir()
+    for name in ('a.cast', 'a.cast.html', 'a.meta.txt', 'b.cast', 'notes.txt'):
+        (art / name).write_text('x')
+    return art
+
+
+def test_unchanged_classification_skips_write_and_check_reports_status(tmp_path, capsys):
+    art = make_tree(tmp_path)
+    out = tmp_path / 'spec' / 'instance.als'
+    args = ['--root', str(tmp_path), '--artifacts', str(art), '--out', str(out)]
+
+    assert gen_alloy_instance.main(args + ['--check']) == 1
+    assert not out.exists()
+    assert gen_alloy_instance.main(args) == 0
+    text = out.read_text()
+    assert text.startswith(gen_alloy_instance.DIGEST_PREFIX)
+    assert 'artifacts_a_castCapture.wrapper = artifacts_a_cast_htmlWrapper' in text
+    assert gen_alloy_instance.main(args + ['--check']) == 0
+
+    mtime = out.stat().st_mtime_ns
+    (art / 'a.cast').write_text('new content, same name')
+    capsys.readouterr()
+    assert gen_alloy_instance.main(args) == 0
+    assert '[alloy] unchanged' in capsys.readouterr().out
+    assert out.stat().st_mtime_ns == mtime
+
+    (art / 'b.cast.html').write_text('x')
+    assert gen_alloy_instance.main(args + ['--check']) == 1
+    assert gen_alloy_instance.main(args) == 0
+    assert 'artifacts_b_castCapture.wrapper = artifacts_b_cast_htmlWrapper' in out.read_text()
+    assert gen_alloy_instance.main(args + ['--check']) == 0
+
+
+def test_slices_are_per_capture_and_incremental(tmp_path):
+    art = make_tree(tmp_path)
+    out = tmp_path / 'spec' / 'instance.als'
+    args = ['--root', str(tmp_path), '--artifacts', str(art), '--out', str(out), '--slices']
+
+    assert gen_alloy_instance.main(args) == 0
+    slices = tmp_path / 'spec' / 'slices'
+    manifest = json.loads((slices / 'manifest.json').read_text())
+    assert [s['stem'] for s in manifest['slices']] == ['a', 'b']
+    assert manifest['slices'][0]['scope'] == {
+        'Path': 5, 'CaptureRun': 1, 'CaptureArtifact': 1, 'WrapperArtifact': 1, 'MetadataSidecar': 1}
+    a_text = (slices / 'artifacts_a_cast.als').read_text()
+    assert 'module slices/artifacts_a_cast' in a_text and 'artifacts_b' not in a_text
+    assert 'run MissingWrapper for exactly 5 Path' in a_text
+    assert not out.exists()
+    assert gen_alloy_instance.main(args + ['--check']) == 0
+
+    a_mtime = (slices / 'artifacts_a_cast.als').stat().st_mtime_ns
+    (art / 'b.cast').unlink()
+    (art / 'c.cast').write_text('x')
+    assert gen_alloy_instance.main(args + ['--check']) == 1
+    assert gen_alloy_instance.main(args) == 0
+    assert sorted(p.name for p in slices.glob('*.als')) == ['artifacts_a_cast.als', 'artifacts_c_cast.als']
+    assert (slices / 'artifacts_a_cast.als').stat().st_mtime_ns == a_mtime
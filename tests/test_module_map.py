@@ -0,0 +1,104 @@
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import module_map  # noqa: E402
+
+
+def _tree(root):
+    (root / 'bin').mkdir()
+    (root / 'bin' / 'template.py').write_text('"""Tiny templates."""\n\ndef render(p):\n    pass\n')
+    (root / 'bin' / 'tool.py').write_text(
+        '"""Tool CLI."""\n'
+        'from template import render\n'
+        'HELPER = "helper.sh"\n\n'
+        'def run():\n    pass\n\n'
+        'def _private():\n    pass\n\n'
+        'def main():\n'
+        '    import argparse\n'
+        '    sub = argparse.ArgumentParser().add_subparsers()\n'
+        '    sub.add_parser("build")\n'
+    )
+    (root / 'bin' / 'helper.sh').write_text('#!/bin/sh\n# ./bin/tool.py\nexec /bin/bash -c true\n')
+    (root / 'build.mk').write_text('all:\n\tpython3 bin/tool.py build\n\t./bin/helper.sh\n')
+
+
+# ---------------------------------------------------------------------------
+# scan
+# ---------------------------------------------------------------------------
+
+def test_scan_extracts_deps_api_and_subcommands(tmp_path):
+    _tree(tmp_path)
+    art = tmp_path / 'art'
+    module_map.scan_modules(art, root=tmp_path)
+    mods = {m['name']: m for m in module_map.list_modules(art)}
+
+    assert mods['tool']['path'] == 'bin/tool.py'
+    assert mods['tool']['description'] == 'Tool CLI.'
+    assert mods['tool']['public_api'] == ['run', 'cli:build']
+    assert mods['tool']['depends_on'] == ['helper', 'template']
+    # comments and /bin/bash are not references
+    assert mods['helper']['depends_on'] == []
+    assert mods['build.mk']['depends_on'] == ['helper', 'tool']
+
+
+def test_scan_is_incremental_and_keeps_descriptions(tmp_path):
+    _tree(tmp_path)
+    art = tmp_path / 'art'
+    first = module_map.scan_modules(art, root=tmp_path)
+    assert first['parsed'] == 4 and first['added'] == 4
+    module_map.update_module(art, 'tool', description='Hand-written purpose')
+
+    again = module_map.scan_modules(art, root=tmp_path)
+    assert (again['parsed'], again['cached'], again['updated']) == (0, 4, 0)
+
+    (tmp_path / 'bin' / 'tool.py').write_text('import template\n\ndef other():\n    pass\n')
+    third = module_map.scan_modules(art, root=tmp_path)
+    assert third['parsed'] == 1
+    tool = module_map.get_module(art, 'tool')
+    assert tool['description'] == 'Hand-written purpose'
+    assert tool['public_api'] == ['other']
+    cache = json.loads((art / module_map.SCAN_CACHE_FILE).read_text())
+    assert set(cache['files']) == {'bin/helper.sh', 'bin/template.py', 'bin/tool.py', 'build.mk'}
+
+
+# ---------------------------------------------------------------------------
+# impact / deps
+# ---------------------------------------------------------------------------
+
+def _chain(art):
+    module_map.add_module(art, 'template', 'bin/template.py', 'templates')
+    module_map.add_module(art, 'gen-index', 'bin/gen-index.py', 'index',
+                          depends_on=['template'])
+    module_map.add_module(art, 'smoke_test', 'bin/smoke_test.sh', 'smoke',
+                          depends_on=['gen-index'])
+    module_map.add_module(art, 'predict', 'bin/predict.py', 'predictions')
+
+
+def test_impact_and_deps_are_transitive(tmp_path):
+    _chain(tmp_path)
+    r = module_map.query_graph(tmp_path, 'template.py', 'impact')
+    assert r['module'] == 'template'
+    assert r['impact'] == ['gen-index', 'smoke_test']
+    direct = module_map.query_graph(tmp_path, 'template', 'impact', transitive=False)
+    assert direct['impact'] == ['gen-index']
+    assert module_map.query_graph(tmp_path, 'bin/smoke_test.sh', 'deps')['deps'] == [
+        'gen-index', 'template']
+    assert module_map.query_graph(tmp_path, 'predict', 'impact')['impact'] == []
+
+
+def test_graph_index_tracks_edits_and_reports_cycles(tmp_path):
+    _chain(tmp_path)
+    assert (tmp_path / module_map.GRAPH_INDEX_FILE).exists()
+    # hand-edit module_map.json so the persisted index is stale
+    mods = json.loads((tmp_path / module_map.MODULE_MAP_FILE).read_text())
+    for m in mods:
+        if m['name'] == 'template':
+            m['depends_on'] = ['smoke_test']
+    (tmp_path / module_map.MODULE_MAP_FILE).write_text(json.dumps(mods))
+
+    r = module_map.query_graph(tmp_path, 'gen-index', 'impact')
+    assert r['cycle'] == ['gen-index', 'smoke_test', 'template']
+    assert r['impact'] == ['smoke_test', 'template']
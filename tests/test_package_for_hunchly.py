@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import package_for_hunchly  # noqa: E402
+
+
+def test_packages_casts_in_parallel_with_assets_loaded_once(tmp_path, monkeypatch):
+    (tmp_path / 'asciinema-player.min.js').write_text('/*js*/')
+    (tmp_path / 'asciinema-player.min.css').write_text('/*css*/')
+    for i in range(3):
+        (tmp_path / f'rec{i}.cast').write_text(
+            json.dumps({'version': 2, 'width': 20, 'height': 5}) + '\n' + json.dumps([0.1, 'o', f'run {i}']) + '\n')
+
+    # the player assets are read once in the parent; workers must not reload them
+    loads = []
+    real = package_for_hunchly.embed_cast.load_player_assets
+    monkeypatch.setattr(package_for_hunchly.embed_cast, 'load_player_assets',
+                        lambda *a: loads.append(a) or real(*a))
+    package_for_hunchly.main(['--jobs', '2', '--art-dir', str(tmp_path)])
+
+    assert len(loads) == 1
+    for i in range(3):
+        with zipfile.ZipFile(tmp_path / f'rec{i}.hunchly.zip') as z:
+            assert sorted(z.namelist()) == ['hunchly-manifest.json', f'rec{i}.cast', f'rec{i}.selfcontained.html', f'rec{i}.static.html']
+            assert '/*js*/' in z.read(f'rec{i}.selfcontained.html').decode()
+            assert f'run {i}' in z.read(f'rec{i}.static.html').decode()
+
+
+def test_one_bad_cast_does_not_stop_the_batch(tmp_path):
+    (tmp_path / 'a.cast').write_text(json.dumps({'version': 2}) + '\n')
+    (tmp_path / 'b.cast').write_text(json.dumps({'version': 2}) + '\n')
+    results = list(package_for_hunchly.package_all(
+        [tmp_path / 'a.cast', tmp_path / 'missing.cast', tmp_path / 'b.cast'], tmp_path, jobs=1, assets=('', '')))
+    assert [r[0].name for r in results] == ['a.cast', 'missing.cast', 'b.cast']
+    assert results[0][2] and results[2][2]
+    assert results[1][1] is None and 'FileNotFoundError' in results[1][3]
+
+
+def test_unchanged_cast_is_not_repackaged_and_incompressible_entries_are_stored(tmp_path):
+    cast = tmp_path / 'rec.cast'
+    noise = os.urandom(48 * 1024).hex()
+    cast.write_text(json.dumps({'version': 2}) + '\n' + ''.join(json.dumps([i / 10, 'o', 'hi ']) + '\n' for i in range(200)))
+    zipf, written = package_for_hunchly.package_cast(cast, tmp_path, assets=('', ''))
+    assert written
+    assert package_for_hunchly.package_cast(cast, tmp_path, assets=('', ''))[1] is False
+    # the manifest digest covers the compression level and the player assets
+    assert package_for_hunchly.package_cast(cast, tmp_path, assets=('', ''), level=9)[1]
+    assert package_for_hunchly.package_cast(cast, tmp_path, assets=('js', ''), level=9)[1]
+
+    blob = tmp_path / 'blob.bin'
+    blob.write_bytes(os.urandom(100 * 1024))
+    assert package_for_hunchly.choose_compression(blob, 6) == zipfile.ZIP_STORED
+    blob.write_text(noise)
+    assert package_for_hunchly.choose_compression(blob, 6) == zipfile.ZIP_DEFLATED
+    assert package_for_hunchly.choose_compression(blob, 0) == zipfile.ZIP_STORED
+
+    with zipfile.ZipFile(zipf) as z:
+        manifest = json.loads(z.read('hunchly-manifest.json'))
+        assert manifest['compress_level'] == 9
+        assert {e['name'] for e in manifest['entries']} == {'rec.cast', 'rec.selfcontained.html', 'rec.static.html'}
+        assert z.getinfo('rec.cast').compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_player_assets_fall_back_to_the_repo_artifacts(tmp_path, monkeypatch):
+    repo_art = tmp_path / 'repo-artifacts'
+    repo_art.mkdir()
+    (repo_art / 'asciinema-player.min.js').write_text('/*repo js*/')
+    (repo_art / 'asciinema-player.min.css').write_text('/*repo css*/')
+    other = tmp_path / 'elsewhere'
+    other.mkdir()
+    (other / 'asciinema-player.min.css').write_text('/*local css*/')
+    monkeypatch.setattr(package_for_hunchly.embed_cast, 'ART', str(repo_art))
+    monkeypatch.setattr(package_for_hunchly.embed_cast.urllib.request, 'urlopen',
+                        lambda *a, **k: (_ for _ in ()).throw(AssertionError('fetched from the CDN')))
+
+    assert package_for_hunchly.embed_cast.load_player_assets(str(other)) == ('/*repo js*/', '/*local css*/')
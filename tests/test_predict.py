@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import predict  # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+# Event-sourced store
+# ---------------------------------------------------------------------------
+
+def test_log_observe_show_roundtrip(tmp_path):
+    a = predict.log_prediction(tmp_path, 'exits 0')
+    b = predict.log_prediction(tmp_path, 'writes index.html')
+    rec = predict.record_outcome(tmp_path, a['id'], 'it did', confirmed=True)
+    assert rec['status'] == 'confirmed' and rec['prediction'] == 'exits 0'
+
+    records = predict.show_predictions(tmp_path)
+    assert [r['id'] for r in records] == [a['id'], b['id']]
+    assert records[0]['outcome'] == 'it did'
+    assert records[1]['status'] == 'pending'
+    # writes only ever append to the event log
+    events = (tmp_path / predict.EVENTS_FILE).read_text().splitlines()
+    assert [json.loads(e)['event'] for e in events] == ['log', 'log', 'observe']
+
+
+def test_observe_unknown_id_raises(tmp_path):
+    predict.log_prediction(tmp_path, 'x')
+    with pytest.raises(KeyError):
+        predict.record_outcome(tmp_path, 'no-such-id', 'nope', confirmed=False)
+
+
+def test_index_rebuilds_from_event_log(tmp_path):
+    a = predict.log_prediction(tmp_path, 'x')
+    (tmp_path / predict.INDEX_FILE).unlink()
+    rec = predict.record_outcome(tmp_path, a['id'], 'no', confirmed=False)
+    assert rec['status'] == 'refuted'
+
+
+def test_append_indexes_events_other_writers_added_first(tmp_path):
+    with predict.PredictionStore(tmp_path) as store:
+        other = {'event': 'log', 'id': 'other-writer', 'created_at': 'x', 'prediction': 'theirs'}
+        with open(tmp_path / predict.EVENTS_FILE, 'a') as fh:
+            fh.write(json.dumps(other) + '\n')
+        mine = store.log('mine')
+    with predict.PredictionStore(tmp_path) as store:
+        assert store.get('other-writer')['prediction'] == 'theirs'
+        assert store.get(mine['id'])['prediction'] == 'mine'
+
+
+def test_legacy_predictions_json_is_imported_and_compacted(tmp_path):
+    legacy = [{
+        'id': 'a1', 'created_at': '2026-01-01T00:00:00Z', 'prediction': 'old',
+        'outcome': 'yes', 'resolved_at': '2026-01-02T00:00:00Z', 'status': 'confirmed',
+    }]
+    (tmp_path / predict.PREDICTIONS_FILE).write_text(json.dumps(legacy))
+    new = predict.log_prediction(tmp_path, 'new')
+    out = predict.compact(tmp_path)
+    text = out.read_text()
+    records = json.loads(text)
+    assert text == json.dumps(records, indent=2)
+    assert records[0] == dict(legacy[0], tags=[])
+    assert records[1]['id'] == new['id']
+
+
+# ---------------------------------------------------------------------------
+# Calibration analytics
+# ---------------------------------------------------------------------------
+
+def test_quantile_sketch_merge_tracks_exact_quantiles():
+    a, b = predict.QuantileSketch(), predict.QuantileSketch()
+    for x in range(1, 10001):
+        (a if x % 2 else b).add(float(x))
+    a.merge(b)
+    assert a.count == 10000
+    assert abs(a.quantile(0.5) - 5000) < 100
+    assert abs(a.quantile(0.99) - 9900) < 20
+    assert a.quantile(1.0) == 10000.0
+
+
+def test_analyze_groups_by_tag(tmp_path):
+    with predict.PredictionStore(tmp_path) as store:
+        a = store.log('index builds', tags=['gen-index'])
+        b = store.log('index is empty', tags=['gen-index'])
+        store.log('cast plays', tags=['player'])
+        store.observe(a['id'], 'yes', confirmed=True)
+        store.observe(b['id'], 'no', confirmed=False)
+
+    report = predict.analyze_predictions(tmp_path, group_by='tag')
+    assert report['overall']['total'] == 3
+    gen = report['groups']['gen-index']
+    assert (gen['confirmed'], gen['refuted'], gen['pending']) == (1, 1, 0)
+    assert gen['confirmation_rate'] == 0.5
+    assert gen['resolution_seconds']['count'] == 2
+    player = report['groups']['player']
+    assert player['confirmation_rate'] is None
+    assert player['pending_age_histogram']['<1h'] == 1
+
+
+def test_analyze_groups_by_prediction_prefix(tmp_path):
+    predict.log_prediction(tmp_path, 'gen-index.py exits 0 on empty dir')
+    predict.log_prediction(tmp_path, 'gen-index.py exits 0 on unicode names')
+    predict.log_prediction(tmp_path, 'smoke test passes')
+    report = predict.analyze_predictions(tmp_path, group_by='prefix', prefix_words=2)
+    assert report['groups']['gen-index.py exits']['total'] == 2
+    assert report['groups']['smoke test']['total'] == 1
@@ -0,0 +1,228 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import risk_ops  # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+# Registry: declare / bulk declare / query
+# ---------------------------------------------------------------------------
+
+def test_declare_rejects_duplicate(tmp_path):
+    risk_ops.declare_risk(tmp_path, 'deploy', 'high', 'prod deploy')
+    with pytest.raises(ValueError, match='already declared'):
+        risk_ops.declare_risk(tmp_path, 'deploy', 'low', 'again')
+    registry = json.loads((tmp_path / risk_ops.RISK_REGISTRY_FILE).read_text())
+    assert isinstance(registry, list) and len(registry) == 1
+
+
+def test_declare_many_is_all_or_nothing(tmp_path):
+    risk_ops.declare_risk(tmp_path, 'a', 'low', 'first')
+    specs = [
+        {'op_name': 'b', 'risk_level': 'high', 'description': 'ok'},
+        {'op_name': 'b', 'risk_level': 'low', 'description': 'duplicate in batch'},
+    ]
+    with pytest.raises(ValueError):
+        risk_ops.declare_many(tmp_path, specs)
+    assert [e['op_name'] for e in risk_ops._load_registry(tmp_path)] == ['a']
+
+
+def test_declare_from_jsonl_file_and_query(tmp_path):
+    ops = tmp_path / 'ops.jsonl'
+    ops.write_text(
+        '{"op_name": "db-migrate", "risk_level": "critical", "description": "schema"}\n'
+        '\n'
+        '{"op_name": "db-backup", "risk_level": "low", "description": "dump",'
+        ' "rollback_cmd": "true"}\n'
+        '{"op_name": "cache-flush", "risk_level": "critical", "description": "flush"}\n'
+    )
+    risk_ops.main(['--art-dir', str(tmp_path), 'declare', '--from-file', str(ops)])
+
+    crit = risk_ops.query_registry(tmp_path, level='critical')
+    assert [e['op_name'] for e in crit] == ['db-migrate', 'cache-flush']
+    db = risk_ops.query_registry(tmp_path, prefix='db-')
+    assert [e['op_name'] for e in db] == ['db-migrate', 'db-backup']
+    both = risk_ops.query_registry(tmp_path, level='critical', prefix='db-')
+    assert [e['op_name'] for e in both] == ['db-migrate']
+
+
+# ---------------------------------------------------------------------------
+# Rollback runner
+# ---------------------------------------------------------------------------
+
+def test_plan_rollback_reverses_dependencies(tmp_path):
+    risk_ops.declare_risk(tmp_path, 'db', 'high', 'schema')
+    risk_ops.declare_risk(tmp_path, 'app', 'high', 'deploy', depends_on=['db'])
+    risk_ops.declare_risk(tmp_path, 'cdn', 'low', 'purge')
+    index = risk_ops._load_registry_index(tmp_path)
+    assert risk_ops.plan_rollback(index, ['db', 'app', 'cdn']) == [['app', 'cdn'], ['db']]
+
+
+def test_registry_index_keeps_last_duplicate_in_its_level(capsys):
+    index = risk_ops.RegistryIndex([
+        {'op_name': 'a', 'risk_level': 'low', 'description': 'first'},
+        {'op_name': 'a', 'risk_level': 'high', 'description': 'second'},
+    ])
+    assert len(index) == 1
+    assert index.query(level='low') == []
+    assert [e['description'] for e in index.query(level='high')] == ['second']
+    assert index.duplicates == ['a']
+    assert capsys.readouterr().err == ''
+
+
+def test_declare_warns_once_when_it_drops_legacy_duplicates(tmp_path, capsys):
+    risk_ops._save_registry(tmp_path, [
+        {'op_name': 'a', 'risk_level': 'low', 'description': 'first'},
+        {'op_name': 'a', 'risk_level': 'high', 'description': 'second'},
+    ])
+    risk_ops.query_registry(tmp_path)
+    assert capsys.readouterr().err == ''
+    risk_ops.declare_risk(tmp_path, 'b', 'low', 'next')
+    assert "dropped duplicate declaration of 'a'" in capsys.readouterr().err
+    risk_ops.declare_risk(tmp_path, 'c', 'low', 'later')
+    assert capsys.readouterr().err == ''
+    registry = risk_ops._load_registry(tmp_path)
+    assert [(e['op_name'], e['description']) for e in registry] == [
+        ('a', 'second'), ('b', 'next'), ('c', 'later')]
+
+
+def test_declare_rejects_undeclared_dependency(tmp_path):
+    with pytest.raises(ValueError, match='undeclared'):
+        risk_ops.declare_risk(tmp_path, 'app', 'high', 'deploy', depends_on=['db'])
+
+
+def test_rollback_runs_commands_and_logs_outcomes(tmp_path):
+    marker = tmp_path / 'undone.txt'
+    risk_ops.declare_risk(tmp_path, 'db', 'high', 'schema',
+                          rollback_cmd=f'echo db >> {marker}')
+    risk_ops.declare_risk(tmp_path, 'app', 'high', 'deploy',
+                          rollback_cmd='exit 3', depends_on=['db'])
+    risk_ops.declare_risk(tmp_path, 'cdn', 'low', 'purge',
+                          rollback_cmd=f'echo cdn >> {marker}')
+    for name in ('db', 'app', 'cdn'):
+        risk_ops.log_event(tmp_path, name, 'started')
+
+    report = risk_ops.rollback(tmp_path, timeout=10, all_candidates=True)
+
+    assert report['ok'] is False
+    status = {r['op_name']: r['status'] for r in report['results']}
+    # app failed, so db (which app depends on) must not be rolled back
+    assert status == {'app': 'failed', 'cdn': 'rolled_back', 'db': 'blocked'}
+    assert marker.read_text().split() == ['cdn']
+    events = [(e['op_name'], e['event']) for e in risk_ops._load_trail(tmp_path)]
+    assert ('cdn', 'rolled_back') in events
+    assert ('app', 'rollback_failed') in events
+    assert ('db', 'rollback_blocked') in events
+    # cdn is done; app and db still need attention
+    assert risk_ops.rollback_candidates(tmp_path) == ['db', 'app']
+
+
+def test_rollback_without_op_names_only_plans(tmp_path):
+    marker = tmp_path / 'undone.txt'
+    risk_ops.declare_risk(tmp_path, 'db', 'high', 'schema',
+                          rollback_cmd=f'echo db >> {marker}')
+    risk_ops.log_event(tmp_path, 'db', 'completed')
+
+    report = risk_ops.rollback(tmp_path, timeout=10)
+    assert report == {'ok': True, 'plan': [['db']], 'results': []}
+
+    proc = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'bin', 'risk_ops.py'),
+         '--art-dir', str(tmp_path), 'rollback'],
+        capture_output=True, text=True,
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout)['results'] == []
+    assert 'without running' in proc.stderr
+    assert not marker.exists()
+    assert risk_ops.rollback_candidates(tmp_path) == ['db']
+
+
+# ---------------------------------------------------------------------------
+# Audit trail: in-place append, streaming query, follow, stats
+# ---------------------------------------------------------------------------
+
+def test_append_keeps_trail_a_plain_json_array(tmp_path):
+    (tmp_path / risk_ops.AUDIT_TRAIL_FILE).write_text('[]')
+    for i in range(3):
+        risk_ops.log_event(tmp_path, f'op{i}', 'started', details='naïve')
+    text = (tmp_path / risk_ops.AUDIT_TRAIL_FILE).read_text()
+    trail = json.loads(text)
+    assert text == json.dumps(trail, indent=2)
+    assert list(risk_ops.iter_trail(tmp_path)) == trail
+
+
+def test_query_trail_filters(tmp_path):
+    risk_ops.log_event(tmp_path, 'a', 'started')
+    risk_ops.log_event(tmp_path, 'b', 'failed', severity='error')
+    risk_ops.log_event(tmp_path, 'a', 'failed', severity='error')
+    match = risk_ops.TrailFilter(severity='error', since='2000-01-01')
+    assert [e['op_name'] for e in risk_ops.query_trail(tmp_path, match)] == ['b', 'a']
+    match = risk_ops.TrailFilter(op_name='a', event='failed', until='2000-01-01')
+    assert list(risk_ops.query_trail(tmp_path, match)) == []
+
+
+def test_follow_trail_picks_up_appends(tmp_path):
+    risk_ops.log_event(tmp_path, 'a', 'started')
+    follow = risk_ops.follow_trail(tmp_path, interval=0.01)
+    assert next(follow)['event'] == 'started'
+    risk_ops.log_event(tmp_path, 'a', 'completed')
+    assert next(follow)['event'] == 'completed'
+
+
+def test_follow_trail_restarts_at_the_end_of_a_replaced_file(tmp_path):
+    risk_ops.log_event(tmp_path, 'a', 'started')
+    risk_ops.log_event(tmp_path, 'a', 'completed')
+    follow = risk_ops.follow_trail(tmp_path, interval=0.01)
+    assert [next(follow)['event'] for _ in range(2)] == ['started', 'completed']
+    risk_ops._save_trail(tmp_path, [{'op_name': 'b', 'event': 'rotated'}])
+    risk_ops.log_event(tmp_path, 'b', 'started')
+    # entries already in the rewritten file are skipped; only later appends show
+    timer = threading.Timer(0.2, risk_ops.log_event, (tmp_path, 'c', 'started'))
+    timer.start()
+    try:
+        assert next(follow)['op_name'] == 'c'
+    finally:
+        timer.join()
+
+
+def test_scan_trail_offsets_survive_invalid_utf8(tmp_path):
+    path = tmp_path / risk_ops.AUDIT_TRAIL_FILE
+    path.write_bytes(b'[{"op_name": "a", "details": "bad \xff\xfe byte"},\n'
+                     b' {"op_name": "b\xc3\xa9"},\n {"op_name": "c"}]')
+    scanned = list(risk_ops._scan_trail(path))
+    assert [e['op_name'] for e, _ in scanned] == ['a', 'b\u00e9', 'c']
+    assert scanned[0][0]['details'] == 'bad \ufffd\ufffd byte'
+    resumed = list(risk_ops._scan_trail(path, scanned[0][1]))
+    assert [e['op_name'] for e, _ in resumed] == ['b\u00e9', 'c']
+
+
+def test_trail_stats_pairs_started_and_completed(tmp_path):
+    trail = [
+        {'op_name': 'a', 'event': 'started', 'severity': 'info',
+         'logged_at': '2026-01-01T00:00:00Z'},
+        {'op_name': 'b', 'event': 'started', 'severity': 'info',
+         'logged_at': '2026-01-01T00:00:01Z'},
+        {'op_name': 'a', 'event': 'completed', 'severity': 'info',
+         'logged_at': '2026-01-01T00:00:30Z'},
+        {'op_name': 'b', 'event': 'failed', 'severity': 'error',
+         'logged_at': '2026-01-01T00:00:40Z'},
+        {'op_name': 'c', 'event': 'started', 'severity': 'warning',
+         'logged_at': '2026-01-01T00:00:50Z'},
+    ]
+    risk_ops._save_trail(tmp_path, trail)
+    stats = risk_ops.trail_stats(tmp_path)
+    assert stats['events'] == 5
+    assert stats['by_severity'] == {'info': 3, 'warning': 1, 'error': 1, 'critical': 0}
+    assert stats['durations'] == {'a': {
+        'count': 1, 'total_seconds': 30.0, 'min_seconds': 30.0,
+        'max_seconds': 30.0, 'mean_seconds': 30.0,
+    }}
+    assert stats['open_operations'] == ['c']
@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import select_tests  # noqa: E402
+
+
+def _tree(root):
+    (root / 'bin').mkdir()
+    (root / 'tests').mkdir()
+    (root / 'bin' / 'template.py').write_text('def render(p):\n    pass\n')
+    (root / 'bin' / 'tool.py').write_text('from template import render\n')
+    (root / 'bin' / 'other.py').write_text('X = 1\n')
+    (root / 'tests' / 'test_tool.py').write_text(
+        'import tool\n'
+        'SCRIPT = "bin/other.py"\n\n'
+        'def _run():\n    return SCRIPT\n\n'
+        'def test_tool():\n    assert tool\n\n'
+        'def test_other():\n    _run()\n\n'
+        'def test_plain():\n    assert True\n'
+    )
+
+
+def test_parse_test_file_follows_helpers_and_constants():
+    src = 'import tool\nS = "x/gen-index.py"\n\ndef h():\n    return S\n\ndef test_a():\n    h()\n'
+    nodes = select_tests.parse_test_file(src, 'tests/test_x.py')
+    assert nodes == {'tests/test_x.py::test_a': {'imports': [], 'strings': ['gen-index.py']}}
+
+
+def test_select_uses_impact_closure(tmp_path):
+    _tree(tmp_path)
+    art = tmp_path / 'art'
+
+    sel = select_tests.select(art, ['bin/template.py'], root=tmp_path)
+    assert sel['affected_modules'] == ['template', 'tool']
+    assert sel['pytest'] == ['tests/test_tool.py::test_plain', 'tests/test_tool.py::test_tool']
+    assert not sel['run_all']
+
+    sel = select_tests.select(art, ['bin/other.py', 'docs/notes.md'], root=tmp_path)
+    assert sel['pytest'] == ['tests/test_tool.py::test_other', 'tests/test_tool.py::test_plain']
+    assert (art / select_tests.TEST_CACHE_FILE).exists()
+
+
+def test_unmapped_or_unknown_changes_select_everything(tmp_path):
+    _tree(tmp_path)
+    art = tmp_path / 'art'
+    sel = select_tests.select(art, ['.github/workflows/ci.yml'], root=tmp_path)
+    assert sel['run_all'] and len(sel['pytest']) == 3
+    assert sel['smoke'] == list(select_tests.SMOKE_STAGES)
+
+    sel = select_tests.select(art, None, root=tmp_path)
+    assert sel['run_all']
+
+
+def test_changed_paths_diffs_against_the_merge_base(tmp_path):
+    def git(*args):
+        subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', *args],
+                       cwd=tmp_path, check=True, capture_output=True)
+
+    git('init', '-q', '-b', 'main')
+    (tmp_path / 'a.py').write_text('A = 1\n')
+    git('add', '.')
+    git('commit', '-qm', 'base')
+    git('checkout', '-qb', 'feature')
+    (tmp_path / 'b.py').write_text('B = 1\n')
+    git('add', '.')
+    git('commit', '-qm', 'feature')
+    git('checkout', '-q', 'main')
+    (tmp_path / 'a.py').write_text('A = 2\n')
+    git('commit', '-qam', 'main moves on')
+    git('checkout', '-q', 'feature')
+
+    assert select_tests.changed_paths('main', root=tmp_path) == ['b.py']
+
+
+def test_second_run_ignores_the_selectors_own_caches(tmp_path):
+    _tree(tmp_path)
+    for args in (['init', '-q'], ['add', '.'], ['commit', '-qm', 'tree']):
+        subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', *args],
+                       cwd=tmp_path, check=True, capture_output=True)
+    art = tmp_path / 'artifacts'
+
+    first = select_tests.select(art, select_tests.changed_paths('HEAD', root=tmp_path), root=tmp_path)
+    assert not first['run_all'] and first['pytest'] == ['tests/test_tool.py::test_plain']
+    changed = select_tests.changed_paths('HEAD', root=tmp_path)
+    assert any(p.startswith('artifacts/') for p in changed)
+    second = select_tests.select(art, changed, root=tmp_path)
+    assert not second['run_all'] and second['reasons'] == []
+    assert second['pytest'] == first['pytest']
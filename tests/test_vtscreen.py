@@ -0,0 +1,75 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'bin'))
+import vtscreen  # noqa: E402
+
+
+def test_cursor_movement_and_erase():
+    s = vtscreen.Screen(10, 3)
+    s.feed('hello\r\nworld')
+    s.feed('\x1b[1;1HJ\x1b[2;3H\x1b[K')
+    assert s.text() == 'Jello\nwo'
+
+
+def test_autowrap_and_scroll():
+    s = vtscreen.Screen(4, 2)
+    s.feed('abcdefgh\r\nij')
+    assert s.lines() == ['efgh', 'ij']
+
+
+def test_alternate_screen_restores_shell_output():
+    s = vtscreen.Screen(20, 4)
+    s.feed('$ top\r\n')
+    s.feed('\x1b[?1049h\x1b[2J\x1b[HTUI FRAME')
+    assert s.text() == 'TUI FRAME'
+    s.feed('\x1b[?1049l$ ')
+    assert s.text() == '$ top\n$'
+
+
+def test_sequences_split_across_feeds_and_state_round_trip():
+    s = vtscreen.Screen(10, 2)
+    s.feed('ab\x1b[')
+    s.feed('2Dx\x1b]0;title')
+    s.feed('\x07y')
+    assert s.text() == 'xy'
+    clone = vtscreen.Screen.from_dict(s.to_dict())
+    clone.feed('z')
+    assert clone.text() == 'xyz'
+
+
+def test_resize_event_and_keyframes():
+    events = [(0.0, 'o', 'one'), (1.5, 'r', '5x2'), (2.5, 'o', '\r\ntwo')]
+    frames = list(vtscreen.keyframes(vtscreen.Screen(10, 3), events, 1.0))
+    assert frames == [(1.0, 'one'), (2.0, 'one'), (2.5, 'one\ntwo')]
+
+
+def test_malformed_csi_does_not_swallow_the_rest_of_the_chunk():
+    s = vtscreen.Screen(80, 100)
+    s.feed("hello\x1b[1\x00X" + "A" * 5000 + "\r\nlast")
+    assert s.text().endswith("A\nlast")
+    assert s.text().startswith("hello" + "A" * 75)
+    assert s._pending == ""
+
+
+def test_controls_inside_csi_run_in_place():
+    s = vtscreen.Screen(20, 3)
+    s.feed("ab\x1b[2\r;1Hz")
+    assert s.text() == "ab\nz"
+    s = vtscreen.Screen(20, 3)
+    s.feed("ab\x1b[2\r")
+    s.feed(";1Hz")
+    assert s.text() == "ab\nz"
+    # many interrupted CSIs in one chunk are handled in a single pass
+    s = vtscreen.Screen(20, 3)
+    s.feed("\x1b[1\r;1H" * 20000 + "tail")
+    assert s.text() == "tail" and s._pending == ""
+
+
+def test_esc_inside_unterminated_string_starts_a_new_sequence():
+    s = vtscreen.Screen(80, 24)
+    s.feed("abc\x1b]0;title" + "B" * 10 + "\x1b[Hxyz")
+    s.feed("more")
+    assert s.text() == "xyzmore"
+    assert s._pending == ""